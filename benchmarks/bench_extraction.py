@@ -0,0 +1,73 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixture_server import start_server
+
+# Compares the per-element WebDriver extractors with the single execute_script
+# extractors on the saved fixtures. Needs a local Chrome.
+
+
+# Count every WebDriver command sent; WebElement calls also go through driver.execute
+def count_round_trips(driver):
+    counter = [0]
+    original = driver.execute
+
+    def execute(driver_command, params=None):
+        counter[0] += 1
+        return original(driver_command, params)
+
+    driver.execute = execute
+    return counter
+
+
+def time_extractor(name, extractor, counter, runs):
+    timings = []
+    trips = 0
+    result = None
+    for _ in range(runs):
+        before = counter[0]
+        start = time.perf_counter()
+        result = extractor()
+        timings.append((time.perf_counter() - start) * 1000)
+        trips = counter[0] - before
+    print(f"{name:<32} median {statistics.median(timings):8.2f} ms   p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f} ms   {trips:4d} round-trips")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Selenium extraction strategies against the fixtures")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    server, base_url = start_server()
+    os.environ["AMAZON_BASE_URL"] = base_url
+    from retail_intelligence import browser, selenium_backend as app
+
+    driver = browser.create_driver()
+    counter = count_round_trips(driver)
+    try:
+        driver.get(base_url + "/s?k=dyanora")
+        print("Search results page")
+        legacy = time_extractor("  find_element per card", lambda: app.extract_search_cards_webdriver(driver), counter, args.runs)
+        injected = time_extractor("  execute_script", lambda: app.extract_search_cards(driver), counter, args.runs)
+        print(f"  identical payload: {legacy == injected}")
+
+        link = base_url + "/dp/B0DYANORA1"
+        driver.get(link)
+        print("Product detail page")
+        legacy = time_extractor("  find_element per field", lambda: app.extract_product_details_webdriver(driver, link), counter, args.runs)
+        injected = time_extractor("  execute_script", lambda: app.extract_product_details(driver, link), counter, args.runs)
+        print(f"  identical payload: {legacy == injected}")
+    finally:
+        driver.quit()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+import argparse
+import hashlib
+import html
+import os
+import random
+import re
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+
+# Local amazon.in stand-in that serves the saved HTML fixtures.
+# Run it and point the scrapers at it with AMAZON_BASE_URL=http://127.0.0.1:<port>
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Anti-bot pages the throttling handler can answer with: fixture file and HTTP status
+BLOCK_PAGES = {
+    "captcha": ("captcha.html", 200),
+    "robot": ("robot_check.html", 200),
+    "503": ("service_unavailable.html", 503),
+}
+
+# Page variants the synthetic store serves for a share of products (see --missing-rate).
+# The js_* variants only render in a browser, so the HTTP backend falls back to Selenium.
+MISSING_VARIANTS = ("price", "reviews", "carousel", "no_results")
+JS_VARIANTS = ("js_title", "js_carousel")
+
+# Organic result cards per synthetic search page
+SEARCH_RESULTS = 12
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def _stable_random(*parts):
+    return random.Random(hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest())
+
+
+BRANDS = ["Dyanora", "Voltra", "Kelvix", "Auralis", "Brightline", "Coralta", "Nexa", "Orion", "Lumio", "Vista"]
+CATEGORIES = {
+    "Televisions": ["HD Ready LED TV", "Full HD Smart LED TV", "4K Ultra HD Smart LED TV"],
+    "Refrigerators": ["Single Door Refrigerator", "Double Door Frost Free Refrigerator"],
+    "Washing Machines": ["Fully Automatic Front Load Washing Machine", "Semi Automatic Top Load Washing Machine"],
+    "Air Conditioners": ["Split Inverter AC", "Window AC"],
+    "Headphones": ["Wireless Bluetooth Headphones", "Noise Cancelling Over Ear Headphones"],
+}
+SIZES = ["24 inch", "32 inch", "43 inch", "55 inch", "190 L", "260 L", "7 kg", "8 kg", "1.5 Ton", "1 Ton"]
+COLOURS = ["Black", "Silver", "Grey", "White", "Blue"]
+
+
+# Deterministic catalog of n products in product lines of 1-6 variants that differ
+# by model number and colour, like the real catalogs the planner groups.
+# Rows carry the template columns plus the listing the synthetic store serves for them.
+def synthetic_catalog(n, seed=0):
+    rng = random.Random(seed)
+    products = []
+    line = 0
+    while len(products) < n:
+        line += 1
+        brand = rng.choice(BRANDS)
+        category = rng.choice(sorted(CATEGORIES))
+        noun = rng.choice(CATEGORIES[category])
+        size = rng.choice(SIZES)
+        prefix = brand[:2].upper()
+        for variant in range(min(rng.randint(1, 6), n - len(products))):
+            model = f"{prefix}-{line:05d}{chr(65 + variant)}"
+            colour = COLOURS[variant % len(COLOURS)]
+            products.append({
+                "Brand": brand,
+                "Category": category,
+                "Product Name": f"{brand} Series {line} {size} {noun} {model} ({colour})",
+                "Model Number": model,
+                "asin": f"B{hashlib.sha1(model.encode()).hexdigest()[:9].upper()}",
+                "price": rng.randrange(999, 99999),
+                "rating": round(rng.uniform(3.0, 4.9), 1),
+                "reviews": rng.randrange(0, 20000),
+            })
+    return products
+
+
+def write_catalog(products, path):
+    import pandas as pd
+
+    pd.DataFrame(products, columns=["Brand", "Category", "Product Name", "Model Number"]).to_excel(path, index=False)
+
+
+def _tokens(text):
+    return {word.lower() for word in re.findall(r"[A-Za-z0-9]+", text)}
+
+
+# Search and detail pages for a synthetic catalog, in the markup of the recorded fixtures
+class SyntheticStore:
+    def __init__(self, products, missing_rate=0.0, missing=MISSING_VARIANTS):
+        self.products = products
+        self.missing_rate = missing_rate
+        self.missing = list(missing)
+        self.by_asin = {product["asin"]: product for product in products}
+        self.postings = {}
+        for number, product in enumerate(products):
+            for token in _tokens(product["Product Name"]):
+                self.postings.setdefault(token, []).append(number)
+        self.by_category = {}
+        for product in products:
+            self.by_category.setdefault(product["Category"], []).append(product)
+
+    # The same page always gets the same variant, so repeated fetches agree
+    def variant(self, key):
+        rng = _stable_random("variant", key)
+        if not self.missing or rng.random() >= self.missing_rate:
+            return None
+        return rng.choice(self.missing)
+
+    # Products sharing the query's rarest tokens, best token overlap first
+    def search(self, query):
+        tokens = _tokens(query)
+        lists = sorted((self.postings.get(token, []) for token in tokens), key=len)
+        candidates = set()
+        for postings in lists[:2]:
+            candidates.update(postings)
+        scored = []
+        for number in candidates:
+            overlap = len(tokens & _tokens(self.products[number]["Product Name"]))
+            if overlap >= max(1, len(tokens) // 2):
+                scored.append((-overlap, number))
+        return [self.products[number] for _, number in sorted(scored)[:SEARCH_RESULTS]]
+
+    def search_page(self, query):
+        if self.variant(("search", query)) == "no_results":
+            results = []
+        else:
+            results = self.search(query)
+        cards = []
+        if results:
+            sponsor = _stable_random("sponsor", query).choice(self.products)
+            cards.append(_search_card(sponsor, sponsored=True))
+        cards.extend(_search_card(product) for product in results)
+        body = "\n".join(cards) if cards else (
+            f'<div class="s-no-outline"><span>No results for {html.escape(query)}.</span></div>'
+        )
+        return (
+            '<!DOCTYPE html>\n<html lang="en-in">\n<head><meta charset="utf-8">'
+            f"<title>Amazon.in : {html.escape(query)}</title></head>\n<body>\n"
+            f'  <div class="s-main-slot s-result-list s-search-results">\n{body}\n  </div>\n</body>\n</html>\n'
+        ).encode()
+
+    def product_page(self, asin):
+        product = self.by_asin.get(asin)
+        if product is None:
+            return None
+        variant = self.variant(("detail", asin))
+        title = html.escape(product["Product Name"])
+        parts = ['  <div id="centerCol">']
+        if variant == "js_title":
+            parts.append('    <div id="title_feature_div" data-csa-c-content-id="title"></div>')
+        else:
+            parts.append(f'    <h1 id="title"><span id="productTitle" class="a-size-large product-title-word-break">\n      {title}\n    </span></h1>')
+        if variant != "reviews":
+            parts.append(
+                '    <div id="averageCustomerReviews">\n'
+                f'      <span id="acrPopover" class="reviewCountTextLinkedHistogram" title="{product["rating"]} out of 5 stars">'
+                f'<span class="a-size-base a-color-base">{product["rating"]}</span></span>\n'
+                f'      <a id="acrCustomerReviewLink" href="#customerReviews"><span id="acrCustomerReviewText" class="a-size-base">{product["reviews"]:,} ratings</span></a>\n'
+                '    </div>'
+            )
+        if variant != "price":
+            parts.append(
+                '    <div id="corePriceDisplay_desktop_feature_div">\n'
+                f'      <span class="a-price aok-align-center"><span class="a-price-symbol">₹</span><span class="a-price-whole">{product["price"]:,}<span class="a-price-decimal">.</span></span></span>\n'
+                '    </div>'
+            )
+        parts.append("  </div>")
+        if variant != "carousel":
+            cards = []
+            if variant != "js_carousel":
+                rng = _stable_random("carousel", asin)
+                for competitor in rng.sample(self.by_category[product["Category"]], min(6, len(self.by_category[product["Category"]]))):
+                    cards.append(
+                        '      <li class="a-carousel-card">\n'
+                        f'        <div class="sponsored-products-truncator-afo-4">{html.escape(competitor["Product Name"])}</div>\n'
+                        f'        <span class="a-price"><span class="a-price-whole">{competitor["price"]:,}</span></span>\n'
+                        f'        <a class="a-link-normal adReviewLink" aria-label="{competitor["rating"]} out of 5 stars {competitor["reviews"]} ratings" href="/product-reviews/{competitor["asin"]}">{competitor["reviews"]}</a>\n'
+                        '      </li>'
+                    )
+            parts.append(
+                '  <div id="sp_detail_thematic-prime_theme_for_non_prime_members" class="a-section sp_desktop">\n'
+                '    <ol class="a-carousel">\n' + "\n".join(cards) + "\n    </ol>\n  </div>"
+            )
+        return (
+            '<!DOCTYPE html>\n<html lang="en-in">\n<head><meta charset="utf-8">'
+            f"<title>{title} : Amazon.in</title></head>\n<body>\n" + "\n".join(parts) + "\n</body>\n</html>\n"
+        ).encode()
+
+
+def _search_card(product, sponsored=False):
+    slug = "-".join(re.findall(r"[A-Za-z0-9]+", product["Product Name"])[:6])
+    label = '      <div class="puis-label-popover"><span class="puis-label-popover-default"><span>Sponsored</span></span></div>\n' if sponsored else ""
+    return (
+        f'    <div data-asin="{product["asin"]}" data-component-type="s-search-result" class="s-result-item">\n{label}'
+        f'      <h2 class="a-size-mini"><span class="a-size-medium a-color-base a-text-normal">{html.escape(product["Product Name"])}</span></h2>\n'
+        f'      <a class="a-link-normal s-no-outline" href="/{slug}/dp/{product["asin"]}/ref=sr_1_1">{html.escape(product["Brand"])}</a>\n'
+        f'      <span class="a-price"><span class="a-price-whole">{product["price"]:,}<span class="a-price-decimal">.</span></span></span>\n'
+        "    </div>"
+    )
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set through fixture_handler(): per-response delay and the synthetic store
+    latency_ms = 0.0
+    jitter_ms = 0.0
+    store = None
+    counts = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        if path == "/":
+            self.count("home")
+            self.send_page(load_fixture("home.html"))
+        elif path == "/s":
+            self.count("search")
+            if self.store is None:
+                self.send_page(load_fixture("search_results.html"))
+            else:
+                self.send_page(self.store.search_page(parse_qs(url.query).get("k", [""])[0]))
+        elif "/dp/" in path:
+            self.count("detail")
+            page = load_fixture("product_page.html") if self.store is None else self.store.product_page(path.split("/dp/")[1].split("/")[0])
+            if page is None:
+                self.send_page(b"<html><body>Not Found</body></html>", status=404)
+            else:
+                self.send_page(page)
+        else:
+            self.send_page(b"<html><body>Not Found</body></html>", status=404)
+
+    @classmethod
+    def count(cls, kind):
+        if cls.counts is not None:
+            with cls.counts_lock:
+                cls.counts[kind] += 1
+
+    def send_page(self, body, status=200):
+        if self.latency_ms or self.jitter_ms:
+            time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# FixtureHandler subclass with its own settings and a Counter of requests by page
+# kind (home/search/detail). With `products` (see synthetic_catalog) search and
+# detail pages come from a SyntheticStore instead of the recorded fixtures.
+def fixture_handler(latency_ms=0.0, jitter_ms=0.0, products=None, missing_rate=0.0, missing=MISSING_VARIANTS, base=FixtureHandler):
+    return type(base.__name__, (base,), {
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "store": SyntheticStore(products, missing_rate, missing) if products is not None else None,
+        "counts": Counter(),
+        "counts_lock": Lock(),
+    })
+
+
+# Serves a block page instead of the fixture when clients go over max_rps requests
+# in the last second, or at random with probability block_rate.
+# Use throttling_handler() to get a subclass with its own settings and counters.
+class ThrottlingHandler(FixtureHandler):
+    max_rps = None
+    block_rate = 0.0
+    block_page = "captcha"
+
+    def do_GET(self):
+        if self.should_block():
+            name, status = BLOCK_PAGES[self.block_page]
+            self.send_page(load_fixture(name), status=status)
+        else:
+            super().do_GET()
+
+    @classmethod
+    def should_block(cls):
+        with cls.lock:
+            now = time.monotonic()
+            cls.recent.append(now)
+            while cls.recent and cls.recent[0] < now - 1.0:
+                cls.recent.popleft()
+            cls.requests += 1
+            blocked = (cls.max_rps is not None and len(cls.recent) > cls.max_rps) or random.random() < cls.block_rate
+            if blocked:
+                cls.blocked += 1
+            return blocked
+
+
+# `base` may be a fixture_handler() class to combine throttling with latency or a synthetic store
+def throttling_handler(max_rps=None, block_rate=0.0, block_page="captcha", base=FixtureHandler):
+    return type("ThrottlingHandler", (ThrottlingHandler, base), {
+        "max_rps": max_rps,
+        "block_rate": block_rate,
+        "block_page": block_page,
+        "requests": 0,
+        "blocked": 0,
+        "recent": deque(),
+        "lock": Lock(),
+    })
+
+
+# Start the server on a background thread; port 0 picks a free port
+def start_server(host="127.0.0.1", port=0, handler=FixtureHandler):
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve saved amazon.in HTML fixtures locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-rps", type=float, help="Serve block pages above this many requests per second")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="Share of requests answered with a block page at random")
+    parser.add_argument("--block-page", choices=sorted(BLOCK_PAGES), default="captcha")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random delay, uniform between 0 and this")
+    parser.add_argument("--catalog-size", type=int, help="Serve a synthetic store of this many products instead of the recorded pages")
+    parser.add_argument("--write-catalog", metavar="XLSX", help="Write the synthetic store's catalog template to XLSX")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Share of synthetic pages served as a missing-element variant")
+    parser.add_argument("--missing", default=",".join(MISSING_VARIANTS),
+                        help=f"Comma-separated variants to draw from ({', '.join(MISSING_VARIANTS + JS_VARIANTS)})")
+    args = parser.parse_args()
+
+    products = synthetic_catalog(args.catalog_size) if args.catalog_size else None
+    if args.write_catalog:
+        if products is None:
+            parser.error("--write-catalog needs --catalog-size")
+        write_catalog(products, args.write_catalog)
+        print(f"Wrote {len(products)} catalog rows to {args.write_catalog}")
+    missing = [variant for variant in args.missing.split(",") if variant]
+    unknown = set(missing) - set(MISSING_VARIANTS + JS_VARIANTS)
+    if unknown:
+        parser.error(f"unknown missing-element variants: {', '.join(sorted(unknown))}")
+    handler = fixture_handler(args.latency_ms, args.jitter_ms, products, args.missing_rate, missing)
+    if args.max_rps is not None or args.block_rate:
+        handler = throttling_handler(args.max_rps, args.block_rate, args.block_page, base=handler)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Serving {'a synthetic store of ' + str(len(products)) + ' products' if products else 'fixtures'} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from threading import Event, Thread
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixture_server import MISSING_VARIANTS, fixture_handler, start_server, synthetic_catalog, write_catalog
+
+# End-to-end scraping benchmark against the local stand-in server: for each catalog
+# size a synthetic store is served and a fresh process scrapes its whole catalog
+# with BatchRun (no cache, no URL index), so runs are reproducible and comparable.
+# Save a run with --output and compare a later one against it with --baseline.
+
+DEFAULT_SIZES = [10, 1000, 10000]
+# How often the child samples memory and in-flight workers
+SAMPLE_SECONDS = 0.1
+# Metrics compared against a baseline, and whether higher is better
+COMPARED = [
+    ("products_per_min", True),
+    ("latency_p50_ms", False),
+    ("latency_p95_ms", False),
+    ("latency_p99_ms", False),
+    ("peak_rss_per_worker_mb", False),
+    ("page_loads_per_product", False),
+    ("match_accuracy", True),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+
+# Peak RSS of this process plus its browser children, and the most workers busy at once
+class Sampler(Thread):
+    def __init__(self, controller):
+        super().__init__(daemon=True)
+        import psutil
+
+        self.process = psutil.Process()
+        self.controller = controller
+        self.baseline_mb = self.rss_mb()
+        self.peak_mb = self.baseline_mb
+        self.max_in_flight = 0
+        self._done = Event()
+
+    def rss_mb(self):
+        total = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                pass
+        return total / (1024 * 1024)
+
+    def run(self):
+        while not self._done.wait(SAMPLE_SECONDS):
+            self.peak_mb = max(self.peak_mb, self.rss_mb())
+            self.max_in_flight = max(self.max_in_flight, self.controller.snapshot()["in_flight"])
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.peak_mb = max(self.peak_mb, self.rss_mb())
+
+
+# Runs in the child process; AMAZON_BASE_URL points at the parent's server
+def scrape_catalog(args):
+    from retail_intelligence.batch import BatchRun
+    from retail_intelligence.ingest import read_catalog
+    from retail_intelligence.throttle import get_rate_controller
+    from retail_intelligence.tracing import get_tracer
+
+    rows = read_catalog(args.child, dedupe=False).rows
+    latencies = []
+
+    # Per-product latency: the time its search group took, hedges and retries included
+    class TimedRun(BatchRun):
+        def _fetch(self, job):
+            start = time.perf_counter()
+            try:
+                return super()._fetch(job)
+            finally:
+                if not job.get("hedge"):
+                    elapsed = (time.perf_counter() - start) * 1000
+                    products = len(job["rows"]) + sum(len(self.duplicates.get(row["idx"], ())) for row in job["rows"])
+                    latencies.extend([elapsed] * products)
+
+    controller = get_rate_controller()
+    controller.configure(max_concurrency=args.concurrency, requests_per_second=args.max_rps)
+    sampler = Sampler(controller)
+    sampler.start()
+    started = time.perf_counter()
+    run = TimedRun(
+        rows, concurrency=args.concurrency, backend=args.backend,
+        group_searches=not args.no_grouping, hedge=not args.no_hedge
+    )
+    try:
+        run.wait()
+    finally:
+        run.close()
+    seconds = time.perf_counter() - started
+    sampler.stop()
+
+    pages = run.page_summary()
+    failed = sum(1 for result in run.results.values() if not result or "Error" in result)
+    # The synthetic store is deterministic, so every row's correct listing is known
+    expected = {product["Model Number"]: product["asin"] for product in synthetic_catalog(len(rows))}
+    matched = [
+        f"/dp/{expected.get(row['model_number'])}/" in run.results[row["idx"]].get("Product Link", "") + "/"
+        for row in rows if run.results.get(row["idx"]) and "Error" not in run.results[row["idx"]]
+    ]
+    workers = max(1, sampler.max_in_flight)
+    return {
+        "products": len(rows),
+        "failed": failed,
+        "searches": run.plan.searches,
+        "seconds": round(seconds, 2),
+        "products_per_min": round(len(rows) / max(seconds, 1e-9) * 60, 1),
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "latency_p99_ms": percentile(latencies, 99),
+        "baseline_rss_mb": round(sampler.baseline_mb, 1),
+        "peak_rss_mb": round(sampler.peak_mb, 1),
+        "max_workers": sampler.max_in_flight,
+        "peak_rss_per_worker_mb": round((sampler.peak_mb - sampler.baseline_mb) / workers, 2),
+        "page_loads_per_product": round(pages["page_loads"] / max(pages["products"], 1), 2),
+        "match_accuracy": round(sum(matched) / max(len(matched), 1), 3),
+        "stages": get_tracer().summary(),
+    }
+
+
+def run_size(size, base_url, handler, args, directory):
+    catalog = os.path.join(directory, f"catalog_{size}.xlsx")
+    write_catalog(handler.store.products, catalog)
+    handler.counts.clear()
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", catalog,
+        "--concurrency", str(args.concurrency), "--max-rps", str(args.max_rps), "--backend", args.backend,
+    ] + (["--no-grouping"] if args.no_grouping else []) + (["--no-hedge"] if args.no_hedge else [])
+    env = {
+        **os.environ,
+        "AMAZON_BASE_URL": base_url,
+        "RETAIL_INTELLIGENCE_DATA_DIR": os.path.join(directory, "data"),
+        "RETAIL_INTELLIGENCE_TRACE_DIR": "",
+    }
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark for {size} products failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["size"] = size
+    result["server_requests"] = dict(handler.counts)
+    return result
+
+
+def print_result(result, baseline=None):
+    print(
+        f"{result['size']:>6} products  {result['products_per_min']:>9.1f}/min  "
+        f"latency p50 {result['latency_p50_ms']:.0f} / p95 {result['latency_p95_ms']:.0f} / p99 {result['latency_p99_ms']:.0f} ms  "
+        f"peak RSS {result['peak_rss_mb']:.0f} MB ({result['peak_rss_per_worker_mb']:.1f} MB per worker, {result['max_workers']} workers)  "
+        f"{result['page_loads_per_product']:.2f} page loads/product  {result['searches']} searches  "
+        f"{result['failed']} failed  {result['match_accuracy']:.1%} matched the right listing"
+    )
+    slowest = max(result["stages"], key=lambda stage: stage["p95_ms"], default=None)
+    if slowest is not None:
+        print(f"        slowest stage at p95: {slowest['stage']} ({slowest['p95_ms']:.1f} ms)")
+    if baseline is None:
+        return
+    changes = []
+    for key, higher_is_better in COMPARED:
+        before, after = baseline.get(key), result.get(key)
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        better = change > 0 if higher_is_better else change < 0
+        changes.append(f"{key} {change:+.1f}%{'' if abs(change) < 5 else (' better' if better else ' worse')}")
+    print("        vs baseline: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraping throughput benchmark against the local fixture server")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Catalog sizes to run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-rps", type=float, default=0.0, help="Request budget (default: no limit)")
+    parser.add_argument("--backend", choices=["http", "selenium"], default="http")
+    parser.add_argument("--no-grouping", action="store_true")
+    parser.add_argument("--no-hedge", action="store_true")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Server delay before every response")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Extra random server delay")
+    parser.add_argument("--missing-rate", type=float, default=0.05, help="Share of pages served as a missing-element variant")
+    parser.add_argument("--missing", default=",".join(MISSING_VARIANTS))
+    parser.add_argument("--output", metavar="JSON", help="Write the results to JSON")
+    parser.add_argument("--baseline", metavar="JSON", help="Compare against results saved with --output")
+    parser.add_argument("--child", metavar="XLSX", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(scrape_catalog(args), default=str))
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {result["size"]: result for result in json.load(f)["results"]}
+    missing = [variant for variant in args.missing.split(",") if variant]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="retail_intelligence_bench_") as directory:
+        for size in args.sizes:
+            handler = fixture_handler(args.latency_ms, args.jitter_ms, synthetic_catalog(size), args.missing_rate, missing)
+            server, base_url = start_server(handler=handler)
+            try:
+                result = run_size(size, base_url, handler, args, directory)
+            finally:
+                server.shutdown()
+                server.server_close()
+            print_result(result, baseline.get(size))
+            results.append(result)
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "child")}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2, default=str)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import importlib
+
+# Scraping engine for the Retail Intelligence dashboard, importable without Streamlit.
+# Attributes resolve lazily so `import retail_intelligence` does not pull in
+# selenium, pandas, lxml or rapidfuzz until they are actually used.
+_EXPORTS = {
+    "search_amazon": "retail_intelligence.scraper",
+    "search_amazon_group": "retail_intelligence.scraper",
+    "search_amazon_http": "retail_intelligence.http_backend",
+    "scrape_product": "retail_intelligence.selenium_backend",
+    "JavaScriptRequired": "retail_intelligence.parsing",
+    "DriverPool": "retail_intelligence.browser",
+    "create_driver": "retail_intelligence.browser",
+    "ScrapeScheduler": "retail_intelligence.scheduler",
+    "ScrapeService": "retail_intelligence.service",
+    "Batch": "retail_intelligence.scheduler",
+    "BatchRun": "retail_intelligence.batch",
+    "ScrapeCache": "retail_intelligence.cache",
+    "product_cache_key": "retail_intelligence.cache",
+    "JobStore": "retail_intelligence.jobs",
+    "PriceHistory": "retail_intelligence.history",
+    "plan_refresh": "retail_intelligence.refresh",
+    "UrlIndex": "retail_intelligence.url_index",
+    "ResultsStore": "retail_intelligence.results_store",
+    "SnapshotArchive": "retail_intelligence.archive",
+    "plan_searches": "retail_intelligence.planner",
+    "Worker": "retail_intelligence.worker",
+    "run_workers": "retail_intelligence.worker",
+    "read_catalog": "retail_intelligence.ingest",
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
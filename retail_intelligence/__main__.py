@@ -0,0 +1,3 @@
+from retail_intelligence.cli import main
+
+raise SystemExit(main())
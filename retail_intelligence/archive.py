@@ -0,0 +1,215 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+
+from .cache import row_cache_key
+from .config import DATA_DIR
+from .storage import ensure_parent_dir, sqlite_connection
+
+# Index rows buffered before they are written to SQLite (page files are written at once)
+FLUSH_SNAPSHOTS = 50
+# Products per re-parse task; rows sharing a search page stay in one task
+REPARSE_CHUNK = 250
+
+# zstd when the zstandard package is installed, gzip otherwise; reading handles both
+def _compressor():
+    try:
+        import zstandard
+    except ImportError:
+        return ".gz", lambda data: gzip.compress(data, compresslevel=6)
+    return ".zst", zstandard.ZstdCompressor(level=10).compress
+
+def _decompress(path, data):
+    if path.endswith(".zst"):
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def _object_path(root, digest, extension):
+    return os.path.join(root, "objects", digest[:2], digest + extension)
+
+def load_snapshot(root, digest):
+    for extension in (".zst", ".gz"):
+        path = _object_path(root, digest, extension)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return _decompress(path, f.read()).decode("utf-8")
+    raise FileNotFoundError(f"Snapshot {digest} is not in {root}")
+
+# Compressed copies of every fetched search and product page. Pages are stored once
+# under their SHA-256 (objects/ab/abcd....zst) and indexed by product key and fetch
+# time, so results can be rebuilt offline when Amazon's markup changes.
+class SnapshotArchive:
+    def __init__(self, root=None, flush_every=FLUSH_SNAPSHOTS):
+        self.root = root or os.path.join(DATA_DIR, "snapshots")
+        self.index_path = os.path.join(self.root, "index.sqlite")
+        self.flush_every = flush_every
+        self.extension, self._compress = _compressor()
+        self._lock = Lock()
+        self._pending = []
+        ensure_parent_dir(self.index_path)
+        with sqlite_connection(self.index_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "product_key TEXT NOT NULL, kind TEXT NOT NULL, fetched_at REAL NOT NULL, digest TEXT NOT NULL, "
+                "url TEXT, query TEXT, confidence REAL, job_id TEXT, "
+                "product_name TEXT, model_number TEXT, brand TEXT, category TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS snapshots_product ON snapshots (product_key, fetched_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS snapshots_job ON snapshots (job_id)")
+
+    # Store one fetched page for the catalog rows it serves; returns its digest
+    def save(self, kind, url, page, rows, query=None, confidence=None, job_id=None):
+        data = page.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = _object_path(self.root, digest, self.extension)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._compress(data))
+            os.replace(tmp, path)
+        now = time.time()
+        with self._lock:
+            self._pending.extend(
+                (row_cache_key(row), kind, now, digest, url, query, confidence, job_id,
+                 row["product_name"], row.get("model_number"), row.get("brand"), row.get("category"))
+                for row in rows
+            )
+            if len(self._pending) >= self.flush_every:
+                self._write()
+        return digest
+
+    def _write(self):
+        pending, self._pending = self._pending, []
+        if pending:
+            with sqlite_connection(self.index_path) as conn:
+                conn.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", pending)
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def for_job(self, job_id):
+        return JobSnapshots(self, job_id)
+
+    def load(self, digest):
+        return load_snapshot(self.root, digest)
+
+    # Newest search page and newest page per product URL for each product key,
+    # plus the catalog fields needed to match again: {product_key: snapshot set}.
+    # With a job ID only that job's snapshots are considered.
+    def latest(self, product_keys=None, job_id=None):
+        self.flush()
+        query = (
+            "SELECT product_key, kind, digest, url, confidence, product_name, model_number, brand, category "
+            "FROM snapshots WHERE 1 = 1"
+        )
+        params = []
+        if job_id is not None:
+            query += " AND job_id = ?"
+            params.append(job_id)
+        with sqlite_connection(self.index_path) as conn:
+            if product_keys is None:
+                records = conn.execute(query + " ORDER BY fetched_at DESC", params).fetchall()
+            else:
+                keys = list(dict.fromkeys(product_keys))
+                records = []
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    records += conn.execute(
+                        query + f" AND product_key IN ({','.join('?' * len(chunk))}) ORDER BY fetched_at DESC",
+                        params + chunk
+                    ).fetchall()
+        snapshots = {}
+        for key, kind, digest, url, confidence, product_name, model_number, brand, category in records:
+            entry = snapshots.setdefault(key, {
+                "product_key": key, "product_name": product_name, "model_number": model_number,
+                "brand": brand, "category": category, "search": None, "details": {},
+            })
+            if kind == "search":
+                entry["search"] = entry["search"] or digest
+            else:
+                entry["details"].setdefault(url, (digest, confidence))
+        return snapshots
+
+    def stats(self):
+        self.flush()
+        with sqlite_connection(self.index_path) as conn:
+            products, pages, snapshots = conn.execute(
+                "SELECT COUNT(DISTINCT product_key), COUNT(DISTINCT digest), COUNT(*) FROM snapshots"
+            ).fetchone()
+        return {"products": products, "pages": pages, "snapshots": snapshots}
+
+# The archive as seen by one batch run: every snapshot is tagged with its job ID
+class JobSnapshots:
+    def __init__(self, archive, job_id):
+        self.archive = archive
+        self.job_id = job_id
+
+    def save(self, kind, url, page, rows, query=None, confidence=None):
+        return self.archive.save(kind, url, page, rows, query, confidence, job_id=self.job_id)
+
+    def flush(self):
+        self.archive.flush()
+
+# Runs in the re-parse worker processes: the current extractors over archived pages.
+# A product with an archived search page is matched again, so matching fixes apply too.
+def _reparse_chunk(root, entries):
+    from .http_backend import parse_product_page, parse_search_results
+    from .matching import select_best_match
+    from .parsing import JavaScriptRequired
+    from .tracing import get_tracer
+
+    get_tracer().directory = None  # Keep re-parse spans out of the scraping traces
+    cards_by_digest = {}
+    results = []
+    for entry in entries:
+        # Card links are made absolute with the current AMAZON_BASE_URL; compare paths only
+        details = {urlsplit(url).path: (url, digest, confidence) for url, (digest, confidence) in entry["details"].items()}
+        try:
+            if entry["search"] is not None:
+                if entry["search"] not in cards_by_digest:
+                    cards_by_digest[entry["search"]] = parse_search_results(load_snapshot(root, entry["search"]))
+                best_match, link, confidence = select_best_match(
+                    entry["product_name"], cards_by_digest[entry["search"]], entry["model_number"], entry["brand"]
+                )
+                if best_match is None:
+                    results.append((entry["product_key"], None))
+                    continue
+                if urlsplit(link).path not in details:
+                    results.append((entry["product_key"], {"Error": f"Matched listing is not archived: {link}"}))
+                    continue
+                link, digest, _ = details[urlsplit(link).path]
+            elif entry["details"]:
+                # Opened straight from the URL index: keep the confidence it was opened with
+                link, (digest, confidence) = next(iter(entry["details"].items()))
+            else:
+                continue
+            product_info = parse_product_page(load_snapshot(root, digest), link)
+            product_info["Match Confidence"] = confidence
+            results.append((entry["product_key"], product_info))
+        except JavaScriptRequired as e:
+            results.append((entry["product_key"], {"Error": f"Archived page has no {e}"}))
+        except Exception as e:
+            results.append((entry["product_key"], {"Error": f"{type(e).__name__}: {e}"}))
+    return results
+
+# Rebuild results for the given snapshot sets in a process pool; yields (product_key, result)
+def reparse(archive, entries, workers=None, chunk_size=REPARSE_CHUNK):
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    # Products that share a search page go to the same worker, which parses it once
+    entries = sorted(entries, key=lambda entry: entry["search"] or "")
+    chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    if not chunks:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_reparse_chunk, archive.root, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
@@ -0,0 +1,316 @@
+import itertools
+import time
+from functools import partial
+from queue import Queue
+from threading import Event, Lock, Thread
+
+from .browser import DriverPool
+from .cache import product_cache_key
+from .parsing import BlockedError
+from .planner import MAX_GROUP_SIZE, QueryPlan, coalesce_rows, group_searches as plan_groups
+from .scheduler import AtomicCounter, ScrapeScheduler
+from .scraper import search_amazon_group
+from .service import ABANDONED, SingleFlight
+from .throttle import get_rate_controller
+from .tracing import trace_context
+
+# Attempts per search group before its rows are reported as blocked
+MAX_BLOCKED_ATTEMPTS = 6
+CANCELLED = "Cancelled"
+
+# Cache, price history and job store writes for finished rows, made on a thread of
+# their own so SQLite commits never hold up the scheduler's event loop. Rows that
+# land while a write is in progress go into the next one as a single transaction.
+class ResultWriter:
+    def __init__(self, cache=None, history=None, job_store=None, job_id=None):
+        self.cache = cache
+        self.history = history
+        self.job_store = job_store
+        self.job_id = job_id
+        self._queue = Queue()
+        self._thread = Thread(target=self._run, daemon=True, name="result-writer")
+        self._thread.start()
+
+    # A search result for the cache and the price history
+    def scraped(self, row, result):
+        self._queue.put(("scraped", row, result))
+
+    # A finished catalog row for the job store
+    def finished(self, row, result):
+        self._queue.put(("finished", row, result))
+
+    # Waits for every queued write
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            try:
+                self._write([item for item in items if item is not None])
+            except Exception as e:
+                print(f"Error saving results: {e}")
+            if None in items:
+                return
+
+    def _write(self, items):
+        scraped = [(row, result) for kind, row, result in items if kind == "scraped"]
+        finished = [(row["idx"], result) for kind, row, result in items if kind == "finished"]
+        if self.cache is not None:
+            fresh = [(row["cache_key"], result) for row, result in scraped if result and "Error" not in result]
+            if fresh:
+                self.cache.put_many(fresh)
+        if self.history is not None:
+            for row, result in scraped:
+                self.history.record(row, result)
+        if self.job_store is not None and finished:
+            self.job_store.record_results(self.job_id, finished)
+
+# One batch over catalog rows (dicts with idx, product_name, model_number, brand, category):
+# fresh cache entries are served directly, the rest is planned into search groups
+# scraped on a scheduler, and every finished row is checkpointed to the job store.
+# With a ScrapeService the run uses the shared scheduler and browser pool, queues
+# fairly against other tenants, and waits for products another run is already
+# scraping instead of scraping them again.
+class BatchRun:
+    def __init__(self, rows, concurrency=3, backend="http", timeouts=None, blocking=None,
+                 cache=None, cache_ttl_seconds=None, force_refresh=False,
+                 job_store=None, job_id=None, source=None, url_index=None, on_result=None,
+                 group_searches=True, hedge=True, service=None, tenant=None,
+                 archive=None, history=None):
+        self.backend = backend
+        self.url_index = url_index
+        self.history = history
+        self.timeouts = timeouts
+        self.blocking = blocking
+        self.cache = cache
+        self.job_store = job_store
+        self.job_id = job_id
+        self.on_result = on_result
+        self.service = service
+        self.tenant = tenant
+        self.hedge = hedge
+        self.max_group_size = MAX_GROUP_SIZE if group_searches else 1
+        self.results = {}
+        self.page_metrics = {}
+        self.closed = False
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._cancelled = Event()
+        self._changed = Event()
+        self._lock = Lock()
+        self._batches = []
+        # Cache keys of rows waiting on another run's search
+        self._following = set()
+        self._job_numbers = itertools.count()
+        # The controller's ceiling and request budget are process-wide and set once by
+        # ScrapeService or the command line; concurrency only sizes a run's own workers
+        self.controller = get_rate_controller()
+        if job_store is not None and job_id is None:
+            self.job_id = job_store.create_job(rows, source)
+        self.writer = ResultWriter(cache, history, job_store, self.job_id)
+        # Page snapshots are tagged with the job so `reparse JOB_ID` can rebuild it
+        self.archive = archive.for_job(self.job_id) if archive is not None and self.job_id is not None else archive
+
+        keys = [product_cache_key(row["product_name"], row.get("model_number")) for row in rows]
+        use_cache = cache is not None and not force_refresh
+        cached = cache.get_many(keys, ttl_seconds=cache_ttl_seconds) if use_cache else {}
+
+        misses = []
+        cached_rows = []
+        for row, key in zip(rows, keys):
+            if key in cached:
+                cached_rows.append((row, cached[key]))
+            else:
+                misses.append({**row, "cache_key": key})
+        self.cache_hits = len(cached_rows)
+        self.cache_misses = len(misses)
+        # Progress over the rows that are scraped, not over search groups
+        self.total = len(misses)
+        self.completed = AtomicCounter()
+
+        if job_store is not None:
+            job_store.mark_done_many(self.job_id, [(row["idx"], result) for row, result in cached_rows])
+        for row, result in cached_rows:
+            self.results[row["idx"]] = result
+            if on_result is not None:
+                on_result(row, result)
+        self.finished_at = time.monotonic()
+
+        distinct, self.duplicates = coalesce_rows(misses)
+        if service is not None:
+            # Set before joining: an abandoned search is resubmitted from the callback
+            self.flights, self.pool, self.scheduler = service.flights, service.pool, service.scheduler
+        else:
+            self.flights = SingleFlight()
+        leaders = [row for row in distinct if self._lead(row)]
+        groups = plan_groups(leaders, self.max_group_size)
+        self.plan = QueryPlan(groups, self.duplicates, len(misses), shared=len(distinct) - len(leaders))
+        if service is None:
+            workers = max(1, min(concurrency, len(groups)))
+            self.pool = DriverPool(size=workers)
+            self.scheduler = ScrapeScheduler(concurrency=workers, hedge=hedge).start()
+        self.batch = self._submit(groups)
+
+    @property
+    def done(self):
+        with self._lock:
+            return not self._following and all(batch.done for batch in self._batches)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self._changed.clear()
+            if self.done:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            # Batches flag done just after their last callback, hence the cap
+            self._changed.wait(0.5 if remaining is None else min(remaining, 0.5))
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            self._following.clear()
+            batches = list(self._batches)
+        for batch in batches:
+            batch.cancel()
+        self._changed.set()
+
+    # A shared service outlives its runs; a private scheduler and pool do not
+    def close(self):
+        if self.closed:
+            return
+        if self.service is None:
+            self.scheduler.shutdown()
+            self.pool.shutdown()
+        self.writer.close()
+        if self.archive is not None:
+            self.archive.flush()
+        if self.history is not None:
+            self.history.flush()
+            pages = self.page_summary()
+            self.history.record_run(pages["products"], pages["page_loads"])
+        self.closed = True
+
+    # True if this run scrapes the row; otherwise it waits for the run that already is
+    def _lead(self, row):
+        with self._lock:
+            self._following.add(row["cache_key"])
+        if not self.flights.join(row["cache_key"], partial(self._on_flight, row)):
+            return False
+        with self._lock:
+            self._following.discard(row["cache_key"])
+        return True
+
+    def _submit(self, groups):
+        jobs = [{"idx": next(self._job_numbers), "query": group.query, "rows": group.rows} for group in groups]
+        batch = self.scheduler.submit(
+            jobs, on_result=self._on_result, fetch=self._fetch, tenant=self.tenant, hedge=self.hedge, on_skip=self._on_skip
+        )
+        with self._lock:
+            self._batches.append(batch)
+        if self._cancelled.is_set():
+            batch.cancel()
+        return batch
+
+    def _settled(self, job):
+        with self._lock:
+            batches = list(self._batches)
+        return any(batch.settled(job) for batch in batches)
+
+    # Bandwidth and page-load totals over the scraped (non-cached) products
+    def page_summary(self):
+        measured = [m for m in list(self.page_metrics.values()) if m.get("page_loads")]
+        return {
+            "products": sum(m["products"] for m in measured),
+            "bytes_transferred": sum(m.get("bytes_transferred", 0) for m in measured),
+            "page_loads": sum(m.get("page_loads", 0) for m in measured),
+            "page_load_seconds": sum(m.get("page_load_seconds", 0.0) for m in measured),
+        }
+
+    def _fetch(self, job):
+        hedge = job.get("hedge", False)
+        # A hedged attempt loads the pages again but scrapes no additional products
+        products = 0 if hedge else len(job["rows"]) + sum(len(self.duplicates.get(row["idx"], ())) for row in job["rows"])
+        metrics = {"products": products}
+        self.page_metrics[(job["idx"], hedge)] = metrics
+        for attempt in range(MAX_BLOCKED_ATTEMPTS):
+            with self.controller.slot():
+                if self._cancelled.is_set():
+                    return {row["idx"]: {"Error": CANCELLED} for row in job["rows"]}
+                if hedge and self._settled(job):
+                    return {}  # The first attempt finished while this one waited for a slot
+                try:
+                    with trace_context(job=self.job_id, tenant=self.tenant, hedge=hedge, attempt=attempt + 1):
+                        results = search_amazon_group(
+                            job["query"], job["rows"], pool=self.pool, backend=self.backend,
+                            timeouts=self.timeouts, blocking=self.blocking, metrics=metrics, url_index=self.url_index,
+                            archive=self.archive
+                        )
+                except BlockedError as e:
+                    blocked = e
+                    delay = self.controller.record_block(str(e))
+                    print(f"Blocked on {job['query']}: {e}, backing off {delay:.0f} s (attempt {attempt + 1}/{MAX_BLOCKED_ATTEMPTS})")
+                    continue
+                except Exception:
+                    self.controller.record_error()
+                    raise
+            if any(result and "Error" not in result for result in results.values()):
+                self.controller.record_success()
+            else:
+                self.controller.record_error()
+            return results
+        return {row["idx"]: {"Error": f"Blocked: {blocked}"} for row in job["rows"]}
+
+    def _on_result(self, job, results):
+        if "Error" in results:  # The whole group failed inside the scheduler
+            results = {row["idx"]: results for row in job["rows"]}
+        for row in job["rows"]:
+            result = results.get(row["idx"])
+            try:
+                self.writer.scraped(row, result)
+                for target in [row] + self.duplicates.get(row["idx"], []):
+                    self._finish_row(target, result)
+            finally:
+                # Followers must always hear back, or they would wait forever
+                cancelled = result is not None and result.get("Error") == CANCELLED
+                self.flights.resolve(row["cache_key"], ABANDONED if cancelled else result)
+
+    # Queued jobs dropped after a cancel: other runs waiting on them take over
+    def _on_skip(self, job):
+        for row in job["rows"]:
+            self.flights.resolve(row["cache_key"], ABANDONED)
+        self._changed.set()
+
+    # The result of another run's search for a row this run was waiting on
+    def _on_flight(self, row, result):
+        key = row["cache_key"]
+        if not self._cancelled.is_set():
+            if result is ABANDONED:
+                if not self.flights.join(key, partial(self._on_flight, row)):
+                    return  # Another run picked it up first; keep waiting on that one
+                self._submit(plan_groups([row], 1))
+            else:
+                for target in [row] + self.duplicates.get(row["idx"], []):
+                    self._finish_row(target, result)
+        with self._lock:
+            self._following.discard(key)
+        self._changed.set()
+
+    def _finish_row(self, row, result):
+        self.results[row["idx"]] = result
+        self.writer.finished(row, result)
+        self.completed.increment()
+        self.finished_at = time.monotonic()
+        self._changed.set()
+        if self.on_result is not None:
+            self.on_result(row, result)
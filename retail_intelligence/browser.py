@@ -0,0 +1,177 @@
+import json
+import queue
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from .config import BLOCKED_RESOURCES, STAGE_BLOCKING, USER_AGENT
+from .tracing import span
+
+# Selenium and webdriver-manager are imported on first use so the package imports fast
+
+# Chrome options shared by every driver session
+def build_chrome_options():
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    # Return from driver.get() at DOMContentLoaded; readiness is checked per stage instead
+    options.page_load_strategy = "eager"
+    # Network events feed the bytes-per-product counter
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+# Resolve the chromedriver binary once per process instead of once per product
+_driver_path = None
+_driver_path_lock = Lock()
+
+def get_driver_path():
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            from webdriver_manager.chrome import ChromeDriverManager
+
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+def create_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    with span("driver_start"):
+        service = Service(get_driver_path())
+        driver = webdriver.Chrome(service=service, options=build_chrome_options())
+        driver.execute_cdp_cmd("Network.enable", {})
+    return driver
+
+def apply_resource_blocking(driver, stage, blocking=None):
+    categories = (blocking or STAGE_BLOCKING).get(stage, [])
+    patterns = [pattern for category in categories for pattern in BLOCKED_RESOURCES[category]]
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+# Bytes received since the last call, summed from Network.loadingFinished events
+def drain_transferred_bytes(driver):
+    total = 0
+    try:
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            if message["method"] == "Network.loadingFinished":
+                total += message["params"].get("encodedDataLength", 0)
+    except Exception:
+        pass
+    return total
+
+# Pool of warm Chrome sessions handed out to the scraping workers
+class DriverPool:
+    def __init__(self, size=3, max_uses=50, max_memory_mb=1500):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self._idle = queue.Queue()
+        # Uses per driver, keyed by the driver itself so a new session never inherits a count
+        self._uses = {}
+        self._lock = Lock()
+        self._created = 0
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Driver pool is shut down")
+                can_create = self._idle.empty() and self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    driver = create_driver()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                with self._lock:
+                    self._uses[driver] = 0
+                return driver
+            # Poll so a slot freed by a discarded driver can be refilled
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError("No idle browser session available")
+
+    def release(self, driver, healthy=True):
+        with self._lock:
+            self._uses[driver] = uses = self._uses.get(driver, 0) + 1
+        if self._closed or not healthy or self._should_recycle(driver, uses) or not self._reset(driver):
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    @contextmanager
+    def session(self, timeout=None):
+        driver = self.acquire(timeout=timeout)
+        healthy = True
+        try:
+            yield driver
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            self.release(driver, healthy=healthy)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def _should_recycle(self, driver, uses):
+        if uses >= self.max_uses:
+            return True
+        memory_mb = driver_memory_mb(driver)
+        return memory_mb is not None and memory_mb > self.max_memory_mb
+
+    # Health check plus cleanup so the next product starts from a blank session
+    def _reset(self, driver):
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.delete_all_cookies()
+            driver.get("about:blank")
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(driver, None)
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+# Resident memory of chromedriver plus its Chrome children, None if psutil is unavailable
+def driver_memory_mb(driver):
+    try:
+        import psutil
+        process = psutil.Process(driver.service.process.pid)
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            total += child.memory_info().rss
+        return total / (1024 * 1024)
+    except Exception:
+        return None
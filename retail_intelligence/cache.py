@@ -0,0 +1,94 @@
+import json
+import os
+import time
+from threading import Lock
+
+from .config import DATA_DIR
+from .storage import ensure_parent_dir, sqlite_connection
+
+# Cache key: normalized Product Name plus Model Number
+def normalize_key_part(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return " ".join(str(value).lower().split())
+
+def product_cache_key(product_name, model_number=None):
+    return f"{normalize_key_part(product_name)}|{normalize_key_part(model_number)}"
+
+# Key of a catalog row; BatchRun stores it on the rows it scrapes as cache_key
+def row_cache_key(row):
+    return row.get("cache_key") or product_cache_key(row["product_name"], row.get("model_number"))
+
+# Disk-backed cache of product_info dicts with a TTL and an LRU size cap
+class ScrapeCache:
+    def __init__(self, path=None, ttl_seconds=24 * 3600, max_entries=50000):
+        self.path = path or os.path.join(DATA_DIR, "scrape_cache.sqlite")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._puts = 0
+        ensure_parent_dir(self.path)
+        with sqlite_connection(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scrape_cache ("
+                "key TEXT PRIMARY KEY, product_info TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS scrape_cache_accessed ON scrape_cache (accessed_at)")
+
+    def get(self, key, ttl_seconds=None):
+        return self.get_many([key], ttl_seconds).get(key)
+
+    # Fresh entries for the given keys; stale and missing keys are left out
+    def get_many(self, keys, ttl_seconds=None):
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        with self._lock, sqlite_connection(self.path) as conn:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, product_info FROM scrape_cache WHERE key IN ({placeholders}) AND fetched_at >= ?",
+                    (*chunk, now - ttl_seconds)
+                ).fetchall()
+                for key, product_info in rows:
+                    found[key] = json.loads(product_info)
+                if rows:
+                    conn.executemany(
+                        "UPDATE scrape_cache SET accessed_at = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+        return found
+
+    def put(self, key, product_info):
+        now = time.time()
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scrape_cache (key, product_info, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(product_info), now, now)
+            )
+            self._puts += 1
+            if self._puts % 100 == 1:
+                self._evict(conn)
+
+    # Store many results in one transaction; items are (key, product_info) pairs
+    def put_many(self, items):
+        now = time.time()
+        records = [(key, json.dumps(product_info), now, now) for key, product_info in items]
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO scrape_cache (key, product_info, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                records
+            )
+            self._puts += len(records)
+            self._evict(conn)
+
+    # Drop least recently used entries beyond max_entries
+    def _evict(self, conn):
+        conn.execute(
+            "DELETE FROM scrape_cache WHERE key IN ("
+            "SELECT key FROM scrape_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
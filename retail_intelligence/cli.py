@@ -0,0 +1,431 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from .config import MAX_REQUESTS_PER_SECOND, REFRESH_PAGE_BUDGET
+from .exporters import LONG_FORMATS, LongFormatWriter
+from .worker import LEASE_ROWS, LEASE_SECONDS
+
+PRODUCT_FIELDS = ["Title", "Price", "Reviews Count", "Ranking", "Product Link", "Match Confidence"]
+
+# Catalog rows from the Excel template, in sheet order (repeated names are kept:
+# every catalog row gets an output record, and the query planner coalesces them)
+def read_catalog(path):
+    from .ingest import MissingColumnsError, read_catalog as read_excel_catalog
+
+    try:
+        catalog = read_excel_catalog(path, dedupe=False)
+    except MissingColumnsError as e:
+        raise ValueError(f"{path} is missing required columns: {', '.join(e.missing)}")
+    print(
+        f"Catalog: {len(catalog)} rows read in {catalog.seconds * 1000:.0f} ms "
+        f"({catalog.duplicates} repeated products, {catalog.skipped} rows without a product name skipped)",
+        file=sys.stderr
+    )
+    return catalog.rows
+
+# One flat record per catalog row; competitors stay nested (JSON-encoded for CSV/Parquet)
+def result_records(rows, results, nested=True):
+    records = []
+    for row in rows:
+        result = results.get(row["idx"])
+        failed = not result or "Error" in result
+        record = {
+            "Brand": row.get("brand"),
+            "Category": row.get("category"),
+            "Product Name": row["product_name"],
+            "Model Number": row.get("model_number"),
+            "Status": "failed" if failed else "done",
+            "Error": (result or {}).get("Error") if failed else None,
+        }
+        for field in PRODUCT_FIELDS:
+            record[field] = None if failed else result.get(field)
+        competitors = [] if failed else result.get("Related Products", [])
+        record["Competitors"] = competitors if nested else json.dumps(competitors)
+        records.append(record)
+    return records
+
+def write_results(rows, results, path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".xlsx":
+        from .exporters import export_workbook
+
+        export_workbook(
+            ((row["product_name"], results[row["idx"]]) for row in rows
+             if results.get(row["idx"]) and "Error" not in results[row["idx"]]),
+            path
+        )
+        return
+    if extension in (".jsonl", ".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            for record in result_records(rows, results):
+                f.write(json.dumps(record, default=str) + "\n")
+        return
+
+    import pandas as pd
+
+    df = pd.DataFrame(result_records(rows, results, nested=False))
+    if extension == ".csv":
+        df.to_csv(path, index=False)
+    elif extension == ".parquet":
+        df.astype({"Model Number": "string"}).to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {extension} (use .csv, .parquet, .jsonl or .xlsx)")
+
+def scrape_command(args):
+    started = time.perf_counter()
+    from .archive import SnapshotArchive
+    from .batch import BatchRun
+    from .cache import ScrapeCache
+    from .history import PriceHistory
+    from .jobs import JobStore
+    from .throttle import get_rate_controller
+    from .tracing import format_summary, get_tracer
+    from .url_index import UrlIndex
+
+    print(f"Engine import {(time.perf_counter() - started) * 1000:.0f} ms", file=sys.stderr)
+    started = time.perf_counter()
+    tracer = get_tracer()
+    if args.trace:
+        tracer.path = args.trace
+    rows = read_catalog(args.catalog)
+    job_store = JobStore()
+    results = {}
+    pending = rows
+    if args.resume:
+        completed, _ = job_store.resume_rows(args.resume)
+        results.update(completed)
+        pending = [row for row in rows if row["idx"] not in completed]
+        print(f"Resuming job {args.resume}: {len(completed)} rows already done, {len(pending)} to scrape", file=sys.stderr)
+
+    long_format = None
+    if args.long_format_dir:
+        long_format = LongFormatWriter(args.long_format_dir, formats=args.long_format or LONG_FORMATS)
+        for row in rows:
+            if row["idx"] in results:
+                long_format.add(row["product_name"], results[row["idx"]], row)
+
+    finished = [0]
+    # One run per process, so the command line sets the process-wide limits
+    controller = get_rate_controller()
+    controller.configure(max_concurrency=args.concurrency, requests_per_second=args.max_rps)
+
+    def report(job, result):
+        finished[0] += 1
+        if long_format is not None:
+            long_format.add(job["product_name"], result, job)
+        status = "ok" if result and "Error" not in result else "failed"
+        rate = controller.snapshot()
+        print(
+            f"[{finished[0]}/{len(pending)}] {status:<6} {job['product_name']} "
+            f"(workers {rate['concurrency']}, errors {rate['error_rate']:.0%}, throttled {rate['throttle_events']})",
+            file=sys.stderr
+        )
+
+    cache = None if args.no_cache else ScrapeCache()
+    run = BatchRun(
+        pending, concurrency=args.concurrency, backend=args.backend,
+        cache=cache, cache_ttl_seconds=args.cache_ttl_hours * 3600, force_refresh=args.force_refresh,
+        job_store=job_store, job_id=args.resume, source=os.path.basename(args.catalog),
+        url_index=None if args.no_url_index else UrlIndex(), on_result=report,
+        group_searches=not args.no_grouping, hedge=not args.no_hedge,
+        archive=SnapshotArchive(args.archive_dir) if args.archive else None,
+        history=None if args.no_history else PriceHistory()
+    )
+    print(
+        f"Plan: {run.plan.searches} searches for {run.plan.total_rows} rows "
+        f"({run.plan.searches_saved} saved, {run.plan.duplicate_rows} duplicate rows coalesced)",
+        file=sys.stderr
+    )
+    try:
+        run.wait()
+    except KeyboardInterrupt:
+        run.cancel()
+        print("Cancelling, waiting for in-flight products...", file=sys.stderr)
+        run.wait()
+    finally:
+        run.close()
+        tracer.flush()
+        if long_format is not None:
+            long_format.close()
+    results.update(run.results)
+    write_results(rows, results, args.output)
+
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for row in rows if not results.get(row["idx"]) or "Error" in results[row["idx"]])
+    print(f"Job {run.job_id}: {len(rows) - failed} done, {failed} failed, written to {args.output}", file=sys.stderr)
+    if long_format is not None:
+        print(
+            f"Long format: {long_format.products_written} products, {long_format.competitors_written} competitors "
+            f"written to {args.long_format_dir}", file=sys.stderr
+        )
+    print(f"Cache: {run.cache_hits} hits, {run.cache_misses} misses", file=sys.stderr)
+    print(f"Hedged {run.batch.hedged.value} slow searches, {run.batch.hedge_wins.value} finished first", file=sys.stderr)
+    rate = controller.snapshot()
+    print(
+        f"Rate control: {rate['requests']} requests, {rate['throttle_events']} throttle events, "
+        f"final concurrency {rate['concurrency']}/{rate['max_concurrency']} at {rate['requests_per_second']:.1f} requests/s",
+        file=sys.stderr
+    )
+    if tracer.spans:
+        print(f"Stage latency ({tracer.spans} spans, trace in {tracer.trace_path() or 'memory only'}):", file=sys.stderr)
+        print(format_summary(tracer.summary()), file=sys.stderr)
+    print(f"Run time {elapsed:.1f} s ({len(pending) / max(elapsed, 1e-9) * 60:.1f} products/min)", file=sys.stderr)
+    return 1 if failed == len(rows) and rows else 0
+
+def trace_command(args):
+    from .tracing import format_summary, read_trace, summarize
+
+    records = [record for path in args.trace_files for record in read_trace(path)]
+    if args.since:
+        cutoff = time.time() - args.since * 3600
+        records = [record for record in records if record["ts"] >= cutoff]
+    if not records:
+        print("No spans in the trace", file=sys.stderr)
+        return 1
+    print(format_summary(summarize(records)))
+    return 0
+
+# Scrape the catalog rows the refresh planner picks within the daily page budget:
+# new products, then volatile and competitor-heavy ones before stable ones
+def refresh_command(args):
+    started = time.perf_counter()
+    from .batch import BatchRun
+    from .cache import ScrapeCache
+    from .history import PriceHistory
+    from .jobs import JobStore
+    from .refresh import plan_refresh
+    from .throttle import get_rate_controller
+    from .url_index import UrlIndex
+
+    rows = read_catalog(args.catalog)
+    history = PriceHistory()
+    plan = plan_refresh(rows, history, args.budget)
+    print(
+        f"Refresh plan: {len(plan.rows)} of {plan.due} due products ({plan.new} never scraped, {plan.deferred} deferred), "
+        f"~{plan.estimated_pages:.0f} page loads at {plan.pages_per_product:.2f} per product; "
+        f"{plan.spent} of {args.budget:.0f} daily pages already used", file=sys.stderr
+    )
+    if args.dry_run:
+        for row in plan.rows[:args.show]:
+            priority = plan.priorities[row["idx"]]
+            print(f"{'new' if priority == float('inf') else f'{priority:.2f}':>8}  {row['product_name']}")
+        return 0
+    if not plan.rows:
+        print("Nothing to refresh within the budget", file=sys.stderr)
+        return 0
+
+    finished = [0]
+
+    def report(job, result):
+        finished[0] += 1
+        status = "ok" if result and "Error" not in result else "failed"
+        print(f"[{finished[0]}/{len(plan.rows)}] {status:<6} {job['product_name']}", file=sys.stderr)
+
+    get_rate_controller().configure(max_concurrency=args.concurrency, requests_per_second=args.max_rps)
+    run = BatchRun(
+        plan.rows, concurrency=args.concurrency, backend=args.backend, cache=ScrapeCache(), force_refresh=True,
+        job_store=JobStore(), source=f"refresh {os.path.basename(args.catalog)}", url_index=UrlIndex(),
+        on_result=report, history=history
+    )
+    try:
+        run.wait()
+    except KeyboardInterrupt:
+        run.cancel()
+        print("Cancelling, waiting for in-flight products...", file=sys.stderr)
+        run.wait()
+    finally:
+        run.close()
+    write_results(plan.rows, run.results, args.output)
+
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for row in plan.rows if not run.results.get(row["idx"]) or "Error" in run.results[row["idx"]])
+    pages = run.page_summary()
+    print(
+        f"Job {run.job_id}: {len(plan.rows) - failed} refreshed, {failed} failed, written to {args.output}; "
+        f"{pages['page_loads']} page loads in {elapsed:.1f} s", file=sys.stderr
+    )
+    return 1 if failed == len(plan.rows) else 0
+
+# Queue a catalog for worker processes; with --output wait for it and write the results
+def submit_command(args):
+    from .jobs import JobStore
+    from .worker import QueuedJob
+
+    rows = read_catalog(args.catalog)
+    job_store = JobStore()
+    job_id = job_store.create_job(rows, os.path.basename(args.catalog), queued=True)
+    print(f"Queued job {job_id} with {len(rows)} rows", file=sys.stderr)
+    if not args.output:
+        print(job_id)
+        return 0
+    job = QueuedJob(job_store, job_id, len(rows))
+    try:
+        while not job.done:
+            time.sleep(args.poll)
+            job.poll()
+            status = job.status
+            print(
+                f"{status['done']} done, {status['failed']} failed, {status['leased']} leased by {status['workers']} workers, "
+                f"{status['pending'] - status['leased']} waiting", file=sys.stderr
+            )
+    except KeyboardInterrupt:
+        job.cancel()
+        print(f"Cancelled job {job_id}; resume it with `scrape --resume {job_id}`", file=sys.stderr)
+    results = {row["idx"]: row["result"] for row in job_store.rows(job_id, statuses=("done",))}
+    write_results(rows, results, args.output)
+    elapsed = time.monotonic() - job.started_at
+    print(
+        f"Job {job_id}: {len(results)} done, {len(rows) - len(results)} not done, written to {args.output} "
+        f"({len(rows) / max(elapsed, 1e-9) * 60:.1f} products/min)", file=sys.stderr
+    )
+    return 0
+
+def worker_command(args):
+    from .worker import run_workers
+
+    run_workers(
+        processes=args.processes or os.cpu_count() or 1, exit_when_idle=args.exit_when_idle,
+        concurrency=args.concurrency, backend=args.backend, requests_per_second=args.max_rps,
+        lease_rows=args.lease_rows, lease_seconds=args.lease_seconds, cache_ttl_seconds=args.cache_ttl_hours * 3600
+    )
+    return 0
+
+# Rebuild results from archived pages with the current extractors and matcher,
+# for one job (its own snapshots) or for every archived product
+def reparse_command(args):
+    started = time.perf_counter()
+    from .archive import SnapshotArchive, reparse
+    from .cache import ScrapeCache, product_cache_key
+    from .jobs import JobStore
+
+    archive = SnapshotArchive(args.archive_dir)
+    job_store = JobStore()
+    previous = {}
+    if args.job_id:
+        rows = job_store.rows(args.job_id)
+        if not rows:
+            print(f"Job {args.job_id} not found", file=sys.stderr)
+            return 1
+        keys = {row["idx"]: product_cache_key(row["product_name"], row["model_number"]) for row in rows}
+        snapshots = archive.latest(set(keys.values()), job_id=args.job_id)
+        previous = {row["idx"]: row["result"] for row in rows if row["status"] != "pending"}
+        for row in rows:
+            entry = snapshots.get(keys[row["idx"]], {})
+            row["brand"], row["category"] = entry.get("brand"), entry.get("category")
+    else:
+        snapshots = archive.latest()
+        rows = [
+            {"idx": i, "product_name": entry["product_name"], "model_number": entry["model_number"],
+             "brand": entry["brand"], "category": entry["category"]}
+            for i, entry in enumerate(snapshots.values())
+        ]
+        keys = {row["idx"]: key for row, key in zip(rows, snapshots)}
+    if not snapshots:
+        print("No archived pages" + (f" for job {args.job_id}" if args.job_id else ""), file=sys.stderr)
+        return 1
+
+    rebuilt = dict(reparse(archive, snapshots.values(), workers=args.workers))
+    results = {
+        idx: rebuilt[key] if key in rebuilt else {"Error": "No archived pages"}
+        for idx, key in keys.items()
+    }
+    write_results(rows, results, args.output)
+    if args.update_job and args.job_id:
+        job_store.mark_done_many(args.job_id, [
+            (idx, result) for idx, result in results.items() if result and "Error" not in result
+        ])
+        for idx, result in results.items():
+            if not result or "Error" in result:
+                job_store.record_result(args.job_id, idx, result)
+    if args.update_cache:
+        ScrapeCache().put_many((key, result) for key, result in rebuilt.items() if result and "Error" not in result)
+
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for result in results.values() if not result or "Error" in result)
+    print(
+        f"Re-parsed {len(rebuilt)} archived products in {elapsed:.1f} s: {len(results) - failed} done, "
+        f"{failed} failed, written to {args.output}", file=sys.stderr
+    )
+    if previous:
+        fields = PRODUCT_FIELDS + ["Related Products"]
+        changed = sum(
+            1 for idx, result in results.items()
+            if [(result or {}).get(field) for field in fields] != [(previous.get(idx) or {}).get(field) for field in fields]
+        )
+        print(f"{changed} of {len(results)} rows differ from job {args.job_id}", file=sys.stderr)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="retail_intelligence", description="Headless Retail Intelligence scraper")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser("scrape", help="Scrape every product in an Excel catalog")
+    scrape.add_argument("catalog", help="Excel file with Brand, Category, Product Name and Model Number columns")
+    scrape.add_argument("-o", "--output", required=True, help="Output file (.csv, .parquet, .jsonl or .xlsx)")
+    scrape.add_argument("--concurrency", type=int, default=6, help="Upper bound for the adaptive worker count")
+    scrape.add_argument("--max-rps", type=float, default=MAX_REQUESTS_PER_SECOND, help="Page requests per second across all workers (0 for no limit)")
+    scrape.add_argument("--backend", choices=["http", "selenium"], default="http")
+    scrape.add_argument("--cache-ttl-hours", type=float, default=24.0)
+    scrape.add_argument("--force-refresh", action="store_true", help="Ignore cached results")
+    scrape.add_argument("--no-cache", action="store_true", help="Neither read nor write the result cache")
+    scrape.add_argument("--no-url-index", action="store_true", help="Always search instead of opening indexed product URLs")
+    scrape.add_argument("--no-grouping", action="store_true", help="Search every distinct product separately")
+    scrape.add_argument("--no-hedge", action="store_true", help="Never start a duplicate attempt for slow products")
+    scrape.add_argument("--long-format-dir", metavar="DIR", help="Also append products and competitors tables to DIR as results arrive")
+    scrape.add_argument("--long-format", action="append", choices=LONG_FORMATS, help="Long-format table format (repeatable, default: all)")
+    scrape.add_argument("--resume", metavar="JOB_ID", help="Skip rows already completed by this job")
+    scrape.add_argument("--trace", metavar="FILE", help="Append per-stage spans to FILE instead of the daily trace under the data directory")
+    scrape.add_argument("--archive", action="store_true", help="Keep a compressed snapshot of every fetched page for reparse")
+    scrape.add_argument("--archive-dir", metavar="DIR", help="Snapshot archive location (default: snapshots in the data directory)")
+    scrape.add_argument("--no-history", action="store_true", help="Do not append prices, ratings and review counts to the history")
+    scrape.set_defaults(handler=scrape_command)
+
+    trace = commands.add_parser("trace", help="Per-stage latency percentiles and outcomes from JSONL trace files")
+    trace.add_argument("trace_files", nargs="+", metavar="FILE")
+    trace.add_argument("--since", type=float, metavar="HOURS", help="Only spans from the last HOURS hours")
+    trace.set_defaults(handler=trace_command)
+
+    refresh = commands.add_parser("refresh", help="Re-scrape the products most likely to have changed, within a daily page budget")
+    refresh.add_argument("catalog", help="Excel file with Brand, Category, Product Name and Model Number columns")
+    refresh.add_argument("-o", "--output", required=True, help="Output file for the refreshed rows (.csv, .parquet, .jsonl or .xlsx)")
+    refresh.add_argument("--budget", type=float, default=REFRESH_PAGE_BUDGET, help="Page loads per 24 hours across all runs")
+    refresh.add_argument("--concurrency", type=int, default=6, help="Upper bound for the adaptive worker count")
+    refresh.add_argument("--max-rps", type=float, default=MAX_REQUESTS_PER_SECOND, help="Page requests per second across all workers (0 for no limit)")
+    refresh.add_argument("--backend", choices=["http", "selenium"], default="http")
+    refresh.add_argument("--dry-run", action="store_true", help="Print the plan without scraping")
+    refresh.add_argument("--show", type=int, default=20, help="Planned products listed by --dry-run")
+    refresh.set_defaults(handler=refresh_command)
+
+    submit = commands.add_parser("submit", help="Queue a catalog for `worker` processes")
+    submit.add_argument("catalog", help="Excel file with Brand, Category, Product Name and Model Number columns")
+    submit.add_argument("-o", "--output", help="Wait for the job and write its results here (.csv, .parquet, .jsonl or .xlsx)")
+    submit.add_argument("--poll", type=float, default=2.0, help="Seconds between progress checks while waiting")
+    submit.set_defaults(handler=submit_command)
+
+    worker = commands.add_parser("worker", help="Scrape rows from queued jobs until stopped")
+    worker.add_argument("--processes", type=int, help="Worker processes on this host (default: one per CPU)")
+    worker.add_argument("--concurrency", type=int, default=6, help="Upper bound for the adaptive worker count in each process")
+    worker.add_argument("--max-rps", type=float, default=MAX_REQUESTS_PER_SECOND, help="Page requests per second for each process (0 for no limit)")
+    worker.add_argument("--backend", choices=["http", "selenium"], default="http")
+    worker.add_argument("--cache-ttl-hours", type=float, default=24.0)
+    worker.add_argument("--lease-rows", type=int, default=LEASE_ROWS, help="Rows leased at a time")
+    worker.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS, help="Visibility timeout: unrenewed leases go back to the queue after this long")
+    worker.add_argument("--exit-when-idle", action="store_true", help="Exit once no queued rows are left")
+    worker.set_defaults(handler=worker_command)
+
+    reparse = commands.add_parser("reparse", help="Rebuild results from archived pages after an extractor or matching fix")
+    reparse.add_argument("job_id", nargs="?", metavar="JOB_ID", help="Job to rebuild (default: every archived product)")
+    reparse.add_argument("-o", "--output", required=True, help="Output file (.csv, .parquet, .jsonl or .xlsx)")
+    reparse.add_argument("--workers", type=int, help="Parser processes (default: one per CPU)")
+    reparse.add_argument("--archive-dir", metavar="DIR", help="Snapshot archive location (default: snapshots in the data directory)")
+    reparse.add_argument("--update-job", action="store_true", help="Store the rebuilt results in the job")
+    reparse.add_argument("--update-cache", action="store_true", help="Store the rebuilt results in the result cache")
+    reparse.set_defaults(handler=reparse_command)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
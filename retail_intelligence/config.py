@@ -0,0 +1,57 @@
+import os
+
+# Local state (scrape cache etc.) lives here
+DATA_DIR = os.environ.get("RETAIL_INTELLIGENCE_DATA_DIR", ".retail_intelligence")
+
+# Job checkpoints and the worker queue; point every worker at the same file to share one queue
+JOBS_DB = os.environ.get("RETAIL_INTELLIGENCE_JOBS_DB", os.path.join(DATA_DIR, "jobs.sqlite"))
+
+# Per-stage spans are appended to one JSONL file per day here (empty to keep them in memory only)
+TRACE_DIR = os.environ.get("RETAIL_INTELLIGENCE_TRACE_DIR", os.path.join(DATA_DIR, "traces"))
+
+# Point the scrapers at a local stand-in server (e.g. benchmarks/fixture_server.py) for testing
+AMAZON_BASE_URL = os.environ.get("AMAZON_BASE_URL", "https://www.amazon.in").rstrip("/")
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/99.0.4844.74 Safari/537.36"
+CAROUSEL_XPATH = '//div[contains(@id, "sp_detail_thematic-prime_theme_for_non_prime_members")]'
+RESULT_CARD_XPATH = '//div[contains(@data-component-type, "s-search-result")]'
+
+# Seconds each Selenium stage may wait for its readiness condition
+STAGE_TIMEOUTS = {
+    "home": 10,
+    "search": 10,
+    "detail": 10,
+    "carousel": 3,
+}
+
+# URL patterns for Network.setBlockedURLs, grouped so each stage can pick what it blocks
+BLOCKED_RESOURCES = {
+    "images": ["*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.m3u8", "*.ts", "*.mp3"],
+    "third_party": ["*doubleclick.net*", "*googlesyndication.com*", "*google-analytics.com*", "*googletagmanager.com*", "*facebook.net*", "*fls-eu.amazon.*", "*fls-na.amazon.*", "*unagi.amazon.*"],
+    "ads": ["*amazon-adsystem.com*", "*aax-eu.amazon.*"],
+}
+
+# The product page keeps ad scripts so the sponsored competitor carousel still renders
+STAGE_BLOCKING = {
+    "home": ["images", "fonts", "media", "third_party", "ads"],
+    "search": ["images", "fonts", "media", "third_party", "ads"],
+    "detail": ["images", "fonts", "media", "third_party"],
+}
+
+# Anti-bot pages Amazon serves instead of the requested page when it throttles a client
+BLOCK_STATUSES = (429, 503)
+BLOCK_MARKERS = {
+    "captcha": "/errors/validateCaptcha",
+    "robot check": "<title>Robot Check</title>",
+    "automated access": "api-services-support@amazon.com",
+}
+
+# Page requests per second shared by every worker in the process (0 disables the budget)
+MAX_REQUESTS_PER_SECOND = float(os.environ.get("RETAIL_INTELLIGENCE_MAX_RPS", "2"))
+
+# Page loads per 24 hours the refresh command may spend, counting every run
+REFRESH_PAGE_BUDGET = float(os.environ.get("RETAIL_INTELLIGENCE_REFRESH_BUDGET", "2000"))
+
+# Columns the Excel template must provide
+REQUIRED_COLUMNS = ["Brand", "Category", "Product Name", "Model Number"]
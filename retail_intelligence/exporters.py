@@ -0,0 +1,207 @@
+import os
+import re
+import tempfile
+import zipfile
+from threading import Lock
+
+from .results_store import build_tables
+
+# Excel sheet names: at most 31 characters, none of []:*?/\, unique ignoring case
+SHEET_NAME_LIMIT = 31
+INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+# constant_memory keeps one temp file open per worksheet until the workbook closes,
+# so only the first products get a sheet of their own; every competitor row is
+# also in the Competitors sheet
+MAX_PRODUCT_SHEETS = 250
+
+SUMMARY_HEADER = ["Product Name", "Title on Amazon", "Price", "Reviews Count", "Rating", "Competitors Found", "Sheet"]
+PRODUCT_PARAMETERS = [("Title", "Title"), ("Price", "Price"), ("Reviews", "Reviews Count"), ("Rating", "Ranking"), ("URL", "Product Link")]
+COMPETITOR_HEADER = ["Competitor #", "Title", "Price", "Rating", "Reviews"]
+# Product sheets keep the dashboard's layout: parameters on top, competitors from row 9
+COMPETITOR_START_ROW = 8
+
+LONG_FORMATS = ("csv", "parquet", "jsonl")
+# Results buffered before the long-format tables are appended to; one Parquet row group per write
+FLUSH_RESULTS = 100
+
+# Hands out valid, unique sheet names in the order products are written
+class SheetNamer:
+    def __init__(self, reserved=()):
+        self._used = {name.lower() for name in reserved}
+
+    def __call__(self, name):
+        base = INVALID_SHEET_CHARS.sub("_", str(name)).strip("' ") or "Product"
+        candidate = base[:SHEET_NAME_LIMIT]
+        number = 2
+        while candidate.lower() in self._used:
+            suffix = f" ({number})"
+            candidate = base[:SHEET_NAME_LIMIT - len(suffix)].rstrip() + suffix
+            number += 1
+        self._used.add(candidate.lower())
+        return candidate
+
+def _cell(value):
+    return "N/A" if value is None else value
+
+# Stream (product_name, result) pairs into an .xlsx file row by row; returns the path.
+# Without a path the workbook goes to a temp file the caller is responsible for.
+def export_workbook(items, path=None, max_product_sheets=MAX_PRODUCT_SHEETS):
+    import xlsxwriter
+
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="retail_intelligence_", suffix=".xlsx")
+        os.close(fd)
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "strings_to_urls": False})
+    try:
+        bold = workbook.add_format({"bold": True})
+        summary = workbook.add_worksheet("Summary")
+        summary.write_row(0, 0, SUMMARY_HEADER, bold)
+        competitors_sheet = workbook.add_worksheet("Competitors")
+        competitors_sheet.write_row(0, 0, ["Product Name"] + COMPETITOR_HEADER, bold)
+        namer = SheetNamer(reserved=["Summary", "Competitors"])
+        summary_row = competitor_row = 0
+        for product_name, result in items:
+            competitors = result.get("Related Products") or []
+            sheet_name = namer(product_name) if summary_row < max_product_sheets else None
+            summary_row += 1
+            summary.write_row(summary_row, 0, [
+                product_name, _cell(result.get("Title")), _cell(result.get("Price")),
+                _cell(result.get("Reviews Count")), _cell(result.get("Ranking")), len(competitors), sheet_name or "",
+            ])
+            competitor_rows = [
+                [number, _cell(comp.get("Title")), _cell(comp.get("Price")), _cell(comp.get("Rating")), _cell(comp.get("Reviews"))]
+                for number, comp in enumerate(competitors, start=1)
+            ]
+            for values in competitor_rows:
+                competitor_row += 1
+                competitors_sheet.write_row(competitor_row, 0, [product_name] + values)
+            if sheet_name is None:
+                continue
+            sheet = workbook.add_worksheet(sheet_name)
+            sheet.write_row(0, 0, ["Parameter", "Value"], bold)
+            for row, (label, field) in enumerate(PRODUCT_PARAMETERS, start=1):
+                sheet.write_row(row, 0, [label, _cell(result.get(field))])
+            if competitor_rows:
+                sheet.write_row(COMPETITOR_START_ROW, 0, COMPETITOR_HEADER, bold)
+                for row, values in enumerate(competitor_rows, start=COMPETITOR_START_ROW + 1):
+                    sheet.write_row(row, 0, values)
+    finally:
+        workbook.close()
+    return path
+
+# Append-only writers for one long-format table
+class _CsvTable:
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self._file, header=self._header, index=False)
+        self._header = False
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class _JsonlTable:
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, df):
+        if len(df):
+            self._file.write(df.to_json(orient="records", lines=True, force_ascii=False))
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class _ParquetTable:
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+        if table.num_rows:
+            self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+_TABLE_WRITERS = {"csv": _CsvTable, "parquet": _ParquetTable, "jsonl": _JsonlTable}
+
+# products.<format> and competitors.<format> under `directory`, appended to as results
+# arrive (any thread). Parquet files are only readable after close().
+class LongFormatWriter:
+    def __init__(self, directory, formats=LONG_FORMATS, flush_every=FLUSH_RESULTS):
+        unknown = [fmt for fmt in formats if fmt not in _TABLE_WRITERS]
+        if unknown:
+            raise ValueError(f"Unsupported long-format export: {', '.join(unknown)} (use {', '.join(LONG_FORMATS)})")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_every = flush_every
+        self.paths = {
+            (table, fmt): os.path.join(directory, f"{table}.{fmt}")
+            for fmt in formats for table in ("products", "competitors")
+        }
+        self._tables = {key: _TABLE_WRITERS[key[1]](path) for key, path in self.paths.items()}
+        self._lock = Lock()
+        self._pending = []
+        self.products_written = 0
+        self.competitors_written = 0
+        self.closed = False
+
+    def add(self, product_key, result, metadata=None):
+        if not result or "Error" in result:
+            return
+        with self._lock:
+            self._pending.append((product_key, result, metadata))
+            if len(self._pending) >= self.flush_every:
+                self._write()
+
+    def _write(self):
+        pending, self._pending = self._pending, []
+        if not pending or self.closed:
+            return
+        products, competitors = build_tables(pending)
+        for (table, _), writer in self._tables.items():
+            writer.write(products if table == "products" else competitors)
+        self.products_written += len(products)
+        self.competitors_written += len(competitors)
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        with self._lock:
+            self._write()
+            if not self.closed:
+                self.closed = True
+                for writer in self._tables.values():
+                    writer.close()
+
+# Both long-format tables in one format, zipped, for a single download
+def long_format_archive(products, competitors, fmt):
+    with tempfile.TemporaryDirectory(prefix="retail_intelligence_") as directory:
+        tables = {"products": products, "competitors": competitors}
+        for table, df in tables.items():
+            writer = _TABLE_WRITERS[fmt](os.path.join(directory, f"{table}.{fmt}"))
+            try:
+                writer.write(df)
+            finally:
+                writer.close()
+        archive = os.path.join(directory, "export.zip")
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for table in tables:
+                zf.write(os.path.join(directory, f"{table}.{fmt}"), f"{table}.{fmt}")
+        with open(archive, "rb") as f:
+            return f.read()
@@ -0,0 +1,197 @@
+import os
+import time
+from threading import Lock
+
+from .cache import row_cache_key
+from .config import DATA_DIR
+from .storage import ensure_parent_dir, sqlite_connection
+
+# Observations buffered before they are written to SQLite
+FLUSH_OBSERVATIONS = 50
+
+# Price, rating and review count of every scraped product over time, as numbers
+# (one small row per scrape), plus a per-product summary the refresh planner reads
+# without scanning the series: when it was last seen and how often its price moved.
+# Page loads of every run are logged too, for the daily refresh budget.
+class PriceHistory:
+    def __init__(self, path=None, flush_every=FLUSH_OBSERVATIONS):
+        self.path = path or os.path.join(DATA_DIR, "history.sqlite")
+        self.flush_every = flush_every
+        self._lock = Lock()
+        self._pending = []
+        ensure_parent_dir(self.path)
+        with sqlite_connection(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS observations ("
+                "product_key TEXT NOT NULL, observed_at REAL NOT NULL, "
+                "price REAL, rating REAL, review_count INTEGER, competitors INTEGER, "
+                "PRIMARY KEY (product_key, observed_at)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                "product_key TEXT PRIMARY KEY, product_name TEXT, model_number TEXT, brand TEXT, category TEXT, "
+                "first_seen REAL NOT NULL, last_seen REAL NOT NULL, observations INTEGER NOT NULL, "
+                "price_changes INTEGER NOT NULL, last_price REAL, last_change_at REAL, competitors INTEGER)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS runs (finished_at REAL NOT NULL, products INTEGER, page_loads INTEGER)")
+
+    # Append one scraped result. A search without a match only moves last_seen, so the
+    # product is not retried first every time; errors may be transient and are skipped.
+    def record(self, row, result):
+        if result is not None and "Error" in result:
+            return
+        with self._lock:
+            self._pending.append((row, result, time.time()))
+            if len(self._pending) >= self.flush_every:
+                self._write()
+
+    def _write(self):
+        from .results_store import parse_prices, parse_ratings, parse_review_counts
+
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        unmatched = [
+            (row_cache_key(row), observed_at, row["product_name"],
+             _text(row.get("model_number")), _text(row.get("brand")), _text(row.get("category")))
+            for row, result, observed_at in pending if result is None
+        ]
+        pending = [item for item in pending if item[1] is not None]
+        prices = parse_prices([result.get("Price") for _, result, _ in pending])
+        ratings = parse_ratings([result.get("Ranking") for _, result, _ in pending])
+        reviews = parse_review_counts([result.get("Reviews Count") for _, result, _ in pending])
+        records = []
+        for i, (row, result, observed_at) in enumerate(pending):
+            records.append((
+                row_cache_key(row),
+                observed_at, _number(prices[i]), _number(ratings[i]), _number(reviews[i]),
+                len(result.get("Related Products") or []),
+                row["product_name"], _text(row.get("model_number")), _text(row.get("brand")), _text(row.get("category")),
+            ))
+        with sqlite_connection(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?, ?, ?)", [record[:6] for record in records]
+            )
+            # A price change is a known price that differs from the last known one
+            conn.executemany(
+                "INSERT INTO products VALUES (?1, ?5, ?6, ?7, ?8, ?2, ?2, 1, 0, ?3, NULL, ?4) "
+                "ON CONFLICT (product_key) DO UPDATE SET "
+                "last_seen = excluded.last_seen, observations = observations + 1, "
+                "price_changes = price_changes + (excluded.last_price IS NOT NULL AND last_price IS NOT NULL "
+                "AND excluded.last_price != last_price), "
+                "last_change_at = CASE WHEN excluded.last_price IS NOT NULL AND last_price IS NOT NULL "
+                "AND excluded.last_price != last_price THEN excluded.last_seen ELSE last_change_at END, "
+                "last_price = COALESCE(excluded.last_price, last_price), competitors = excluded.competitors, "
+                "brand = COALESCE(excluded.brand, brand), category = COALESCE(excluded.category, category)",
+                [record[:3] + record[5:] for record in records]
+            )
+            conn.executemany(
+                "INSERT INTO products VALUES (?1, ?3, ?4, ?5, ?6, ?2, ?2, 0, 0, NULL, NULL, 0) "
+                "ON CONFLICT (product_key) DO UPDATE SET last_seen = excluded.last_seen",
+                unmatched
+            )
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    # Page loads of one finished run, counted against the daily refresh budget
+    def record_run(self, products, page_loads):
+        with sqlite_connection(self.path) as conn:
+            conn.execute("INSERT INTO runs VALUES (?, ?, ?)", (time.time(), products, page_loads))
+
+    def page_loads_since(self, since):
+        with sqlite_connection(self.path) as conn:
+            return conn.execute("SELECT COALESCE(SUM(page_loads), 0) FROM runs WHERE finished_at >= ?", (since,)).fetchone()[0]
+
+    # Average page loads per scraped product over recent runs; None before the first run
+    def pages_per_product(self, runs=20):
+        with sqlite_connection(self.path) as conn:
+            products, page_loads = conn.execute(
+                "SELECT SUM(products), SUM(page_loads) FROM ("
+                "SELECT products, page_loads FROM runs WHERE products > 0 ORDER BY finished_at DESC LIMIT ?)",
+                (runs,)
+            ).fetchone()
+        return page_loads / products if products else None
+
+    # {product_key: summary dict} for the given keys (all products when None)
+    def summaries(self, product_keys=None):
+        self.flush()
+        query = (
+            "SELECT product_key, first_seen, last_seen, observations, price_changes, "
+            "last_price, last_change_at, competitors FROM products"
+        )
+        with sqlite_connection(self.path) as conn:
+            if product_keys is None:
+                records = conn.execute(query).fetchall()
+            else:
+                keys = list(dict.fromkeys(product_keys))
+                records = []
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    records += conn.execute(query + f" WHERE product_key IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        return {
+            key: {
+                "first_seen": first_seen, "last_seen": last_seen, "observations": observations,
+                "price_changes": price_changes, "last_price": last_price, "last_change_at": last_change_at,
+                "competitors": competitors,
+            }
+            for key, first_seen, last_seen, observations, price_changes, last_price, last_change_at, competitors in records
+        }
+
+    # One product's observations, oldest first
+    def series(self, product_key):
+        import pandas as pd
+
+        self.flush()
+        with sqlite_connection(self.path) as conn:
+            records = conn.execute(
+                "SELECT observed_at, price, rating, review_count, competitors FROM observations "
+                "WHERE product_key = ? ORDER BY observed_at", (product_key,)
+            ).fetchall()
+        series = pd.DataFrame(records, columns=["observed_at", "price", "rating", "review_count", "competitors"])
+        series["observed_at"] = pd.to_datetime(series["observed_at"], unit="s")
+        return series
+
+    # Price, rating and review movement since the previous priced scrape and since the first one
+    def deltas(self, product_key):
+        series = self.series(product_key)
+        priced = series.dropna(subset=["price"])
+        if priced.empty:
+            return None
+        latest = priced.iloc[-1]
+        first = priced.iloc[0]
+        previous = priced.iloc[-2] if len(priced) > 1 else None
+        changed = priced["price"].diff().fillna(0) != 0
+        return {
+            "price": latest["price"],
+            "previous_price": None if previous is None else previous["price"],
+            "price_change": None if previous is None else latest["price"] - previous["price"],
+            "price_change_pct": None if previous is None else _percent(latest["price"], previous["price"]),
+            "first_price": first["price"],
+            "change_since_first_pct": _percent(latest["price"], first["price"]),
+            "rating_change": None if previous is None else _difference(latest["rating"], previous["rating"]),
+            "review_change": None if previous is None else _difference(latest["review_count"], previous["review_count"]),
+            "observations": len(series),
+            "price_changes": int(changed.sum()),
+            "first_seen": series["observed_at"].iloc[0],
+            "last_change_at": priced["observed_at"][changed].iloc[-1] if changed.any() else None,
+        }
+
+def _number(value):
+    import pandas as pd
+
+    return None if pd.isna(value) else value.item() if hasattr(value, "item") else value
+
+def _text(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
+
+def _difference(after, before):
+    import pandas as pd
+
+    return None if pd.isna(after) or pd.isna(before) else after - before
+
+def _percent(after, before):
+    return (after - before) / before * 100 if before else None
@@ -0,0 +1,257 @@
+import time
+from threading import Lock
+from urllib.parse import quote_plus
+
+from .config import AMAZON_BASE_URL, CAROUSEL_XPATH, RESULT_CARD_XPATH, STAGE_TIMEOUTS, USER_AGENT
+from .matching import match_row
+from .metrics import record_page_load
+from .parsing import BlockedError, JavaScriptRequired, detect_block, parse_competitor_label
+from .throttle import pace_request
+from .tracing import span
+from .url_index import is_same_listing
+
+# Keep-alive HTTP session shared by all workers
+_http_session = None
+_http_session_lock = Lock()
+
+def get_http_session():
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept-Language": "en-IN,en;q=0.9",
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            })
+            _http_session = session
+        return _http_session
+
+# timeout is the stage deadline for the whole download; requests' own timeout only
+# bounds each socket read, so a server trickling bytes could otherwise hold a worker.
+# Callers pace_request() first, outside the traced stage, so spans time the page alone.
+def fetch_response(url, timeout=10, metrics=None):
+    start = time.perf_counter()
+    response = get_http_session().get(url, timeout=timeout, stream=True)
+    chunks = []
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        chunks.append(chunk)
+        if time.perf_counter() - start > timeout:
+            response.close()
+            raise TimeoutError(f"{url} did not load within {timeout} s")
+    response._content = b"".join(chunks)
+    record_page_load(metrics, time.perf_counter() - start, len(response.content))
+    reason = detect_block(response.status_code, response.text)
+    if reason is not None:
+        raise BlockedError(f"{reason} for {url}")
+    return response
+
+def fetch_page(url, timeout=10, metrics=None):
+    response = fetch_response(url, timeout, metrics)
+    if response.status_code != 200:
+        raise JavaScriptRequired(f"HTTP {response.status_code} for {url}")
+    return response.text
+
+def _text(node, xpath):
+    found = node.xpath(xpath)
+    if not found:
+        return None
+    text = " ".join(found[0].text_content().split())
+    return text or None
+
+def parse_search_results(page_html):
+    from lxml import html as lxml_html
+
+    tree = lxml_html.fromstring(page_html)
+    cards = []
+    for product in tree.xpath(RESULT_CARD_XPATH):
+        links = product.xpath('.//a[contains(@class, "a-link-normal")][@href]/@href')
+        cards.append({
+            "title": _text(product, './/h2/span'),
+            "link": links[0] if links else None,
+            "sponsored": bool(product.xpath('.//span[contains(text(), "Sponsored")]')),
+        })
+    return cards
+
+def parse_product_page(page_html, product_link):
+    from lxml import html as lxml_html
+
+    with span("field_extraction", backend="http") as stage:
+        tree = lxml_html.fromstring(page_html)
+        title = _text(tree, '//*[@id="productTitle"]')
+        if title is None:
+            raise JavaScriptRequired("productTitle missing from static HTML")
+
+        price = _text(tree, './/span[contains(@class, "a-price-whole")]')
+        if price is None:
+            stage.miss("price")
+        price = price.rstrip(".") if price else "Price Not Found"
+        reviews = _text(tree, '//span[@id="acrCustomerReviewText"]')
+        if reviews is None:
+            stage.miss("reviews")
+        reviews = reviews or "No Reviews"
+        ranking = tree.xpath('//span[@id="acrPopover"]/@title')
+        if not ranking:
+            stage.miss("ranking")
+        ranking = ranking[0] if ranking else "Ranking Not Available"
+
+    related_products = []
+    with span("carousel_extraction", backend="http") as stage:
+        carousel = tree.xpath(CAROUSEL_XPATH)
+        if not carousel:
+            stage.miss("carousel")
+        else:
+            competitors = carousel[0].xpath('.//li[contains(@class, "a-carousel-card")]')
+            if not competitors:
+                raise JavaScriptRequired("competitor carousel is rendered client-side")
+            for comp in competitors[:5]:
+                comp_title = _text(comp, './/div[contains(@class, "sponsored-products-truncator-afo-4")]') or "Title Not Available"
+                comp_price = _text(comp, './/span[@class="a-price-whole"]')
+                comp_price = comp_price.rstrip(".") if comp_price else "Price Not Available"
+                label = comp.xpath('.//a[contains(@class, "adReviewLink")]/@aria-label')
+                comp_ranking, comp_reviews = parse_competitor_label(label[0] if label else None)
+                related_products.append({
+                    "Title": comp_title,
+                    "Price": comp_price,
+                    "Rating": comp_ranking,
+                    "Reviews": comp_reviews
+                })
+        stage.set(competitors=len(related_products))
+
+    return {
+        "Title": title,
+        "Price": price,
+        "Reviews Count": reviews,
+        "Ranking": ranking,
+        "Product Link": product_link,
+        "Related Products": related_products
+    }
+
+# Go straight to the indexed product page; None means fall back to the search.
+# Dead links and redirects to another listing are dropped from the index.
+def fetch_indexed_product(url_index, model_number, timeouts, metrics=None, archive=None, row=None):
+    entry = url_index.lookup(model_number)
+    if entry is None:
+        return None
+    pace_request()
+    with span("detail_page", backend="http", source="index", url=entry["url"]) as stage:
+        response = fetch_response(entry["url"], timeout=timeouts["detail"], metrics=metrics)
+        stage.set(status=response.status_code)
+        if response.status_code in (404, 410) or not is_same_listing(response.url, entry["asin"]):
+            stage.outcome = "stale_link"
+            url_index.forget(model_number)
+            return None
+        if response.status_code != 200:
+            stage.outcome = "error"
+            return None
+    if archive is not None:
+        archive.save("detail", entry["url"], response.text, [row], confidence=entry["confidence"])
+    product_info = parse_product_page(response.text, entry["url"])
+    product_info["Match Confidence"] = entry["confidence"]
+    return product_info
+
+# Search stage: result cards for a query; [] when Amazon reports no results.
+# With an archive the page is saved for `rows` before it is parsed.
+def fetch_search_cards(query, timeouts, metrics=None, archive=None, rows=()):
+    pace_request()
+    url = f"{AMAZON_BASE_URL}/s?k={quote_plus(query)}"
+    with span("search_page", backend="http"):
+        search_html = fetch_page(url, timeout=timeouts["search"], metrics=metrics)
+    if archive is not None:
+        archive.save("search", url, search_html, rows, query)
+    with span("card_parsing", backend="http") as stage:
+        cards = parse_search_results(search_html)
+        stage.set(cards=len(cards))
+        if not cards:
+            if "did not match any products" in search_html or "No results for" in search_html:
+                stage.outcome = "no_results"
+                return []
+            raise JavaScriptRequired("no search result cards in static HTML")
+    return cards
+
+# Browserless backend for one search group: a single search page is shared by every
+# row, and each row is matched against it with its own model number and brand.
+# Returns ({idx: product_info, None for no match or {"Error": ...} when a page
+# failed}, rows that need the Selenium backend); raises BlockedError when Amazon
+# serves an anti-bot page instead.
+def search_group_http(query, rows, timeouts=None, metrics=None, url_index=None, archive=None):
+    timeouts = {**STAGE_TIMEOUTS, **(timeouts or {})}
+    results = {}
+    pending = []
+    # An indexed page that needs JavaScript goes to Selenium, which opens the index
+    # entry itself, instead of repeating the search and detail fetch over HTTP
+    needs_browser = []
+    for row in rows:
+        try:
+            product_info = fetch_indexed_product(url_index, row.get("model_number"), timeouts, metrics, archive, row) if url_index is not None else None
+        except JavaScriptRequired:
+            needs_browser.append(row)
+            continue
+        except BlockedError:
+            raise
+        except Exception as e:
+            print(f"Error: {e}")
+            product_info = None
+        if product_info is not None:
+            results[row["idx"]] = product_info
+        else:
+            pending.append(row)
+    if not pending:
+        return results, needs_browser
+
+    try:
+        cards = fetch_search_cards(query, timeouts, metrics, archive, pending)
+    except JavaScriptRequired:
+        return results, needs_browser + pending
+    except BlockedError:
+        raise
+    except Exception as e:
+        print(f"Error: {e}")
+        return {**results, **{row["idx"]: {"Error": f"{type(e).__name__}: {e}"} for row in pending}}, needs_browser
+    if not cards:
+        print("No products found.")
+        return {**results, **{row["idx"]: None for row in pending}}, needs_browser
+
+    pages = {}
+    page_htmls = {}
+    for row in pending:
+        try:
+            best_match, best_match_link, confidence = match_row(row, cards)
+            if best_match is None:
+                print("No suitable match found.")
+                results[row["idx"]] = None
+                continue
+            # Variants that resolve to the same listing share one detail fetch
+            if best_match_link not in page_htmls:
+                pace_request()
+                with span("detail_page", backend="http", source="search", url=best_match_link):
+                    page_htmls[best_match_link] = fetch_page(best_match_link, timeout=timeouts["detail"], metrics=metrics)
+            if archive is not None:
+                archive.save("detail", best_match_link, page_htmls[best_match_link], [row], query, confidence)
+            if best_match_link not in pages:
+                pages[best_match_link] = parse_product_page(page_htmls[best_match_link], best_match_link)
+            results[row["idx"]] = {**pages[best_match_link], "Match Confidence": confidence}
+            if url_index is not None:
+                url_index.remember(row.get("model_number"), best_match_link, confidence)
+        except JavaScriptRequired:
+            needs_browser.append(row)
+        except BlockedError:
+            raise
+        except Exception as e:
+            print(f"Error: {e}")
+            results[row["idx"]] = {"Error": f"{type(e).__name__}: {e}"}
+    return results, needs_browser
+
+# Browserless backend for a single product: plain HTTP fetch + lxml parse, no Chrome involved
+def search_amazon_http(product_name, timeouts=None, metrics=None, model_number=None, brand=None, url_index=None, archive=None):
+    row = {"idx": 0, "product_name": product_name, "model_number": model_number, "brand": brand}
+    results, needs_browser = search_group_http(product_name, [row], timeouts, metrics, url_index, archive)
+    if needs_browser:
+        raise JavaScriptRequired(f"{product_name} needs a browser")
+    return results[0]
@@ -0,0 +1,118 @@
+import time
+import zipfile
+from io import BytesIO
+
+from .cache import normalize_key_part, product_cache_key
+from .config import REQUIRED_COLUMNS
+from .matching import has_value
+
+ROW_FIELDS = {"Brand": "brand", "Category": "category", "Product Name": "product_name", "Model Number": "model_number"}
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__(f"missing required columns: {', '.join(missing)}")
+
+def _text(value):
+    if not has_value(value):
+        return None
+    # Model numbers typed as numbers come back as 1234.0
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return " ".join(str(value).split())
+
+# Catalog rows in sheet order plus a product name -> row index, so lookups
+# from the dashboard are dict hits instead of DataFrame scans
+class Catalog:
+    def __init__(self, rows, index, duplicates, skipped, seconds):
+        self.rows = rows
+        self.index = index
+        self.duplicates = duplicates
+        self.skipped = skipped
+        self.seconds = seconds
+
+    @property
+    def product_names(self):
+        return [row["product_name"] for row in self.rows]
+
+    def lookup(self, product_name):
+        return self.index.get(normalize_key_part(product_name))
+
+    def preview(self, count=10):
+        import pandas as pd
+
+        return pd.DataFrame(
+            [{column: row[field] for column, field in ROW_FIELDS.items()} for row in self.rows[:count]],
+            columns=REQUIRED_COLUMNS,
+        )
+
+    def __len__(self):
+        return len(self.rows)
+
+def _xlsx_rows(source):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+# .xls has no streaming reader; it is small by construction (65,536 rows at most)
+def _legacy_rows(source):
+    import pandas as pd
+
+    df = pd.read_excel(source, header=None, dtype=object)
+    yield from df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    is_xlsx = zipfile.is_zipfile(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return _xlsx_rows(source) if is_xlsx else _legacy_rows(source)
+
+# Validate, normalize and (optionally) dedupe an Excel catalog in one streaming pass.
+# Rows without a product name are skipped; a row repeats another when its name and
+# model number both match. With dedupe=False repeats stay as separate rows (the query
+# planner coalesces them). The name index keeps the first row with each name.
+def read_catalog(source, dedupe=True):
+    started = time.perf_counter()
+    rows = []
+    index = {}
+    seen = set()
+    duplicates = skipped = 0
+    positions = None
+    # Brand and Category repeat across rows; keep one string object per value
+    shared = {}
+    for values in _open(source):
+        if positions is None:
+            if not any(has_value(value) for value in values):
+                continue
+            header = [_text(value) for value in values]
+            missing = [column for column in REQUIRED_COLUMNS if column not in header]
+            if missing:
+                raise MissingColumnsError(missing)
+            positions = {ROW_FIELDS[column]: header.index(column) for column in REQUIRED_COLUMNS}
+            continue
+        row = {field: _text(values[position]) if position < len(values) else None for field, position in positions.items()}
+        if row["product_name"] is None:
+            skipped += 1
+            continue
+        for field in ("brand", "category"):
+            if row[field] is not None:
+                row[field] = shared.setdefault(row[field], row[field])
+        key = product_cache_key(row["product_name"], row["model_number"])
+        if key in seen:
+            duplicates += 1
+            if dedupe:
+                continue
+        else:
+            seen.add(key)
+        index.setdefault(normalize_key_part(row["product_name"]), row)
+        row["idx"] = len(rows)
+        rows.append(row)
+    if positions is None:
+        raise MissingColumnsError(list(REQUIRED_COLUMNS))
+    return Catalog(rows, index, duplicates, skipped, time.perf_counter() - started)
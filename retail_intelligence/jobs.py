@@ -0,0 +1,271 @@
+import json
+import time
+import uuid
+from threading import Lock
+
+from .config import JOBS_DB
+from .storage import ensure_parent_dir, sqlite_connection
+
+# Leased rows are retried this often (crashed workers, transient errors) before they fail
+MAX_ATTEMPTS = 3
+
+# Checkpoint store for batch runs: one row per catalog line with pending / done / failed status.
+# Jobs submitted with queued=True also form a work queue: worker processes lease pending
+# rows for a visibility timeout, and rows whose lease runs out are handed to another worker.
+class JobStore:
+    def __init__(self, path=None):
+        self.path = path or JOBS_DB
+        self._lock = Lock()
+        ensure_parent_dir(self.path)
+        with sqlite_connection(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, source TEXT, created_at REAL NOT NULL, total INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_rows ("
+                "job_id TEXT NOT NULL, idx INTEGER NOT NULL, product_name TEXT NOT NULL, model_number TEXT, "
+                "status TEXT NOT NULL DEFAULT 'pending', reason TEXT, result TEXT, updated_at REAL, "
+                "PRIMARY KEY (job_id, idx))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS job_rows_status ON job_rows (job_id, status)")
+            # Stores created before the work queue get its columns added in place
+            _add_columns(conn, "jobs", {"queued": "INTEGER NOT NULL DEFAULT 0"})
+            _add_columns(conn, "job_rows", {
+                "brand": "TEXT", "category": "TEXT", "lease_owner": "TEXT", "lease_expires": "REAL",
+                "attempts": "INTEGER NOT NULL DEFAULT 0",
+            })
+            conn.execute("CREATE INDEX IF NOT EXISTS job_rows_updated ON job_rows (job_id, updated_at)")
+
+    def create_job(self, rows, source=None, queued=False):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, source, created_at, total, queued) VALUES (?, ?, ?, ?, ?)",
+                (job_id, source, now, len(rows), int(queued))
+            )
+            conn.executemany(
+                "INSERT INTO job_rows (job_id, idx, product_name, model_number, brand, category, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (job_id, row["idx"], row["product_name"], _model_text(row.get("model_number")),
+                     _model_text(row.get("brand")), _model_text(row.get("category")), now)
+                    for row in rows
+                ]
+            )
+        return job_id
+
+    # Record a finished row; None (no match) and {"Error": ...} results count as failures
+    def record_result(self, job_id, idx, result):
+        if not result:
+            self.mark_failed(job_id, idx, "No match found")
+        elif "Error" in result:
+            self.mark_failed(job_id, idx, result["Error"])
+        else:
+            self.mark_done(job_id, idx, result)
+
+    # record_result for many (idx, result) pairs in one transaction
+    def record_results(self, job_id, items):
+        now = time.time()
+        updates = []
+        for idx, result in items:
+            if not result:
+                updates.append(("failed", "No match found", None, now, job_id, idx))
+            elif "Error" in result:
+                updates.append(("failed", result["Error"], None, now, job_id, idx))
+            else:
+                updates.append(("done", None, json.dumps(result), now, job_id, idx))
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.executemany(
+                "UPDATE job_rows SET status = ?, reason = ?, result = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+                updates
+            )
+
+    def mark_done(self, job_id, idx, result):
+        self._update(job_id, idx, "done", None, json.dumps(result))
+
+    def mark_done_many(self, job_id, items):
+        now = time.time()
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.executemany(
+                "UPDATE job_rows SET status = 'done', reason = NULL, result = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+                [(json.dumps(result), now, job_id, idx) for idx, result in items]
+            )
+
+    def mark_failed(self, job_id, idx, reason):
+        self._update(job_id, idx, "failed", reason, None)
+
+    def _update(self, job_id, idx, status, reason, result):
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute(
+                "UPDATE job_rows SET status = ?, reason = ?, result = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+                (status, reason, result, time.time(), job_id, idx)
+            )
+
+    # Rows of a job; `since` limits them to rows updated at or after that time
+    def rows(self, job_id, statuses=None, since=None):
+        query = (
+            "SELECT idx, product_name, model_number, brand, category, status, reason, result, updated_at "
+            "FROM job_rows WHERE job_id = ?"
+        )
+        params = [job_id]
+        if statuses:
+            query += f" AND status IN ({','.join('?' * len(statuses))})"
+            params.extend(statuses)
+        if since is not None:
+            query += " AND updated_at >= ?"
+            params.append(since)
+        with sqlite_connection(self.path) as conn:
+            records = conn.execute(query + " ORDER BY idx", params).fetchall()
+        return [
+            {
+                "idx": idx, "product_name": product_name, "model_number": model_number, "brand": brand,
+                "category": category, "status": status, "reason": reason,
+                "result": json.loads(result) if result else None, "updated_at": updated_at,
+            }
+            for idx, product_name, model_number, brand, category, status, reason, result, updated_at in records
+        ]
+
+    # Split a job into finished rows (with results) and rows still to scrape
+    def resume_rows(self, job_id):
+        completed = {}
+        remaining = []
+        for row in self.rows(job_id):
+            if row["status"] == "done":
+                completed[row["idx"]] = row["result"]
+            else:
+                remaining.append({
+                    "idx": row["idx"], "product_name": row["product_name"], "model_number": row["model_number"],
+                    "brand": row["brand"], "category": row["category"],
+                })
+        return completed, remaining
+
+    def status_counts(self, job_id):
+        with sqlite_connection(self.path) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM job_rows WHERE job_id = ? GROUP BY status", (job_id,)).fetchall())
+        return {status: counts.get(status, 0) for status in ("pending", "done", "failed")}
+
+    def list_jobs(self, limit=20):
+        with sqlite_connection(self.path) as conn:
+            records = conn.execute(
+                "SELECT j.job_id, j.source, j.created_at, j.total, "
+                "SUM(r.status = 'done'), SUM(r.status = 'failed'), SUM(r.status = 'pending') "
+                "FROM jobs j LEFT JOIN job_rows r ON r.job_id = j.job_id "
+                "GROUP BY j.job_id ORDER BY j.created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"job_id": job_id, "source": source, "created_at": created_at, "total": total,
+             "done": done or 0, "failed": failed or 0, "pending": pending or 0}
+            for job_id, source, created_at, total, done, failed, pending in records
+        ]
+
+    # Lease up to `limit` pending rows of the oldest queued job that has any free.
+    # Returns (job_id, rows) or (None, []). The lease hides the rows from other
+    # workers for `lease_seconds`; rows leased MAX_ATTEMPTS times without settling fail.
+    def lease(self, worker_id, limit, lease_seconds, max_attempts=MAX_ATTEMPTS):
+        now = time.time()
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")  # One worker at a time picks rows
+            conn.execute(
+                "UPDATE job_rows SET status = 'failed', reason = 'Lease expired ' || attempts || ' times', "
+                "lease_owner = NULL, updated_at = ? "
+                "WHERE status = 'pending' AND lease_expires < ? AND attempts >= ?",
+                (now, now, max_attempts)
+            )
+            found = conn.execute(
+                "SELECT r.job_id FROM job_rows r JOIN jobs j ON j.job_id = r.job_id "
+                "WHERE j.queued = 1 AND r.status = 'pending' AND (r.lease_expires IS NULL OR r.lease_expires < ?) "
+                "ORDER BY j.created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if found is None:
+                return None, []
+            job_id = found[0]
+            records = conn.execute(
+                "SELECT idx, product_name, model_number, brand, category FROM job_rows "
+                "WHERE job_id = ? AND status = 'pending' AND (lease_expires IS NULL OR lease_expires < ?) "
+                "ORDER BY idx LIMIT ?",
+                (job_id, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE job_rows SET lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE job_id = ? AND idx = ?",
+                [(worker_id, now + lease_seconds, job_id, record[0]) for record in records]
+            )
+        return job_id, [
+            {"idx": idx, "product_name": product_name, "model_number": model_number, "brand": brand, "category": category}
+            for idx, product_name, model_number, brand, category in records
+        ]
+
+    # Heartbeat: extend every lease the worker still holds
+    def renew(self, worker_id, lease_seconds):
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute(
+                "UPDATE job_rows SET lease_expires = ? WHERE lease_owner = ? AND status = 'pending'",
+                (time.time() + lease_seconds, worker_id)
+            )
+
+    # Result of a leased row. Errors (failed pages) go back to the queue until the row
+    # has been attempted max_attempts times; None (no match) fails at once. A row
+    # another worker already settled is left alone.
+    def settle(self, job_id, idx, result, max_attempts=MAX_ATTEMPTS):
+        now = time.time()
+        if result and "Error" not in result:
+            status, reason, payload = "done", None, json.dumps(result)
+        elif result is None:
+            status, reason, payload = "failed", "No match found", None
+        else:
+            status, reason, payload = "failed", result["Error"], None
+        with self._lock, sqlite_connection(self.path) as conn:
+            if status == "failed" and result is not None:
+                # Back to pending for another attempt while attempts remain
+                retried = conn.execute(
+                    "UPDATE job_rows SET lease_owner = NULL, lease_expires = NULL, reason = ?, updated_at = ? "
+                    "WHERE job_id = ? AND idx = ? AND status = 'pending' AND attempts < ?",
+                    (reason, now, job_id, idx, max_attempts)
+                ).rowcount
+                if retried:
+                    return
+            conn.execute(
+                "UPDATE job_rows SET status = ?, reason = ?, result = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE job_id = ? AND idx = ? AND status = 'pending'",
+                (status, reason, payload, now, job_id, idx)
+            )
+
+    # Hand a stopping worker's unfinished rows straight back to the queue
+    def release(self, worker_id):
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute(
+                "UPDATE job_rows SET lease_owner = NULL, lease_expires = NULL, attempts = MAX(attempts - 1, 0) "
+                "WHERE lease_owner = ? AND status = 'pending'",
+                (worker_id,)
+            )
+
+    # Stop handing out a queued job's rows; leased rows still finish and pending ones can be resumed
+    def cancel_job(self, job_id):
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute("UPDATE jobs SET queued = 0 WHERE job_id = ?", (job_id,))
+
+    # Progress of a queued job: status counts, rows leased right now and the workers holding them
+    def queue_status(self, job_id):
+        now = time.time()
+        with sqlite_connection(self.path) as conn:
+            leased, workers = conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT lease_owner) FROM job_rows "
+                "WHERE job_id = ? AND status = 'pending' AND lease_expires >= ?",
+                (job_id, now)
+            ).fetchone()
+            queued = conn.execute("SELECT queued FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return {**self.status_counts(job_id), "leased": leased, "workers": workers, "queued": bool(queued and queued[0])}
+
+def _add_columns(conn, table, columns):
+    existing = {record[1] for record in conn.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+def _model_text(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
@@ -0,0 +1,61 @@
+import re
+
+from .parsing import absolute_url
+from .tracing import span
+
+# Share of the confidence score per signal; signals without input (no model number
+# or brand on the catalog row) are dropped and the rest re-weighted
+TITLE_WEIGHT = 0.6
+MODEL_WEIGHT = 0.3
+BRAND_WEIGHT = 0.1
+
+def _compact(text):
+    return re.sub(r"[^a-z0-9]", "", str(text).lower())
+
+def _tokens(text):
+    return set(re.findall(r"[a-z0-9]+", str(text).lower()))
+
+# True for a filled-in catalog cell: not None, NaN or blank
+def has_value(value):
+    return value is not None and not (isinstance(value, float) and value != value) and str(value).strip() != ""
+
+# Confidence (0-100) for every candidate title, scored in one batched rapidfuzz call
+def score_candidates(product_name, titles, model_number=None, brand=None):
+    import numpy as np
+    from rapidfuzz import fuzz, process
+
+    lowered = [title.lower() for title in titles]
+    title_scores = process.cdist([product_name.lower()], lowered, scorer=fuzz.partial_ratio, dtype=np.float32)[0]
+    weighted = [(TITLE_WEIGHT, title_scores)]
+
+    if has_value(model_number):
+        model = _compact(model_number)
+        model_hits = np.fromiter((model in _compact(title) for title in lowered), dtype=bool, count=len(lowered))
+        weighted.append((MODEL_WEIGHT, model_hits * 100.0))
+    if has_value(brand):
+        brand_tokens = _tokens(brand)
+        brand_hits = np.fromiter((brand_tokens <= _tokens(title) for title in lowered), dtype=bool, count=len(lowered))
+        weighted.append((BRAND_WEIGHT, brand_hits * 100.0))
+
+    total_weight = sum(weight for weight, _ in weighted)
+    return sum(weight * scores for weight, scores in weighted) / total_weight
+
+# Best non-sponsored card over the whole result page, with its confidence score
+def select_best_match(product_name, cards, model_number=None, brand=None):
+    candidates = [card for card in cards if not card["sponsored"] and card["title"] and card["link"]]
+    if not candidates:
+        return None, None, 0.0
+    scores = score_candidates(product_name, [card["title"] for card in candidates], model_number, brand)
+    best = int(scores.argmax())
+    if scores[best] <= 0:
+        return None, None, 0.0
+    return candidates[best]["title"], absolute_url(candidates[best]["link"]), round(float(scores[best]), 1)
+
+# select_best_match for one row, traced as the matching stage
+def match_row(row, cards):
+    with span("matching", product=row["product_name"]) as stage:
+        best_match, best_match_link, confidence = select_best_match(row["product_name"], cards, row.get("model_number"), row.get("brand"))
+        stage.set(confidence=confidence)
+        if best_match is None:
+            stage.outcome = "no_match"
+    return best_match, best_match_link, confidence
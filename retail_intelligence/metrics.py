@@ -0,0 +1,7 @@
+# Per-product page-load counters filled in by both backends
+def record_page_load(metrics, seconds, transferred_bytes=0):
+    if metrics is None:
+        return
+    metrics["page_loads"] = metrics.get("page_loads", 0) + 1
+    metrics["page_load_seconds"] = metrics.get("page_load_seconds", 0.0) + seconds
+    metrics["bytes_transferred"] = metrics.get("bytes_transferred", 0) + transferred_bytes
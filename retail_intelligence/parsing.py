@@ -0,0 +1,38 @@
+import re
+from urllib.parse import urljoin
+
+from .config import AMAZON_BASE_URL, BLOCK_MARKERS, BLOCK_STATUSES
+
+# Raised by the HTTP backend when a page only renders with JavaScript
+class JavaScriptRequired(Exception):
+    pass
+
+# Raised by both backends when Amazon answers with a CAPTCHA, robot check or throttling page
+class BlockedError(Exception):
+    pass
+
+# Reason the response is an anti-bot page, None for a regular page
+def detect_block(status_code, page_html):
+    if status_code in BLOCK_STATUSES:
+        return f"HTTP {status_code}"
+    for reason, marker in BLOCK_MARKERS.items():
+        if marker in page_html:
+            return reason
+    return None
+
+def absolute_url(link):
+    return urljoin(AMAZON_BASE_URL + "/", link)
+
+# Competitor rating and review count both come from the adReviewLink aria-label
+def parse_competitor_label(label):
+    try:
+        rating_match = re.search(r"(\d+\.\d+) out of (\d+) stars", label)
+        rating = rating_match.group(0) if rating_match else "Rating Not Available"
+    except TypeError:
+        rating = "Rating Not Available"
+    try:
+        reviews_match = re.search(r"(\d+)\s+ratings?", label)
+        reviews = reviews_match.group(1) if reviews_match else "No Reviews"
+    except TypeError:
+        reviews = "No Reviews"
+    return rating, reviews
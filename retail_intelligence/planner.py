@@ -0,0 +1,119 @@
+import re
+
+from .cache import normalize_key_part, product_cache_key
+from .matching import has_value
+
+# Rows of the same Brand/Category and the same sizes and series numbers whose title
+# tokens overlap at least this much (Jaccard, model numbers excluded) share one
+# search-result page
+MIN_TOKEN_OVERLAP = 0.5
+# A shared query needs at least this many common tokens to stay specific
+MIN_QUERY_TOKENS = 2
+# Amazon shows ~20 organic results per page; larger groups start missing variants
+MAX_GROUP_SIZE = 8
+
+def _words(text):
+    return re.findall(r"[A-Za-z0-9]+", str(text))
+
+# Title words without the model number, which differs between variants of one line
+def query_words(product_name, model_number=None):
+    model_tokens = {word.lower() for word in _words(model_number)} if has_value(model_number) else set()
+    return [word for word in _words(product_name) if word.lower() not in model_tokens]
+
+# Tokens with a digit (sizes, capacities, series numbers such as 43, 190, 4K or 13)
+# tell product lines apart; only rows that agree on all of them share a search
+def distinguishing_tokens(tokens):
+    return frozenset(token for token in tokens if any(char.isdigit() for char in token))
+
+# Rows served by one search; a single-row group searches its full product name as before
+class SearchGroup:
+    def __init__(self, row):
+        self.rows = [row]
+        self._words = query_words(row["product_name"], row.get("model_number"))
+        self.tokens = {word.lower() for word in self._words}
+
+    def overlap(self, tokens):
+        shared = self.tokens & tokens
+        if len(shared) < MIN_QUERY_TOKENS:
+            return 0.0
+        return len(shared) / len(self.tokens | tokens)
+
+    def add(self, row, tokens):
+        self.rows.append(row)
+        self.tokens &= tokens
+
+    @property
+    def query(self):
+        if len(self.rows) == 1:
+            return self.rows[0]["product_name"]
+        words, seen = [], set()
+        for word in self._words:
+            if word.lower() in self.tokens and word.lower() not in seen:
+                seen.add(word.lower())
+                words.append(word)
+        return " ".join(words)
+
+class QueryPlan:
+    def __init__(self, groups, duplicates, total_rows, shared=0):
+        self.groups = groups
+        # canonical row idx -> rows with the same product name and model number
+        self.duplicates = duplicates
+        self.total_rows = total_rows
+        # Distinct rows served by a search another run already has in flight
+        self.shared = shared
+
+    @property
+    def searches(self):
+        return len(self.groups)
+
+    @property
+    def searches_saved(self):
+        return self.total_rows - self.searches
+
+    @property
+    def duplicate_rows(self):
+        return sum(len(rows) for rows in self.duplicates.values())
+
+# First row per product name and model number, plus canonical idx -> the repeats
+def coalesce_rows(rows):
+    canonical = {}
+    duplicates = {}
+    distinct = []
+    for row in rows:
+        key = product_cache_key(row["product_name"], row.get("model_number"))
+        first = canonical.setdefault(key, row)
+        if first is row:
+            distinct.append(row)
+        else:
+            duplicates.setdefault(first["idx"], []).append(row)
+    return distinct, duplicates
+
+# Greedily group distinct rows by Brand/Category, numeric tokens and shared title
+# tokens. Rows in a group agree on every numeric token, so the shared query keeps them.
+def group_searches(rows, max_group_size=MAX_GROUP_SIZE, min_overlap=MIN_TOKEN_OVERLAP):
+    groups = []
+    buckets = {}
+    for row in rows:
+        tokens = {word.lower() for word in query_words(row["product_name"], row.get("model_number"))}
+        bucket = buckets.setdefault((
+            normalize_key_part(row.get("brand")), normalize_key_part(row.get("category")), distinguishing_tokens(tokens)
+        ), [])
+        best, best_overlap = None, min_overlap
+        for group in bucket:
+            if len(group.rows) >= max_group_size:
+                continue
+            overlap = group.overlap(tokens)
+            if overlap >= best_overlap:
+                best, best_overlap = group, overlap
+        if best is None:
+            best = SearchGroup(row)
+            bucket.append(best)
+            groups.append(best)
+        else:
+            best.add(row, tokens)
+    return groups
+
+def plan_searches(rows, group_rows=True, max_group_size=MAX_GROUP_SIZE, min_overlap=MIN_TOKEN_OVERLAP):
+    distinct, duplicates = coalesce_rows(rows)
+    groups = group_searches(distinct, max_group_size if group_rows else 1, min_overlap)
+    return QueryPlan(groups, duplicates, len(rows))
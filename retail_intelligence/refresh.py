@@ -0,0 +1,76 @@
+import math
+import time
+
+from .cache import product_cache_key
+
+# Page loads a product is assumed to cost before any run has been measured
+DEFAULT_PAGES_PER_PRODUCT = 2.0
+# Products scraped this recently are never refreshed again
+MIN_REFRESH_HOURS = 6.0
+# Stable products still come up about this often
+MAX_REFRESH_DAYS = 30.0
+# Prior for a product with little history: one price change per PRIOR_DAYS
+PRIOR_DAYS = 7.0
+# Competitor listings above this count no further weight
+MAX_COMPETITOR_WEIGHT = 5
+
+# Expected price changes missed since the last scrape: the product's change rate
+# per day (smoothed towards one per week while its history is short) times the days
+# since it was scraped, up to twice as much for competitor-heavy listings. The
+# staleness term makes every product come up within about MAX_REFRESH_DAYS.
+def refresh_priority(summary, now):
+    age_days = (now - summary["last_seen"]) / 86400
+    observed_days = (summary["last_seen"] - summary["first_seen"]) / 86400
+    change_rate = (summary["price_changes"] + 1) / (observed_days + PRIOR_DAYS)
+    competitor_weight = 1 + min(summary["competitors"] or 0, MAX_COMPETITOR_WEIGHT) / MAX_COMPETITOR_WEIGHT
+    return change_rate * age_days * competitor_weight + age_days / MAX_REFRESH_DAYS
+
+class RefreshPlan:
+    def __init__(self, rows, priorities, budget, spent, pages_per_product, due, new):
+        # Rows to scrape now, highest priority first
+        self.rows = rows
+        # idx -> priority of every due row (inf for products never scraped)
+        self.priorities = priorities
+        self.budget = budget
+        self.spent = spent
+        self.pages_per_product = pages_per_product
+        self.due = due
+        self.new = new
+
+    @property
+    def remaining(self):
+        return max(0.0, self.budget - self.spent)
+
+    @property
+    def estimated_pages(self):
+        return len(self.rows) * self.pages_per_product
+
+    @property
+    def deferred(self):
+        return self.due - len(self.rows)
+
+# Pick the catalog rows worth scraping now within a daily page-load budget: products
+# never scraped first, then by refresh_priority, until the pages left in the last
+# 24 hours (every run's page loads count) run out. Repeated rows are planned once.
+def plan_refresh(rows, history, budget, now=None):
+    now = time.time() if now is None else now
+    distinct = {}
+    for row in rows:
+        distinct.setdefault(product_cache_key(row["product_name"], row.get("model_number")), row)
+    summaries = history.summaries(distinct)
+    priorities = {}
+    for key, row in distinct.items():
+        summary = summaries.get(key)
+        if summary is None:
+            priorities[row["idx"]] = math.inf
+        elif now - summary["last_seen"] >= MIN_REFRESH_HOURS * 3600:
+            priorities[row["idx"]] = refresh_priority(summary, now)
+
+    spent = history.page_loads_since(now - 86400)
+    pages_per_product = history.pages_per_product() or DEFAULT_PAGES_PER_PRODUCT
+    affordable = int(max(0.0, budget - spent) // pages_per_product)
+    due = sorted((row for row in distinct.values() if row["idx"] in priorities), key=lambda row: -priorities[row["idx"]])
+    return RefreshPlan(
+        due[:affordable], priorities, budget, spent, pages_per_product,
+        due=len(due), new=sum(1 for priority in priorities.values() if priority == math.inf)
+    )
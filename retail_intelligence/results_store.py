@@ -0,0 +1,223 @@
+from threading import Lock
+
+# Scrape results as two typed tables: one row per product and one per competitor
+# listing. The tables are linked by product_key, the caller's key for the product;
+# product_name is the catalog name shown to users. Display strings such as "1,299",
+# "4.2 out of 5 stars" or "Price Not Found" are parsed once at ingest into nullable
+# numeric columns, and competitive metrics are computed over all products at once.
+PRODUCT_COLUMNS = [
+    "product_key", "product_name", "brand", "category", "model_number", "title",
+    "price", "rating", "review_count", "match_confidence", "product_link",
+]
+COMPETITOR_COLUMNS = ["product_key", "position", "title", "price", "rating", "review_count"]
+
+# Vectorized parsers over whole columns; anything unparseable becomes <NA>
+def parse_prices(values):
+    import pandas as pd
+
+    text = pd.Series(values, dtype="string").str.replace(r"[^\d.]", "", regex=True).str.strip(".")
+    return pd.to_numeric(text, errors="coerce").astype("Float64")
+
+def parse_ratings(values):
+    import pandas as pd
+
+    text = pd.Series(values, dtype="string").str.extract(r"(\d+(?:\.\d+)?)\s+out of", expand=False)
+    return pd.to_numeric(text, errors="coerce").astype("Float64")
+
+def parse_review_counts(values):
+    import pandas as pd
+
+    text = pd.Series(values, dtype="string").str.replace(",", "", regex=False).str.extract(r"(\d+)", expand=False)
+    return pd.to_numeric(text, errors="coerce").astype("Int64")
+
+def _empty(columns):
+    import pandas as pd
+
+    return pd.DataFrame({column: pd.Series(dtype="object") for column in columns})
+
+# Typed tables built from the nested result dicts the scrapers return
+def build_tables(items):
+    import pandas as pd
+
+    products = []
+    competitors = []
+    for product_key, result, metadata in items:
+        metadata = metadata or {}
+        products.append({
+            "product_key": product_key,
+            "product_name": metadata.get("product_name", product_key),
+            "brand": metadata.get("brand"),
+            "category": metadata.get("category"),
+            "model_number": metadata.get("model_number"),
+            "title": result.get("Title"),
+            "price": result.get("Price"),
+            "rating": result.get("Ranking"),
+            "review_count": result.get("Reviews Count"),
+            "match_confidence": result.get("Match Confidence"),
+            "product_link": result.get("Product Link"),
+        })
+        for position, competitor in enumerate(result.get("Related Products") or [], start=1):
+            competitors.append({
+                "product_key": product_key,
+                "position": position,
+                "title": competitor.get("Title"),
+                "price": competitor.get("Price"),
+                "rating": competitor.get("Rating"),
+                "review_count": competitor.get("Reviews"),
+            })
+
+    products = pd.DataFrame(products, columns=PRODUCT_COLUMNS) if products else _empty(PRODUCT_COLUMNS)
+    competitors = pd.DataFrame(competitors, columns=COMPETITOR_COLUMNS) if competitors else _empty(COMPETITOR_COLUMNS)
+    for table in (products, competitors):
+        table["price"] = parse_prices(table["price"])
+        table["rating"] = parse_ratings(table["rating"])
+        table["review_count"] = parse_review_counts(table["review_count"])
+        for column in ("product_key", "title"):
+            table[column] = table[column].astype("string")
+    products["match_confidence"] = pd.to_numeric(products["match_confidence"], errors="coerce").astype("Float64")
+    for column in ("product_name", "brand", "category", "model_number", "product_link"):
+        products[column] = products[column].astype("string")
+    competitors["position"] = competitors["position"].astype("Int64")
+    return products, competitors
+
+# Per-product competitor aggregates for the whole catalog in one groupby
+def competitive_metrics(products, competitors):
+    grouped = competitors.groupby("product_key", observed=True).agg(
+        competitor_count=("position", "size"),
+        priced_competitors=("price", "count"),
+        avg_competitor_price=("price", "mean"),
+        min_competitor_price=("price", "min"),
+        max_competitor_price=("price", "max"),
+        avg_competitor_rating=("rating", "mean"),
+        avg_competitor_reviews=("review_count", "mean"),
+    )
+    metrics = products.set_index("product_key")[["price", "rating", "review_count"]].join(grouped, how="left")
+    metrics["competitor_count"] = metrics["competitor_count"].fillna(0).astype("Int64")
+    metrics["priced_competitors"] = metrics["priced_competitors"].fillna(0).astype("Int64")
+    for column in ("avg_competitor_price", "min_competitor_price", "max_competitor_price",
+                   "avg_competitor_rating", "avg_competitor_reviews"):
+        metrics[column] = metrics[column].astype("Float64")
+    avg_price = metrics["avg_competitor_price"].where(metrics["avg_competitor_price"] > 0)
+    metrics["price_diff"] = metrics["price"] - avg_price
+    metrics["price_diff_pct"] = metrics["price_diff"] / avg_price * 100
+    metrics["rating_diff"] = metrics["rating"] - metrics["avg_competitor_rating"]
+    return metrics
+
+# One row per product ready for catalog-wide ranking: Brand/Category as categoricals
+# for cheap filtering, and the gaps against competitors as plain numeric columns
+PORTFOLIO_COLUMNS = [
+    "product_name", "brand", "category", "title", "price", "avg_competitor_price", "price_diff_pct",
+    "rating", "avg_competitor_rating", "rating_diff", "review_count", "competitor_count", "match_confidence",
+]
+
+def portfolio_table(products, metrics):
+    portfolio = metrics.join(
+        products.set_index("product_key")[["product_name", "brand", "category", "title", "match_confidence"]], how="left"
+    )[PORTFOLIO_COLUMNS]
+    for column in ("brand", "category"):
+        portfolio[column] = portfolio[column].fillna("Unknown").astype("category")
+    return portfolio
+
+# Brand x Category aggregates over the portfolio
+def segment_summary(portfolio):
+    return portfolio.groupby(["brand", "category"], observed=True).agg(
+        products=("price", "size"),
+        median_price_diff_pct=("price_diff_pct", "median"),
+        mean_rating_diff=("rating_diff", "mean"),
+        total_reviews=("review_count", "sum"),
+    ).reset_index()
+
+# Accumulates results as they stream in from a batch (any thread). Tables and
+# aggregates are rebuilt once per change, on the first read after results land,
+# so filtering and sorting the portfolio never recomputes them.
+class ResultsStore:
+    def __init__(self):
+        self._lock = Lock()
+        self._pending = []
+        self._products = _empty(PRODUCT_COLUMNS)
+        self._competitors = _empty(COMPETITOR_COLUMNS)
+        self._metrics = None
+        self._portfolio = None
+        self._segments = None
+        # Bumped whenever the tables change, for callers caching derived views
+        self.version = 0
+
+    def add(self, product_key, result, metadata=None):
+        if not result or "Error" in result:
+            return
+        with self._lock:
+            self._pending.append((product_key, result, metadata))
+
+    def add_many(self, items):
+        items = [(key, result, metadata) for key, result, metadata in items if result and "Error" not in result]
+        with self._lock:
+            self._pending.extend(items)
+
+    def _flush(self):
+        import pandas as pd
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            # Later results for the same product replace earlier ones
+            latest = {}
+            for item in pending:
+                latest[item[0]] = item
+            products, competitors = build_tables(latest.values())
+            keys = products["product_key"]
+            self._products = pd.concat(
+                [self._products[~self._products["product_key"].isin(keys)], products], ignore_index=True
+            ) if len(self._products) else products
+            self._competitors = pd.concat(
+                [self._competitors[~self._competitors["product_key"].isin(keys)], competitors], ignore_index=True
+            ) if len(self._competitors) else competitors
+            self._metrics = None
+            self._portfolio = None
+            self._segments = None
+            self.version += 1
+
+    @property
+    def products(self):
+        self._flush()
+        return self._products
+
+    @property
+    def competitors(self):
+        self._flush()
+        return self._competitors
+
+    def _aggregate(self):
+        self._flush()
+        with self._lock:
+            if self._metrics is None:
+                self._metrics = competitive_metrics(self._products, self._competitors)
+                self._portfolio = portfolio_table(self._products, self._metrics)
+                self._segments = segment_summary(self._portfolio)
+
+    @property
+    def metrics(self):
+        self._aggregate()
+        return self._metrics
+
+    @property
+    def portfolio(self):
+        self._aggregate()
+        return self._portfolio
+
+    @property
+    def segments(self):
+        self._aggregate()
+        return self._segments
+
+    def product(self, product_key):
+        products = self.products
+        row = products[products["product_key"] == product_key]
+        return None if row.empty else row.iloc[0].to_dict()
+
+    def competitors_of(self, product_key):
+        competitors = self.competitors
+        return competitors[competitors["product_key"] == product_key].sort_values("position")
+
+    def __len__(self):
+        return len(self.products)
@@ -0,0 +1,272 @@
+import asyncio
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+
+# Progress counter that is safe to bump from the scheduler and read from the UI
+class AtomicCounter:
+    def __init__(self, value=0):
+        self._value = value
+        self._lock = Lock()
+
+    def increment(self, amount=1):
+        with self._lock:
+            self._value += amount
+            return self._value
+
+    @property
+    def value(self):
+        with self._lock:
+            return self._value
+
+# Hedging: once this many jobs of a batch finished, a job running longer than the
+# batch's p95 gets a duplicate attempt queued behind the remaining jobs
+HEDGE_MIN_SAMPLES = 10
+HEDGE_PERCENTILE = 0.95
+HEDGE_CHECK_SECONDS = 0.5
+
+# A group of jobs submitted together; results stream out through on_result.
+# A job is settled by whichever of its attempts finishes first; jobs dropped
+# after a cancel are reported through on_skip.
+class Batch:
+    def __init__(self, total, on_result=None, fetch=None, tenant=None, hedge=True, on_skip=None):
+        self.total = total
+        self.fetch = fetch
+        self.tenant = tenant
+        self.hedge = hedge
+        self.on_skip = on_skip
+        self.completed = AtomicCounter()
+        self.skipped = AtomicCounter()
+        self.hedged = AtomicCounter()
+        self.hedge_wins = AtomicCounter()
+        self.results = {}
+        self.on_result = on_result
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.durations = []
+        self._running = {}
+        self._hedged = set()
+        self._settled = set()
+        self._lock = Lock()
+        self._cancelled = Event()
+        self._done = Event()
+        if total == 0:
+            self._mark_done()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def settled(self, job):
+        with self._lock:
+            return job["idx"] in self._settled
+
+    def _start(self, job):
+        with self._lock:
+            self._running.setdefault(job["idx"], (time.monotonic(), job))
+
+    # Jobs that have run longer than the p95 of finished jobs and have no hedge yet
+    def _stragglers(self):
+        with self._lock:
+            if len(self.durations) < HEDGE_MIN_SAMPLES:
+                return []
+            threshold = sorted(self.durations)[int(len(self.durations) * HEDGE_PERCENTILE) - 1]
+            now = time.monotonic()
+            jobs = [
+                job for idx, (started, job) in self._running.items()
+                if idx not in self._hedged and now - started > threshold
+            ]
+            self._hedged.update(job["idx"] for job in jobs)
+        self.hedged.increment(len(jobs))
+        return jobs
+
+    def _finish(self, job, result, hedge=False):
+        with self._lock:
+            if job["idx"] in self._settled:
+                return  # The other attempt already won
+            self._settled.add(job["idx"])
+            started, _ = self._running.pop(job["idx"], (None, None))
+            if started is not None:
+                self.durations.append(time.monotonic() - started)
+        if hedge:
+            self.hedge_wins.increment()
+        self.results[job["idx"]] = result
+        if self.on_result is not None:
+            try:
+                self.on_result(job, result)
+            except Exception as e:
+                print(f"Error in result callback: {e}")
+        self.completed.increment()
+        self._check_done()
+
+    def _skip(self, job):
+        with self._lock:
+            if job["idx"] in self._settled:
+                return
+            self._settled.add(job["idx"])
+        if self.on_skip is not None:
+            try:
+                self.on_skip(job)
+            except Exception as e:
+                print(f"Error in skip callback: {e}")
+        self.skipped.increment()
+        self._check_done()
+
+    def _check_done(self):
+        if self.completed.value + self.skipped.value >= self.total:
+            self._mark_done()
+
+    def _mark_done(self):
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+# Priority queue shared by several tenants (e.g. dashboard sessions). The next job
+# comes from the tenant with the fewest jobs running, so one large batch cannot
+# starve a small one; ties go to the tenant served longest ago. Lower priority
+# values still go first, and a tenant's jobs keep submission order.
+class FairQueue:
+    def __init__(self):
+        self._available = asyncio.Semaphore(0)
+        self._queues = {}
+        self._running = {}
+        self._last_served = {}
+        self._turns = itertools.count()
+
+    def put_nowait(self, item):
+        tenant = item[2].tenant
+        heapq.heappush(self._queues.setdefault(tenant, []), item)
+        self._running.setdefault(tenant, 0)
+        self._last_served.setdefault(tenant, -1)
+        self._available.release()
+
+    async def get(self):
+        await self._available.acquire()
+        tenant = min(
+            (tenant for tenant, queue in self._queues.items() if queue),
+            key=lambda tenant: (self._queues[tenant][0][0], self._running[tenant], self._last_served[tenant])
+        )
+        item = heapq.heappop(self._queues[tenant])
+        self._running[tenant] += 1
+        self._last_served[tenant] = next(self._turns)
+        return item
+
+    def task_done(self, tenant):
+        self._running[tenant] -= 1
+        if not self._running[tenant] and not self._queues[tenant]:
+            del self._queues[tenant], self._running[tenant], self._last_served[tenant]
+
+    # Queued and running jobs per tenant; dict copies keep it safe to call from other threads
+    def snapshot(self):
+        queues, running = dict(self._queues), dict(self._running)
+        return {tenant: {"queued": len(queues.get(tenant, ())), "running": count} for tenant, count in running.items()}
+
+# asyncio scheduler with a bounded number of workers pulling from a fair-share queue.
+# fetch(job) is blocking (Selenium/requests) and runs on the scheduler's thread pool;
+# a batch can bring its own fetch, so one scheduler can serve several BatchRuns.
+# Hedged attempts get a copy of the job with "hedge": True.
+class ScrapeScheduler:
+    def __init__(self, fetch=None, concurrency=3, hedge=True):
+        self.fetch = fetch
+        self.concurrency = concurrency
+        self.hedge = hedge
+        self._batches = []
+        self._sequence = itertools.count()
+        self._loop = None
+        self._queue = None
+        self._executor = None
+        self._thread = None
+        self._ready = Event()
+
+    def start(self):
+        self._thread = Thread(target=self._run, name="scrape-scheduler", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    # Lower priority values are scraped first; jobs within a priority keep submission order
+    def submit(self, jobs, priority=0, on_result=None, fetch=None, tenant=None, hedge=True, on_skip=None):
+        jobs = list(jobs)
+        batch = Batch(len(jobs), on_result, fetch=fetch, tenant=tenant, hedge=hedge, on_skip=on_skip)
+        items = [(priority, next(self._sequence), batch, job) for job in jobs]
+        self._loop.call_soon_threadsafe(self._enqueue, priority, batch, items)
+        return batch
+
+    def tenants(self):
+        return {} if self._queue is None else self._queue.snapshot()
+
+    def shutdown(self, wait=True):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="scraper")
+        self._queue = FairQueue()
+        workers = [self._loop.create_task(self._worker()) for _ in range(self.concurrency)]
+        if self.hedge:
+            workers.append(self._loop.create_task(self._hedge_monitor()))
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self._loop.run_until_complete(asyncio.gather(*workers, return_exceptions=True))
+            # Only hedge losers can still be running here; they end at their stage deadlines
+            self._executor.shutdown(wait=False)
+            self._loop.close()
+
+    # Runs on the loop thread, like the hedge monitor that prunes _batches
+    def _enqueue(self, priority, batch, items):
+        if self.hedge and batch.hedge:
+            self._batches.append((priority, batch))
+        for item in items:
+            self._queue.put_nowait(item)
+
+    async def _worker(self):
+        while True:
+            _, _, batch, job = await self._queue.get()
+            hedge = job.get("hedge", False)
+            try:
+                # Cooperative cancellation: queued jobs of a cancelled batch are dropped
+                if batch.cancelled:
+                    batch._skip(job)
+                    continue
+                if hedge and batch.settled(job):
+                    continue
+                if not hedge:
+                    batch._start(job)
+                try:
+                    result = await self._loop.run_in_executor(self._executor, batch.fetch or self.fetch, job)
+                except Exception as e:
+                    result = {"Error": str(e)}
+                batch._finish(job, result, hedge)
+            finally:
+                self._queue.task_done(batch.tenant)
+
+    # Queue a duplicate attempt for stragglers; it runs on the next free worker
+    # once the jobs queued before it are taken, so it only uses spare capacity
+    async def _hedge_monitor(self):
+        while True:
+            await asyncio.sleep(HEDGE_CHECK_SECONDS)
+            self._batches = [(priority, batch) for priority, batch in self._batches if not batch.done]
+            for priority, batch in self._batches:
+                if batch.cancelled or not batch.hedge:
+                    continue
+                for job in batch._stragglers():
+                    self._queue.put_nowait((priority, next(self._sequence), batch, {**job, "hedge": True}))
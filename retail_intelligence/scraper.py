@@ -0,0 +1,40 @@
+from .browser import create_driver
+from .http_backend import search_group_http
+from .parsing import BlockedError
+from .selenium_backend import scrape_group
+from .throttle import get_rate_controller
+from .tracing import trace_context
+
+# Scrape one search group (rows sharing a query): HTTP first, Selenium for the rows
+# whose pages need JavaScript or for everything when backend="selenium".
+# Returns {idx: product_info, None for no match or {"Error": ...} when a page failed};
+# raises BlockedError on anti-bot pages.
+def search_amazon_group(query, rows, pool=None, backend="http", timeouts=None, blocking=None, metrics=None, url_index=None, archive=None):
+    with trace_context(query=query):
+        results = {}
+        if backend == "http":
+            results, rows = search_group_http(query, rows, timeouts, metrics, url_index, archive)
+            if not rows:
+                return results
+            print(f"Falling back to Selenium for {', '.join(row['product_name'] for row in rows)}")
+        if pool is None:
+            driver = create_driver()
+            try:
+                results.update(scrape_group(driver, query, rows, timeouts, blocking, metrics, url_index, archive))
+            finally:
+                driver.quit()
+            return results
+        with pool.session() as driver:
+            results.update(scrape_group(driver, query, rows, timeouts, blocking, metrics, url_index, archive))
+        return results
+
+# Scrape one product: a search group of its own. A block page comes back as an
+# {"Error": ...} result like in BatchRun, so it is not taken for a missing product.
+def search_amazon(product_name, pool=None, backend="http", timeouts=None, blocking=None, metrics=None, model_number=None, brand=None, url_index=None, archive=None):
+    row = {"idx": 0, "product_name": product_name, "model_number": model_number, "brand": brand}
+    try:
+        return search_amazon_group(product_name, [row], pool, backend, timeouts, blocking, metrics, url_index, archive)[0]
+    except BlockedError as e:
+        delay = get_rate_controller().record_block(str(e))
+        print(f"Blocked: {e}, backing off {delay:.0f} s")
+        return {"Error": f"Blocked: {e}"}
@@ -0,0 +1,393 @@
+import time
+
+from .browser import apply_resource_blocking, drain_transferred_bytes
+from .config import AMAZON_BASE_URL, CAROUSEL_XPATH, RESULT_CARD_XPATH, STAGE_TIMEOUTS
+from .matching import match_row
+from .metrics import record_page_load
+from .parsing import BlockedError, parse_competitor_label
+from .throttle import pace_request
+from .tracing import span
+from .url_index import is_same_listing
+
+# Selenium extraction: each parse is one injected script returning a JSON payload,
+# instead of a WebDriver round-trip per find_element/get_attribute/.text call.
+# The XPaths are the same ones used by the HTTP backend.
+USE_JS_EXTRACTION = True
+
+SEARCH_RESULTS_JS = """
+const one = (expr, ctx) => document.evaluate(expr, ctx, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const all = (expr, ctx) => {
+    const snap = document.evaluate(expr, ctx, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < snap.snapshotLength; i++) nodes.push(snap.snapshotItem(i));
+    return nodes;
+};
+return all(arguments[0], document).map(card => {
+    const title = one('.//h2/span', card);
+    const link = one('.//a[contains(@class, "a-link-normal")][@href]', card);
+    return {
+        title: title ? title.innerText.trim() : null,
+        link: link ? link.href : null,
+        sponsored: one('.//span[contains(text(), "Sponsored")]', card) !== null
+    };
+});
+"""
+
+PRODUCT_DETAIL_JS = """
+const one = (expr, ctx) => document.evaluate(expr, ctx, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const all = (expr, ctx) => {
+    const snap = document.evaluate(expr, ctx, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < snap.snapshotLength; i++) nodes.push(snap.snapshotItem(i));
+    return nodes;
+};
+const text = (expr, ctx) => { const node = one(expr, ctx); return node ? node.innerText.trim() : null; };
+const attr = (expr, name, ctx) => { const node = one(expr, ctx); return node ? node.getAttribute(name) : null; };
+const carousel = one(arguments[0], document);
+return {
+    title: text('//*[@id="productTitle"]', document),
+    price: text('.//span[contains(@class, "a-price-whole")]', document),
+    reviews: text('//span[@id="acrCustomerReviewText"]', document),
+    ranking: attr('//span[@id="acrPopover"]', 'title', document),
+    competitors: carousel === null ? null : all('.//li[contains(@class, "a-carousel-card")]', carousel).slice(0, 5).map(comp => ({
+        title: text('.//div[contains(@class, "sponsored-products-truncator-afo-4")]', comp),
+        price: text('.//span[@class="a-price-whole"]', comp),
+        label: attr('.//a[contains(@class, "adReviewLink")]', 'aria-label', comp)
+    }))
+};
+"""
+
+def extract_search_cards(driver):
+    if not USE_JS_EXTRACTION:
+        return extract_search_cards_webdriver(driver)
+    return driver.execute_script(SEARCH_RESULTS_JS, RESULT_CARD_XPATH)
+
+def extract_product_details(driver, product_link):
+    with span("field_extraction", backend="selenium") as stage:
+        if not USE_JS_EXTRACTION:
+            return extract_product_details_webdriver(driver, product_link, stage)
+        payload = driver.execute_script(PRODUCT_DETAIL_JS, CAROUSEL_XPATH)
+        for field in ("title", "price", "reviews", "ranking"):
+            if not payload[field]:
+                stage.miss(field)
+        related_products = []
+        for comp in payload["competitors"] or []:
+            comp_ranking, comp_reviews = parse_competitor_label(comp["label"])
+            related_products.append({
+                "Title": comp["title"] or "Title Not Available",
+                "Price": comp["price"] or "Price Not Available",
+                "Rating": comp_ranking,
+                "Reviews": comp_reviews
+            })
+    return {
+        "Title": payload["title"] or "Title Not Found",
+        "Price": payload["price"] or "Price Not Found",
+        "Reviews Count": payload["reviews"] or "No Reviews",
+        "Ranking": payload["ranking"] or "Ranking Not Available",
+        "Product Link": product_link,
+        "Related Products": related_products
+    }
+
+# Per-element extraction, kept as the baseline for benchmarks/bench_extraction.py.
+# Missing detail fields fall back to placeholders and are reported on the span.
+def extract_search_cards_webdriver(driver):
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.common.by import By
+
+    cards = []
+    for product in driver.find_elements(By.XPATH, RESULT_CARD_XPATH):
+        try:
+            title = product.find_element(By.XPATH, './/h2/span').text.strip()
+        except WebDriverException:
+            title = None
+        try:
+            link = product.find_element(By.XPATH, './/a[contains(@class, "a-link-normal")][@href]').get_attribute("href")
+        except WebDriverException:
+            link = None
+        cards.append({
+            "title": title,
+            "link": link,
+            "sponsored": bool(product.find_elements(By.XPATH, './/span[contains(text(), "Sponsored")]'))
+        })
+    return cards
+
+def extract_product_details_webdriver(driver, product_link, stage=None):
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.common.by import By
+
+    def miss(field):
+        if stage is not None:
+            stage.miss(field)
+
+    try:
+        title = driver.find_element(By.ID, "productTitle").text.strip()
+    except WebDriverException:
+        miss("title")
+        title = "Title Not Found"
+
+    try:
+        price = driver.find_element(By.XPATH, './/span[contains(@class, "a-price-whole")]').text.strip()
+    except WebDriverException:
+        miss("price")
+        price = "Price Not Found"
+
+    try:
+        reviews = driver.find_element(By.XPATH, '//span[@id="acrCustomerReviewText"]').text
+    except WebDriverException:
+        miss("reviews")
+        reviews = "No Reviews"
+
+    try:
+        ranking = driver.find_element(By.XPATH, '//span[@id="acrPopover"]').get_attribute("title")
+    except WebDriverException:
+        miss("ranking")
+        ranking = "Ranking Not Available"
+
+    related_products = []
+    try:
+        elements = driver.find_element(By.XPATH, CAROUSEL_XPATH)
+        competitors = elements.find_elements(By.XPATH, './/li[contains(@class, "a-carousel-card")]')
+
+        for comp in competitors[:5]:
+            try:
+                comp_title = comp.find_element(By.XPATH, './/div[contains(@class, "sponsored-products-truncator-afo-4")]').text.strip()
+            except WebDriverException:
+                comp_title = "Title Not Available"
+            
+            try:
+                comp_price = comp.find_element(By.XPATH, './/span[@class="a-price-whole"]').text.strip()
+            except WebDriverException:
+                comp_price = "Price Not Available"
+            
+            try:
+                comp_label = comp.find_element(By.XPATH, './/a[contains(@class, "adReviewLink")]').get_attribute("aria-label")
+            except WebDriverException:
+                comp_label = None
+            comp_ranking, comp_reviews = parse_competitor_label(comp_label)
+            
+            related_products.append({
+                "Title": comp_title,
+                "Price": comp_price,
+                "Rating": comp_ranking,
+                "Reviews": comp_reviews
+            })
+    except WebDriverException:
+        pass  # No related products found; the carousel_extraction span reports it
+
+    return {
+        "Title": title,
+        "Price": price,
+        "Reviews Count": reviews,
+        "Ranking": ranking,
+        "Product Link": product_link,
+        "Related Products": related_products
+    }
+
+# Readiness conditions, each evaluated in one script call per poll.
+# They return a truthy state once the stage can be parsed, null while still loading,
+# and "blocked:<reason>" when Amazon served an anti-bot page instead.
+BLOCK_CHECK_JS = """
+const blockedBy = () => {
+    if (document.querySelector('form[action*="validateCaptcha"]') !== null) return "blocked:captcha";
+    if (document.title === "Robot Check") return "blocked:robot check";
+    if (document.body !== null && document.body.textContent.includes("api-services-support@amazon.com")) return "blocked:automated access";
+    return null;
+};
+"""
+
+HOME_READY_JS = BLOCK_CHECK_JS + """
+return document.getElementById("twotabsearchtextbox") || blockedBy();
+"""
+
+SEARCH_READY_JS = BLOCK_CHECK_JS + """
+const one = expr => document.evaluate(expr, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (one(arguments[0]) !== null) return "results";
+const noResults = one('//*[contains(text(), "did not match any products") or contains(text(), "No results for")]');
+return noResults !== null ? "empty" : blockedBy();
+"""
+
+DETAIL_READY_JS = BLOCK_CHECK_JS + """
+const one = expr => document.evaluate(expr, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+// Under the eager strategy the title may still be rendered by scripts, so it is
+// only reported missing once the page has fully loaded
+if (one('//*[@id="productTitle"]') === null) return blockedBy() || (document.readyState === "complete" ? "missing" : null);
+if (one('.//span[contains(@class, "a-price-whole")]') !== null) return "price";
+return document.readyState === "complete" ? "no-price" : null;
+"""
+
+CAROUSEL_READY_JS = """
+const carousel = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (carousel === null) return document.readyState === "complete" ? "absent" : null;
+return carousel.querySelector("li.a-carousel-card") !== null ? "loaded" : null;
+"""
+
+def wait_until_ready(driver, stage, script, timeouts, *args):
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    wait = WebDriverWait(driver, timeouts[stage], poll_frequency=0.1)
+    state = wait.until(lambda d: d.execute_script(script, *args))
+    if isinstance(state, str) and state.startswith("blocked:"):
+        raise BlockedError(f"{state[len('blocked:'):]} on the {stage} page")
+    return state
+
+# Detail navigation, traced as the detail_page stage: the page load plus its
+# readiness wait. Returns the readiness state, None if the readiness wait timed out
+# and "not-loaded" if driver.get itself did (the window may still show the last page).
+def open_detail_page(driver, url, timeouts, source, blocking=None, metrics=None):
+    from selenium.common.exceptions import TimeoutException
+
+    apply_resource_blocking(driver, "detail", blocking)
+    pace_request()
+    with span("detail_page", backend="selenium", source=source, url=url) as stage:
+        start = time.perf_counter()
+        try:
+            try:
+                driver.get(url)
+            except TimeoutException:
+                stage.outcome = "timeout"
+                return "not-loaded"
+            state = wait_until_ready(driver, "detail", DETAIL_READY_JS, timeouts)
+        except TimeoutException:
+            stage.outcome = "timeout"
+            return None
+        finally:
+            record_page_load(metrics, time.perf_counter() - start)
+        if state == "missing":
+            stage.miss("productTitle")
+        return state
+
+# Detail page once it is ready: wait for the carousel, then extract
+def load_product_details(driver, product_link, timeouts):
+    from selenium.common.exceptions import TimeoutException
+
+    with span("carousel_extraction", backend="selenium") as stage:
+        try:
+            if wait_until_ready(driver, "carousel", CAROUSEL_READY_JS, timeouts, CAROUSEL_XPATH) == "absent":
+                stage.miss("carousel")
+        except TimeoutException:
+            stage.outcome = "timeout"  # Carousel still loading, treat as no related products
+    return extract_product_details(driver, product_link)
+
+# Selenium counterpart of http_backend.fetch_indexed_product
+def open_indexed_product(driver, url_index, model_number, timeouts, blocking=None, metrics=None, archive=None, row=None):
+    entry = url_index.lookup(model_number)
+    if entry is None:
+        return None
+    state = open_detail_page(driver, entry["url"], timeouts, "index", blocking, metrics)
+    if state is None or state == "not-loaded":
+        return None
+    if state == "missing" or not is_same_listing(driver.current_url, entry["asin"]):
+        url_index.forget(model_number)
+        return None
+    product_info = load_product_details(driver, entry["url"], timeouts)
+    if archive is not None:
+        archive.save("detail", entry["url"], driver.page_source, [row], confidence=entry["confidence"])
+    product_info["Match Confidence"] = entry["confidence"]
+    return product_info
+
+# Search stage through the home page search box; [] when Amazon reports no results
+def run_search(driver, query, timeouts, blocking=None, metrics=None):
+    from selenium.webdriver.common.keys import Keys
+
+    apply_resource_blocking(driver, "home", blocking)
+    pace_request()
+    with span("search_page", backend="selenium", page="home"):
+        start = time.perf_counter()
+        try:
+            driver.get(AMAZON_BASE_URL + "/")
+            search_box = wait_until_ready(driver, "home", HOME_READY_JS, timeouts)
+        finally:
+            record_page_load(metrics, time.perf_counter() - start)
+    apply_resource_blocking(driver, "search", blocking)
+    search_box.send_keys(query)
+    pace_request()
+    with span("search_page", backend="selenium", page="results"):
+        start = time.perf_counter()
+        try:
+            search_box.send_keys(Keys.RETURN)
+            search_state = wait_until_ready(driver, "search", SEARCH_READY_JS, timeouts, RESULT_CARD_XPATH)
+        finally:
+            record_page_load(metrics, time.perf_counter() - start)
+    with span("card_parsing", backend="selenium") as stage:
+        if search_state == "empty":
+            stage.outcome = "no_results"
+            return []
+        cards = extract_search_cards(driver)
+        stage.set(cards=len(cards))
+        if not cards:
+            stage.miss("cards")
+        return cards
+
+# Detail stage for a matched listing; the detail is extracted even if readiness timed
+# out, but not when the page never loaded (None)
+def open_product(driver, product_link, timeouts, blocking=None, metrics=None):
+    if open_detail_page(driver, product_link, timeouts, "search", blocking, metrics) == "not-loaded":
+        return None
+    return load_product_details(driver, product_link, timeouts)
+
+# Selenium counterpart of http_backend.search_group_http: one search shared by the
+# group's rows, each matched against it with its own model number and brand.
+# None means no match; pages that failed to load give {"Error": ...} so the row can
+# be retried. Raises BlockedError on anti-bot pages.
+def scrape_group(driver, query, rows, timeouts=None, blocking=None, metrics=None, url_index=None, archive=None):
+    timeouts = {**STAGE_TIMEOUTS, **(timeouts or {})}
+    drain_transferred_bytes(driver)  # Discard traffic from before this group
+    results = {}
+
+    try:
+        # driver.get itself must not outlive the stage deadlines (the default is 300 s)
+        driver.set_page_load_timeout(max(timeouts["home"], timeouts["search"], timeouts["detail"]))
+        pending = []
+        for row in rows:
+            product_info = None
+            if url_index is not None:
+                product_info = open_indexed_product(driver, url_index, row.get("model_number"), timeouts, blocking, metrics, archive, row)
+            if product_info is not None:
+                results[row["idx"]] = product_info
+            else:
+                pending.append(row)
+        if not pending:
+            return results
+
+        cards = run_search(driver, query, timeouts, blocking, metrics)
+        if archive is not None:
+            archive.save("search", driver.current_url, driver.page_source, pending, query)
+        if not cards:
+            print("No products found.")
+            return {**results, **{row["idx"]: None for row in pending}}
+
+        pages = {}
+        page_sources = {}
+        for row in pending:
+            best_match, best_match_link, confidence = match_row(row, cards)
+            if best_match == None:
+                print("No suitable match found.")
+                results[row["idx"]] = None
+                continue
+            if best_match_link not in pages:
+                pages[best_match_link] = open_product(driver, best_match_link, timeouts, blocking, metrics)
+                if archive is not None and pages[best_match_link] is not None:
+                    page_sources[best_match_link] = driver.page_source
+            if pages[best_match_link] is None:
+                results[row["idx"]] = {"Error": f"Timed out loading {best_match_link}"}
+                continue
+            if archive is not None:
+                archive.save("detail", best_match_link, page_sources[best_match_link], [row], query, confidence)
+            results[row["idx"]] = {**pages[best_match_link], "Match Confidence": confidence}
+            if url_index is not None:
+                url_index.remember(row.get("model_number"), best_match_link, confidence)
+        return results
+
+    except BlockedError:
+        raise
+    except Exception as e:
+        print(f"Error: {e}")
+        # Rows already settled keep their result; the rest failed with the page
+        return {**{row["idx"]: {"Error": f"{type(e).__name__}: {e}"} for row in rows}, **results}
+    finally:
+        if metrics is not None:
+            metrics["bytes_transferred"] = metrics.get("bytes_transferred", 0) + drain_transferred_bytes(driver)
+
+def scrape_product(driver, product_name, timeouts=None, blocking=None, metrics=None, model_number=None, brand=None, url_index=None, archive=None):
+    row = {"idx": 0, "product_name": product_name, "model_number": model_number, "brand": brand}
+    return scrape_group(driver, product_name, [row], timeouts, blocking, metrics, url_index, archive)[0]
@@ -0,0 +1,192 @@
+from collections.abc import MutableMapping
+from threading import Lock
+
+from .browser import DriverPool
+from .results_store import ResultsStore, segment_summary
+from .scheduler import ScrapeScheduler
+from .throttle import get_rate_controller
+
+# Scheduler workers and browser sessions shared by every run in the process;
+# the adaptive controller decides how many of them are busy at a time
+MAX_WORKERS = 8
+
+# Passed to the followers of a search whose run was cancelled before it finished
+ABANDONED = object()
+
+# One in-flight search per product: the first run to ask leads, later runs
+# register a callback and get the leader's result instead of scraping again
+class SingleFlight:
+    def __init__(self):
+        self._lock = Lock()
+        self._followers = {}
+
+    # True if the caller should scrape `key` itself and resolve() it when done
+    def join(self, key, callback):
+        with self._lock:
+            if key in self._followers:
+                self._followers[key].append(callback)
+                return False
+            self._followers[key] = []
+            return True
+
+    def resolve(self, key, result):
+        with self._lock:
+            followers = self._followers.pop(key, [])
+        for callback in followers:
+            try:
+                callback(result)
+            except Exception as e:
+                print(f"Error in single-flight callback: {e}")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._followers)
+
+# Latest result per product for the whole process, plus its typed tables, keyed by
+# product_cache_key(name, model number) like the cache and single-flight searches.
+# Failed lookups never replace a result another run already found.
+class SharedResults:
+    def __init__(self):
+        self._lock = Lock()
+        self._results = {}
+        self.store = ResultsStore()
+
+    def put(self, product_key, result, metadata=None):
+        if not result:
+            return
+        with self._lock:
+            current = self._results.get(product_key)
+            if "Error" in result and current and "Error" not in current:
+                return
+            self._results[product_key] = result
+        self.store.add(product_key, result, metadata)
+
+    def get(self, product_key):
+        with self._lock:
+            return self._results.get(product_key)
+
+    def session(self):
+        return SessionResults(self)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
+
+def _rows_of(table, keys):
+    return table[table["product_key"].isin(keys)]
+
+def _index_of(table, keys):
+    return table[table.index.isin(keys)]
+
+# One dashboard session's products, read from the shared results: behaves like a
+# {product key: result} dict, keeps each product's catalog row for display, and
+# filters the shared tables to the session's products once per change.
+class SessionResults(MutableMapping):
+    def __init__(self, shared):
+        self._shared = shared
+        self._lock = Lock()
+        self._keys = {}
+        self._views = {}
+
+    # Failed lookups are not listed as the session's products
+    def add(self, product_key, result, metadata=None):
+        if not result or "Error" in result:
+            return
+        self._shared.put(product_key, result, metadata)
+        with self._lock:
+            if metadata or product_key not in self._keys:
+                self._keys[product_key] = metadata or {}
+
+    def add_many(self, items):
+        for product_key, result, metadata in items:
+            self.add(product_key, result, metadata)
+
+    def __setitem__(self, product_key, result):
+        self.add(product_key, result)
+
+    def __getitem__(self, product_key):
+        with self._lock:
+            if product_key not in self._keys:
+                raise KeyError(product_key)
+        return self._shared.get(product_key)
+
+    def __delitem__(self, product_key):
+        with self._lock:
+            del self._keys[product_key]
+
+    # Catalog row the product was added with ({} if none)
+    def metadata(self, product_key):
+        with self._lock:
+            return self._keys.get(product_key) or {}
+
+    def name(self, product_key):
+        return self.metadata(product_key).get("product_name") or product_key
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._keys))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+    def _view(self, name, build):
+        store = self._shared.store
+        store.portfolio  # flush pending results so the version is current
+        with self._lock:
+            version = (store.version, len(self._keys))
+            keys = list(self._keys)
+            cached = self._views.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = build(store, keys)
+        with self._lock:
+            self._views[name] = (version, value)
+        return value
+
+    @property
+    def products(self):
+        return self._view("products", lambda store, keys: _rows_of(store.products, keys))
+
+    @property
+    def competitors(self):
+        return self._view("competitors", lambda store, keys: _rows_of(store.competitors, keys))
+
+    @property
+    def metrics(self):
+        return self._view("metrics", lambda store, keys: _index_of(store.metrics, keys))
+
+    @property
+    def portfolio(self):
+        return self._view("portfolio", lambda store, keys: _index_of(store.portfolio, keys))
+
+    @property
+    def segments(self):
+        return self._view("segments", lambda store, keys: segment_summary(self.portfolio))
+
+# Process-wide scraping for all dashboard sessions: one scheduler with fair-share
+# queuing between sessions, one browser pool, single-flight searches and shared results.
+# BatchRun(service=..., tenant=session_id) submits to it. The worker ceiling and the
+# request budget are set here once, since every run shares them.
+class ScrapeService:
+    def __init__(self, max_workers=MAX_WORKERS, requests_per_second=None):
+        self.max_workers = max_workers
+        get_rate_controller().configure(max_concurrency=max_workers, requests_per_second=requests_per_second)
+        self.pool = DriverPool(size=max_workers)
+        self.scheduler = ScrapeScheduler(concurrency=max_workers).start()
+        self.flights = SingleFlight()
+        self.results = SharedResults()
+
+    def snapshot(self):
+        tenants = self.scheduler.tenants()
+        return {
+            "sessions": len(tenants),
+            "queued": sum(tenant["queued"] for tenant in tenants.values()),
+            "running": sum(tenant["running"] for tenant in tenants.values()),
+            "in_flight_products": len(self.flights),
+            "shared_products": len(self.results),
+        }
+
+    def shutdown(self):
+        self.scheduler.shutdown()
+        self.pool.shutdown()
@@ -0,0 +1,16 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+# Short-lived SQLite connection that commits on success and always closes
+@contextmanager
+def sqlite_connection(path):
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def ensure_parent_dir(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
@@ -0,0 +1,185 @@
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+from .config import MAX_REQUESTS_PER_SECOND
+
+# AIMD tuning: one more worker after `limit` healthy groups in a row, half the
+# workers, half the request rate and an exponential, jittered pause on every block page
+INITIAL_CONCURRENCY = 3
+MIN_CONCURRENCY = 1
+MIN_REQUESTS_PER_SECOND = 0.2
+RATE_INCREASE = 0.1
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 120.0
+# Error rate is reported over this many recent groups
+ERROR_WINDOW = 50
+
+# Requests-per-second budget; acquire() blocks until a token is available
+class TokenBucket:
+    def __init__(self, rate):
+        self._lock = Lock()
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+            self.burst = max(1.0, rate)
+            self._tokens = min(self._tokens, self.burst)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if self.rate <= 0:
+                    return
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+# Adaptive concurrency shared by every batch in the process, since Amazon throttles
+# the client as a whole: workers hold a slot per search group, and every page
+# request goes through the backoff window and the requests-per-second budget.
+class AdaptiveController:
+    def __init__(self, max_concurrency=INITIAL_CONCURRENCY, requests_per_second=MAX_REQUESTS_PER_SECOND,
+                 min_concurrency=MIN_CONCURRENCY, backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS):
+        self._cond = Condition()
+        self._bucket = TokenBucket(requests_per_second)
+        self.max_requests_per_second = requests_per_second
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(min_concurrency, max_concurrency)
+        self.limit = min(INITIAL_CONCURRENCY, self.max_concurrency)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.backoff_until = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.throttle_events = 0
+        self.last_block = None
+        self._outcomes = deque(maxlen=ERROR_WINDOW)
+        self._healthy_streak = 0
+        self._consecutive_blocks = 0
+
+    def configure(self, max_concurrency=None, requests_per_second=None):
+        with self._cond:
+            if max_concurrency is not None:
+                self.max_concurrency = max(self.min_concurrency, max_concurrency)
+                self.limit = min(self.limit, self.max_concurrency)
+            if requests_per_second is not None:
+                self.max_requests_per_second = requests_per_second
+                self._bucket.set_rate(requests_per_second)
+            self._cond.notify_all()
+
+    @property
+    def requests_per_second(self):
+        return self._bucket.rate
+
+    # Held by a worker for one search group; waits while over the limit or backing off
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while True:
+                remaining = self.backoff_until - time.monotonic()
+                if remaining <= 0 and self.in_flight < self.limit:
+                    break
+                self._cond.wait(timeout=min(max(remaining, 0.05), 1.0))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    # Called before every page request by both backends
+    def before_request(self):
+        while True:
+            with self._cond:
+                remaining = self.backoff_until - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(remaining)
+        self._bucket.acquire()
+        with self._cond:
+            self.requests += 1
+
+    def record_success(self):
+        with self._cond:
+            self._outcomes.append(True)
+            self._consecutive_blocks = 0
+            self._healthy_streak += 1
+            if self._healthy_streak >= self.limit and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._healthy_streak = 0
+            if 0 < self._bucket.rate < self.max_requests_per_second:
+                self._bucket.set_rate(min(self.max_requests_per_second, self._bucket.rate + RATE_INCREASE))
+            self._cond.notify_all()
+
+    # A failed group that was not a block page (timeouts, no match, parse errors)
+    def record_error(self):
+        with self._cond:
+            self._outcomes.append(False)
+
+    # Returns the pause in seconds. Blocks seen while already backing off belong to
+    # the same throttling episode and do not shrink the limit again.
+    def record_block(self, reason):
+        with self._cond:
+            self._outcomes.append(False)
+            self.throttle_events += 1
+            self.last_block = reason
+            self._healthy_streak = 0
+            now = time.monotonic()
+            if now < self.backoff_until:
+                return self.backoff_until - now
+            self._consecutive_blocks += 1
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            if self._bucket.rate > 0:
+                self._bucket.set_rate(max(MIN_REQUESTS_PER_SECOND, self._bucket.rate / 2))
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (self._consecutive_blocks - 1))
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            self.backoff_until = now + delay
+            return delay
+
+    @property
+    def error_rate(self):
+        with self._cond:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+
+    def snapshot(self):
+        error_rate = self.error_rate
+        with self._cond:
+            return {
+                "concurrency": self.limit,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "requests_per_second": self._bucket.rate,
+                "throttle_events": self.throttle_events,
+                "last_block": self.last_block,
+                "error_rate": error_rate,
+                "backoff_seconds": max(0.0, self.backoff_until - time.monotonic()),
+            }
+
+_rate_controller = None
+_rate_controller_lock = Lock()
+
+def get_rate_controller():
+    global _rate_controller
+    with _rate_controller_lock:
+        if _rate_controller is None:
+            _rate_controller = AdaptiveController()
+        return _rate_controller
+
+def pace_request():
+    get_rate_controller().before_request()
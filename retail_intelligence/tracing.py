@@ -0,0 +1,195 @@
+import atexit
+import json
+import os
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from .config import TRACE_DIR
+from .parsing import BlockedError, JavaScriptRequired
+
+# Scrape stages in pipeline order, as they appear in summaries
+STAGES = [
+    "driver_start", "search_page", "card_parsing", "matching",
+    "detail_page", "field_extraction", "carousel_extraction",
+]
+# no_results: the search found nothing; no_match: no card matched the row;
+# stale_link: an indexed product URL no longer points at the listing
+OUTCOMES = ["ok", "no_results", "no_match", "stale_link", "timeout", "selector_miss", "blocked", "error"]
+PERCENTILES = (50, 95, 99)
+# Recent spans per stage kept in memory for the live percentiles
+WINDOW = 5000
+# Spans buffered before they are appended to the trace file
+FLUSH_SPANS = 50
+
+# Attributes (job, query, product...) added to every span opened in this thread
+_context = ContextVar("trace_context", default={})
+
+@contextmanager
+def trace_context(**attrs):
+    token = _context.set({**_context.get(), **{key: value for key, value in attrs.items() if value is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+def classify(error):
+    if isinstance(error, BlockedError):
+        return "blocked"
+    if isinstance(error, JavaScriptRequired):
+        return "selector_miss"
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return "timeout"
+    if type(error).__name__ in ("NoSuchElementException", "StaleElementReferenceException"):
+        return "selector_miss"
+    return "error"
+
+# One timed stage; set .outcome (and any attributes) before the block ends.
+# An exception escaping the block sets the outcome from its type and is re-raised.
+class Span:
+    def __init__(self, stage, attrs):
+        self.stage = stage
+        self.attrs = attrs
+        self.outcome = "ok"
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def miss(self, field):
+        self.outcome = "selector_miss"
+        self.attrs.setdefault("missing", []).append(field)
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+# Per-stage latency percentiles and outcome counts over span records
+def summarize(records):
+    durations = defaultdict(list)
+    outcomes = defaultdict(Counter)
+    for record in records:
+        durations[record["stage"]].append(record["ms"])
+        outcomes[record["stage"]][record["outcome"]] += 1
+    stages = [stage for stage in STAGES if stage in durations] + sorted(set(durations) - set(STAGES))
+    summary = []
+    for stage in stages:
+        ordered = sorted(durations[stage])
+        row = {"stage": stage, "count": len(ordered)}
+        for pct in PERCENTILES:
+            row[f"p{pct}_ms"] = _percentile(ordered, pct)
+        row["max_ms"] = ordered[-1]
+        for outcome in OUTCOMES:
+            row[outcome] = outcomes[stage][outcome]
+        summary.append(row)
+    return summary
+
+def read_trace(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def format_summary(summary):
+    lines = [
+        f"{'stage':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  outcomes"
+    ]
+    for row in summary:
+        outcomes = ", ".join(f"{outcome} {row[outcome]}" for outcome in OUTCOMES if row[outcome])
+        lines.append(
+            f"{row['stage']:<20}{row['count']:>8}" + "".join(f"{row[key]:>10.1f}" for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+            + f"  {outcomes}"
+        )
+    return "\n".join(lines)
+
+# Collects spans from every worker thread: recent ones stay in memory for live
+# percentiles, all of them are appended to a JSONL file (one day per file under
+# TRACE_DIR unless a path is given; no file when both are empty).
+class Tracer:
+    def __init__(self, path=None, directory=TRACE_DIR, window=WINDOW, flush_every=FLUSH_SPANS):
+        self.path = path
+        self.directory = directory
+        self.flush_every = flush_every
+        self._lock = Lock()
+        self._recent = defaultdict(lambda: deque(maxlen=window))
+        self._pending = []
+        self.spans = 0
+
+    def trace_path(self):
+        if self.path:
+            return self.path
+        if self.directory:
+            return os.path.join(self.directory, f"trace-{time.strftime('%Y%m%d')}.jsonl")
+        return None
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        span = Span(stage, {**_context.get(), **attrs})
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.outcome = classify(e)
+            span.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            self.record({
+                "ts": round(started, 3),
+                "stage": stage,
+                "outcome": span.outcome,
+                "ms": round((time.perf_counter() - start) * 1000, 2),
+                **span.attrs,
+                **({"error": span.error} if span.error else {}),
+            })
+
+    def record(self, record):
+        with self._lock:
+            self._recent[record["stage"]].append(record)
+            self._pending.append(record)
+            self.spans += 1
+            if len(self._pending) >= self.flush_every:
+                self._write()
+
+    def _write(self):
+        pending, self._pending = self._pending, []
+        path = self.trace_path()
+        if not pending or path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(record, default=str) + "\n" for record in pending))
+        except OSError as e:
+            print(f"Could not write trace file {path}: {e}")
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def summary(self):
+        with self._lock:
+            records = [record for recent in self._recent.values() for record in recent]
+        return summarize(records)
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+
+_tracer = None
+_tracer_lock = Lock()
+
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            atexit.register(_tracer.flush)
+        return _tracer
+
+def span(stage, **attrs):
+    return get_tracer().span(stage, **attrs)
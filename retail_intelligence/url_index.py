@@ -0,0 +1,65 @@
+import os
+import re
+import time
+from threading import Lock
+
+from .cache import normalize_key_part
+from .config import DATA_DIR
+from .storage import ensure_parent_dir, sqlite_connection
+
+# Only matches at least this confident are trusted enough to skip the search next time
+MIN_INDEX_CONFIDENCE = 85.0
+
+ASIN_PATTERN = re.compile(r"/(?:dp|gp/product)/([A-Z0-9]{10})(?:[/?]|$)")
+
+def extract_asin(url):
+    match = ASIN_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+# True when a (possibly redirected) URL still points at the indexed listing
+def is_same_listing(url, asin):
+    return asin is None or extract_asin(url) == asin
+
+# Model Number -> resolved product URL / ASIN, persisted across runs
+class UrlIndex:
+    def __init__(self, path=None, min_confidence=MIN_INDEX_CONFIDENCE):
+        self.path = path or os.path.join(DATA_DIR, "url_index.sqlite")
+        self.min_confidence = min_confidence
+        self._lock = Lock()
+        ensure_parent_dir(self.path)
+        with sqlite_connection(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS url_index ("
+                "model_key TEXT PRIMARY KEY, url TEXT NOT NULL, asin TEXT, "
+                "confidence REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def lookup(self, model_number):
+        model_key = normalize_key_part(model_number)
+        if not model_key:
+            return None
+        with sqlite_connection(self.path) as conn:
+            row = conn.execute("SELECT url, asin, confidence FROM url_index WHERE model_key = ?", (model_key,)).fetchone()
+        if row is None:
+            return None
+        return {"url": row[0], "asin": row[1], "confidence": row[2]}
+
+    def remember(self, model_number, url, confidence):
+        model_key = normalize_key_part(model_number)
+        if not model_key or confidence < self.min_confidence:
+            return False
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO url_index (model_key, url, asin, confidence, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (model_key, url, extract_asin(url), confidence, time.time())
+            )
+        return True
+
+    # Called when an indexed link is dead or redirects elsewhere
+    def forget(self, model_number):
+        with self._lock, sqlite_connection(self.path) as conn:
+            conn.execute("DELETE FROM url_index WHERE model_key = ?", (normalize_key_part(model_number),))
+
+    def __len__(self):
+        with sqlite_connection(self.path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM url_index").fetchone()[0]
@@ -0,0 +1,170 @@
+import os
+import socket
+import time
+import uuid
+from threading import Event, Thread
+
+from .jobs import JobStore
+
+# Rows one worker leases at a time; variants of one product line stay together,
+# so the leased rows still share searches
+LEASE_ROWS = 40
+# A leased row is handed to another worker if its lease is not renewed for this long
+LEASE_SECONDS = 120.0
+# Idle workers check the queue this often
+POLL_SECONDS = 2.0
+# Leased batches a worker keeps running, so workers stay busy while a batch drains
+ACTIVE_BATCHES = 2
+
+# Pulls leased rows from the queued jobs in the job store and scrapes them with
+# BatchRun on one ScrapeService (shared scheduler and browser pool), writing each
+# result back as it lands. A heartbeat renews the worker's leases; if the process
+# dies, the leases expire and the rows are leased again by another worker.
+class Worker:
+    def __init__(self, job_store=None, worker_id=None, concurrency=6, backend="http", requests_per_second=None,
+                 lease_rows=LEASE_ROWS, lease_seconds=LEASE_SECONDS, poll_seconds=POLL_SECONDS, cache_ttl_seconds=None):
+        self.job_store = job_store or JobStore()
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self.concurrency = concurrency
+        self.backend = backend
+        self.requests_per_second = requests_per_second
+        self.lease_rows = lease_rows
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.rows_done = 0
+        self._stopped = Event()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                self.job_store.renew(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                print(f"Worker {self.worker_id}: lease renewal failed: {e}")
+
+    def _start_batch(self, job_id, rows, service, cache, url_index, history):
+        from .batch import CANCELLED, BatchRun
+
+        def settle(row, result):
+            if result is not None and result.get("Error") == CANCELLED:
+                return  # Still leased; release() puts it back without using up an attempt
+            self.job_store.settle(job_id, row["idx"], result)
+            self.rows_done += 1
+
+        return BatchRun(
+            rows, concurrency=self.concurrency, backend=self.backend, cache=cache,
+            cache_ttl_seconds=self.cache_ttl_seconds, url_index=url_index, on_result=settle,
+            service=service, tenant=job_id, history=history
+        )
+
+    # Work until stop() (or, with exit_when_idle, until the queue is empty)
+    def run(self, exit_when_idle=False):
+        from .cache import ScrapeCache
+        from .history import PriceHistory
+        from .service import ScrapeService
+        from .url_index import UrlIndex
+
+        service = ScrapeService(max_workers=self.concurrency, requests_per_second=self.requests_per_second)
+        cache, url_index, history = ScrapeCache(), UrlIndex(), PriceHistory()
+        heartbeat = Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        active = []
+        try:
+            while not self._stopped.is_set():
+                for run in [run for run in active if run.done]:
+                    run.close()
+                    active.remove(run)
+                leased = False
+                if len(active) < ACTIVE_BATCHES:
+                    job_id, rows = self.job_store.lease(self.worker_id, self.lease_rows, self.lease_seconds)
+                    if rows:
+                        leased = True
+                        active.append(self._start_batch(job_id, rows, service, cache, url_index, history))
+                if not active and not leased:
+                    if exit_when_idle:
+                        break
+                    self._stopped.wait(self.poll_seconds)
+                elif not leased:
+                    active[0].wait(0.2)
+        finally:
+            self._stopped.set()
+            for run in active:
+                run.cancel()
+            for run in active:
+                run.wait()
+                run.close()
+            # Cancelled rows go back to the queue at once instead of waiting out their lease
+            self.job_store.release(self.worker_id)
+            service.shutdown()
+            heartbeat.join()
+        return self.rows_done
+
+    def stop(self):
+        self._stopped.set()
+
+def _worker_main(options, exit_when_idle):
+    worker = Worker(**options)
+    print(f"Worker {worker.worker_id} started", flush=True)
+    try:
+        worker.run(exit_when_idle)
+    except KeyboardInterrupt:
+        pass
+    print(f"Worker {worker.worker_id} stopped after {worker.rows_done} rows", flush=True)
+
+# Run `processes` workers on this host, each in its own process with its own
+# scheduler, browser pool and request budget; returns when all have exited
+def run_workers(processes=1, exit_when_idle=False, **options):
+    if processes <= 1:
+        _worker_main(options, exit_when_idle)
+        return
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    children = [context.Process(target=_worker_main, args=(options, exit_when_idle)) for _ in range(processes)]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        for child in children:
+            child.join()
+
+# The submitting side of a queued job, for the dashboard: results are read back
+# from the job store as workers settle rows, without scraping in this process
+class QueuedJob:
+    def __init__(self, job_store, job_id, total):
+        self.job_store = job_store
+        self.job_id = job_id
+        self.total = total
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.status = job_store.queue_status(job_id)
+        self._since = None
+
+    # Rows settled since the previous poll (a row may come twice near the boundary)
+    def poll(self):
+        now = time.time()
+        rows = self.job_store.rows(self.job_id, statuses=("done", "failed"), since=self._since)
+        self._since = now - 1.0
+        self.status = self.job_store.queue_status(self.job_id)
+        if self.done and self.finished_at is None:
+            self.finished_at = time.monotonic()
+        return rows
+
+    @property
+    def completed(self):
+        return self.status["done"] + self.status["failed"]
+
+    @property
+    def cancelled(self):
+        return not self.status["queued"]
+
+    # Finished, or cancelled with no row still leased
+    @property
+    def done(self):
+        return self.status["pending"] == 0 or (self.cancelled and self.status["leased"] == 0)
+
+    def cancel(self):
+        self.job_store.cancel_job(self.job_id)
+        self.status = self.job_store.queue_status(self.job_id)
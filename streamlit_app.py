@@ -5,168 +5,28 @@ import os
 import base64
 from io import BytesIO
 import json
-from threading import Thread
-import queue
-
-# Import your existing scraping function
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import re
-from fuzzywuzzy import fuzz
-
-# Your existing search_amazon function
-def search_amazon(product_name):
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/99.0.4844.74 Safari/537.36")
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    wait = WebDriverWait(driver, 10)
+import uuid
+from collections import Counter
 
-    try:
-        driver.get("https://www.amazon.in/")
-        search_box = wait.until(EC.presence_of_element_located((By.ID, "twotabsearchtextbox")))
-        search_box.send_keys(product_name)
-        search_box.send_keys(Keys.RETURN)
-        time.sleep(3)
-
-        products = wait.until(EC.presence_of_all_elements_located((By.XPATH, '//div[contains(@data-component-type, "s-search-result")]')))
-        if not products:
-            print("No products found.")
-            return None
-        
-        best_match = None
-        best_match_link = None
-        highest_match_score = 0
-        i = 0
+# Wall-clock time of this script run, shown in the sidebar
+RERUN_START = time.perf_counter()
+# Product tags shown per page in the upload tab
+TAGS_PER_PAGE = 60
 
-        for product in products:
-            try:
-                is_sponsored = product.find_elements(By.XPATH, './/span[contains(text(), "Sponsored")]')
-                if is_sponsored:
-                    continue  
-                
-                title_element = product.find_element(By.XPATH, './/h2/span')
-                title = title_element.text.strip()
-                match_score = fuzz.partial_ratio(product_name.lower(), title.lower())
-                if match_score > highest_match_score:
-                    highest_match_score = match_score
-                    best_match = title
-                    product_link = product.find_element(By.XPATH, './/a[contains(@class, "a-link-normal")][@href]').get_attribute("href")
-                    if product_link.startswith("/"):
-                        product_link = "https://www.amazon.in" + product_link
-                    best_match_link = product_link
-                i += 1
-                if i == 2:
-                    break
-            except:
-                continue
-
-        if best_match == None:
-            print("No suitable match found.")
-            return None
-
-        driver.get(best_match_link)
-        time.sleep(2)
-
-        try:
-            title = wait.until(EC.presence_of_element_located((By.ID, "productTitle"))).text.strip()
-        except:
-            title = "Title Not Found"
-
-        try:
-            price = driver.find_element(By.XPATH, './/span[contains(@class, "a-price-whole")]').text.strip()
-        except:
-            price = "Price Not Found"
-
-        try:
-            reviews = driver.find_element(By.XPATH, '//span[@id="acrCustomerReviewText"]').text
-        except:
-            reviews = "No Reviews"
-
-        try:
-            ranking = driver.find_element(By.XPATH, '//span[@id="acrPopover"]').get_attribute("title")
-        except:
-            ranking = "Ranking Not Available"
-
-        related_products = []
-        try:
-            elements = driver.find_element(By.XPATH, '//div[contains(@id, "sp_detail_thematic-prime_theme_for_non_prime_members")]')
-            competitors = elements.find_elements(By.XPATH, './/li[contains(@class, "a-carousel-card")]')
-
-            for comp in competitors[:5]:
-                try:
-                    comp_title = comp.find_element(By.XPATH, './/div[contains(@class, "sponsored-products-truncator-afo-4")]').text.strip()
-                except:
-                    comp_title = "Title Not Available"
-                
-                try:
-                    comp_price = comp.find_element(By.XPATH, './/span[@class="a-price-whole"]').text.strip()
-                except:
-                    comp_price = "Price Not Available"
-                
-                try:
-                    comp_ranking_element = comp.find_element(By.XPATH, './/a[contains(@class, "adReviewLink")]').get_attribute("aria-label")
-                    rating_match = re.search(r"(\d+\.\d+) out of (\d+) stars", comp_ranking_element)
-                    comp_ranking = rating_match.group(0) if rating_match else "Rating Not Available"
-                except:
-                    comp_ranking = "Rating Not Available"
-                
-                try:
-                    reviews_match = re.search(r"(\d+)\s+ratings?", comp_ranking_element)
-                    comp_reviews = reviews_match.group(1) if reviews_match else "No Reviews"
-                except:
-                    comp_reviews = "No Reviews"
-                
-                related_products.append({
-                    "Title": comp_title,
-                    "Price": comp_price,
-                    "Rating": comp_ranking,
-                    "Reviews": comp_reviews
-                })
-        except:
-            pass  # No related products found
-
-        product_info = {
-            "Title": title,
-            "Price": price,
-            "Reviews Count": reviews,
-            "Ranking": ranking,
-            "Product Link": best_match_link,
-            "Related Products": related_products
-        }
-
-        return product_info
-    
-    except Exception as e:
-        print(f"Error: {e}")
-        return None
-    finally:
-        driver.quit()
-
-# Function to process products in a queue for multithreading
-def process_queue(q, results, progress_counter):
-    while not q.empty():
-        idx, product_name = q.get()
-        try:
-            results[idx] = search_amazon(product_name)
-            progress_counter[0] += 1
-        except Exception as e:
-            results[idx] = {"Error": str(e)}
-            progress_counter[0] += 1
-        finally:
-            q.task_done()
+# Scraping engine (importable without Streamlit, see retail_intelligence/)
+from retail_intelligence.archive import SnapshotArchive
+from retail_intelligence.batch import BatchRun
+from retail_intelligence.cache import ScrapeCache, product_cache_key
+from retail_intelligence.config import BLOCKED_RESOURCES, MAX_REQUESTS_PER_SECOND, STAGE_BLOCKING, STAGE_TIMEOUTS
+from retail_intelligence.exporters import LONG_FORMATS, export_workbook, long_format_archive
+from retail_intelligence.history import PriceHistory
+from retail_intelligence.ingest import MissingColumnsError, read_catalog
+from retail_intelligence.jobs import JobStore
+from retail_intelligence.scraper import search_amazon
+from retail_intelligence.service import ScrapeService
+from retail_intelligence.tracing import get_tracer
+from retail_intelligence.url_index import UrlIndex
+from retail_intelligence.worker import QueuedJob
 
 # Set up the Streamlit page
 st.set_page_config(
@@ -259,11 +119,41 @@ st.markdown("""
 # Header
 st.markdown('<div class="header"><h1>🛒 Retail Intelligence Dashboard</h1></div>', unsafe_allow_html=True)
 
+# Shared by every session in this process
+@st.cache_resource
+def get_scrape_cache():
+    return ScrapeCache()
+
+@st.cache_resource
+def get_job_store():
+    return JobStore()
+
+@st.cache_resource
+def get_url_index():
+    return UrlIndex()
+
+@st.cache_resource
+def get_snapshot_archive():
+    return SnapshotArchive()
+
+@st.cache_resource
+def get_price_history():
+    return PriceHistory()
+
+# One scheduler and browser pool for all sessions, with single-flight searches and shared results
+@st.cache_resource
+def get_scrape_service():
+    return ScrapeService()
+
 # Initialize session state
-if 'df' not in st.session_state:
-    st.session_state.df = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:8]
+if 'catalog' not in st.session_state:
+    st.session_state.catalog = None
+# This session's products in the shared results: result dicts by product name plus
+# typed tables (numeric price/rating/reviews) used by the Analysis and Portfolio tabs
 if 'results' not in st.session_state:
-    st.session_state.results = {}
+    st.session_state.results = get_scrape_service().results.session()
 if 'analyzed' not in st.session_state:
     st.session_state.analyzed = False
 if 'selected_product' not in st.session_state:
@@ -272,9 +162,299 @@ if 'progress' not in st.session_state:
     st.session_state.progress = 0
 if 'total_products' not in st.session_state:
     st.session_state.total_products = 0
+if 'batch_run' not in st.session_state:
+    st.session_state.batch_run = None
+if 'batch_seen' not in st.session_state:
+    st.session_state.batch_seen = 0
+# Job handed to worker processes; its results are read back from the job store
+if 'queued_job' not in st.session_state:
+    st.session_state.queued_job = None
+
+# Sidebar settings
+with st.sidebar:
+    st.markdown("<h3>⚙️ Scraper Settings</h3>", unsafe_allow_html=True)
+    backend_label = st.radio(
+        "Scraping backend",
+        ["HTTP (Selenium fallback)", "Selenium only"],
+        help="The HTTP backend parses static HTML and only starts Chrome for pages that need JavaScript."
+    )
+    backend = "http" if backend_label.startswith("HTTP") else "selenium"
+    # Every session shares one scraper, so its limits are fixed when the service starts
+    st.caption(
+        f"Up to {get_scrape_service().max_workers} workers and {MAX_REQUESTS_PER_SECOND:g} page requests per second, "
+        "shared by all sessions. Workers are added while pages load cleanly and halved when Amazon serves CAPTCHA or "
+        "throttling pages; set RETAIL_INTELLIGENCE_MAX_RPS to change the request budget."
+    )
+    hedge = st.checkbox(
+        "Hedge slow products", value=True,
+        help="Start a duplicate attempt on a free worker for products running longer than 95% of the batch; the first result wins."
+    )
+    group_searches = st.checkbox(
+        "Share searches between similar products", value=True,
+        help="Variants of one product line (same Brand and Category, similar names) are matched against a single search."
+    )
+    use_workers = st.checkbox(
+        "Run on worker processes",
+        help="Queue the catalog for `python -m retail_intelligence worker` processes (on this machine or others sharing "
+             "the job store) and only read their results here. Scraper settings then come from the workers."
+    )
+    with st.expander("Result cache"):
+        cache_ttl_hours = st.number_input("Cache TTL (hours)", min_value=0.0, max_value=24.0 * 30, value=24.0, step=1.0)
+        force_refresh = st.checkbox("Force refresh", help="Ignore cached results and scrape every product again.")
+        use_url_index = st.checkbox(
+            "Open known product pages directly", value=True,
+            help="Skip the search for Model Numbers matched with high confidence in earlier runs."
+        )
+        keep_snapshots = st.checkbox(
+            "Keep page snapshots",
+            help="Archive every fetched page compressed, so results can be rebuilt with `python -m retail_intelligence reparse` after a selector fix."
+        )
+    with st.expander("Stage timeouts (seconds)"):
+        timeouts = {
+            stage: st.number_input(stage.capitalize(), min_value=1, max_value=60, value=default, key=f"timeout_{stage}")
+            for stage, default in STAGE_TIMEOUTS.items()
+        }
+    with st.expander("Blocked resources (Selenium)"):
+        blocking = {
+            stage: st.multiselect(stage.capitalize(), list(BLOCKED_RESOURCES), default=default, key=f"blocking_{stage}")
+            for stage, default in STAGE_BLOCKING.items()
+        }
+
+# Cached by content hash, so reruns reuse the parsed upload and the built files.
+# The catalog is read-only once built, so sessions share it without copying.
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_catalog(file_bytes):
+    try:
+        return read_catalog(file_bytes)
+    except MissingColumnsError:
+        return None
+
+@st.cache_data(show_spinner=False)
+def create_template():
+    df = pd.DataFrame({
+        "Brand": ["Dyanora", "Dyanora"],
+        "Category": ["Television", "Television"],
+        "Product Name": ["Dyanora 24 INCH HD Ready LED TV (DY-LD24H0N)", "Dyanora 24 INCH HD Ready LED Smart Linux TV (DY-LD24H4S)"],
+        "Model Number": ["DY-LD24H0N", "DY-LD24H4S"]
+    })
+    buffer = BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def create_json_report(product_data):
+    return json.dumps(product_data, indent=4)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def create_excel_report(product_data, product_name):
+    # Create a DataFrame for the main product
+    main_df = pd.DataFrame({
+        "Product Name": [product_name],
+        "Title": [product_data.get('Title', 'N/A')],
+        "Price": [product_data.get('Price', 'N/A')],
+        "Reviews": [product_data.get('Reviews Count', 'N/A')],
+        "Rating": [product_data.get('Ranking', 'N/A')],
+        "Product Link": [product_data.get('Product Link', 'N/A')]
+    })
+    
+    # Create a DataFrame for competitors
+    competitors = product_data.get('Related Products', [])
+    comp_data = []
+    for i, comp in enumerate(competitors):
+        comp_data.append({
+            "Competitor #": i+1,
+            "Title": comp.get('Title', 'N/A'),
+            "Price": comp.get('Price', 'N/A'),
+            "Rating": comp.get('Rating', 'N/A'),
+            "Reviews": comp.get('Reviews', 'N/A')
+        })
+    
+    comp_df = pd.DataFrame(comp_data) if comp_data else pd.DataFrame()
+    
+    # Create Excel file with multiple sheets
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        main_df.to_excel(writer, sheet_name='Product Details', index=False)
+        if not comp_df.empty:
+            comp_df.to_excel(writer, sheet_name='Competitors', index=False)
+    
+    return buffer.getvalue()
+
+# Streamed to a temp file by xlsxwriter instead of held in memory while it is built
+def create_full_report(results):
+    path = export_workbook(results.items())
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+def reset_results():
+    st.session_state.results = get_scrape_service().results.session()
+
+# Results are keyed like the cache and single-flight searches, so rows with the same
+# name but different model numbers never overwrite each other
+def result_key(row):
+    return product_cache_key(row["product_name"], row.get("model_number"))
+
+# {key: product name for display}, with the model number when products share a name
+def product_labels(results):
+    names = {key: results.name(key) for key in results}
+    shared = {name for name, count in Counter(names.values()).items() if count > 1}
+    return {
+        key: f"{name} ({results.metadata(key).get('model_number') or 'no model'})" if name in shared else name
+        for key, name in names.items()
+    }
+
+# Start a batch for this session on the shared service; finished products stream into st.session_state.results
+def start_batch_run(rows, job_id=None, source=None):
+    results = st.session_state.results
+
+    def on_result(row, result):
+        results.add(result_key(row), result, row)
+
+    st.session_state.batch_seen = 0
+    return BatchRun(
+        rows, backend=backend, timeouts=timeouts, blocking=blocking,
+        cache=get_scrape_cache(), cache_ttl_seconds=cache_ttl_hours * 3600, force_refresh=force_refresh,
+        job_store=get_job_store(), job_id=job_id, source=source,
+        url_index=get_url_index() if use_url_index else None, on_result=on_result,
+        group_searches=group_searches, hedge=hedge,
+        service=get_scrape_service(), tenant=st.session_state.session_id,
+        archive=get_snapshot_archive() if keep_snapshots else None, history=get_price_history()
+    )
+
+# Reload a checkpointed run: done rows come from the job store, pending and failed rows are scraped again
+def resume_batch_run(job_id):
+    job_store = get_job_store()
+    done_rows = job_store.rows(job_id, statuses=("done",))
+    st.session_state.results.add_many((result_key(row), row["result"], row) for row in done_rows)
+    _, remaining = job_store.resume_rows(job_id)
+    return start_batch_run(remaining, job_id=job_id)
+
+# Live rate-control state shared by every run in the process
+def rate_control_metrics(controller):
+    rate = controller.snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Workers", f"{rate['concurrency']}/{rate['max_concurrency']}", help=f"{rate['in_flight']} in flight, {rate['requests_per_second']:.1f} requests/s")
+    col2.metric("Error rate", f"{rate['error_rate']:.0%}")
+    col3.metric("Throttle events", rate["throttle_events"], help=rate["last_block"])
+    col4.metric("Backoff", f"{rate['backoff_seconds']:.0f} s")
+
+# Per-stage latency percentiles over the recent spans of every run in the process
+def stage_latency_panel(tracer):
+    summary = tracer.summary()
+    if not summary:
+        return
+    with st.expander("⏱️ Stage latency"):
+        st.dataframe(
+            pd.DataFrame(summary), use_container_width=True, hide_index=True,
+            column_config={
+                "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.0f"),
+                "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.0f"),
+                "p99_ms": st.column_config.NumberColumn("p99 (ms)", format="%.0f"),
+                "max_ms": st.column_config.NumberColumn("max (ms)", format="%.0f"),
+            }
+        )
+        st.caption(f"{tracer.spans:,} spans traced · {tracer.trace_path() or 'not written to disk'}")
+
+# Progress panel polled once a second; triggers a full rerun when new results land
+@st.fragment(run_every=1)
+def batch_progress():
+    run = st.session_state.batch_run
+    if run is None:
+        return
+    batch = run.batch
+    completed = run.completed.value
+    done = run.done
+    st.progress(1.0 if done else completed / max(run.total, 1))
+
+    if not done:
+        status = "Cancelling" if run.cancelled else "Processing"
+        st.text(f"{status} {completed}/{run.total} products...")
+        rate_control_metrics(run.controller)
+        service = get_scrape_service().snapshot()
+        st.caption(
+            f"Shared scraper: {service['sessions']} sessions with {service['running']} searches running and "
+            f"{service['queued']} queued · {service['in_flight_products']} products in flight"
+        )
+        stage_latency_panel(get_tracer())
+        if st.button("⏹ Cancel Analysis", disabled=run.cancelled):
+            run.cancel()
+        if completed != st.session_state.batch_seen:
+            st.session_state.batch_seen = completed
+            st.rerun()
+        return
+
+    if not run.closed:
+        run.close()
+        st.session_state.analyzed = True
+        st.session_state.progress = 100
+        st.rerun()
+
+    if run.cancelled:
+        st.text(f"Cancelled after analyzing {completed}/{run.total} products.")
+    else:
+        st.text(f"Completed analyzing {run.total} products in {run.finished_at - run.started_at:.1f} s!")
+
+    # Bandwidth and page-load summary for the run
+    summary = run.page_summary()
+    if summary["products"]:
+        st.caption(
+            f"Transferred {summary['bytes_transferred'] / (1024 * 1024):.1f} MB "
+            f"({summary['bytes_transferred'] / summary['products'] / 1024:.0f} KB per product), "
+            f"average page load {summary['page_load_seconds'] / max(summary['page_loads'], 1):.2f} s over {summary['page_loads']} pages"
+        )
+    rate = run.controller.snapshot()
+    st.caption(
+        f"Rate control: {rate['throttle_events']} throttle events, "
+        f"error rate {rate['error_rate']:.0%}, ended at {rate['concurrency']}/{rate['max_concurrency']} workers · "
+        f"Hedged {batch.hedged.value} slow searches, {batch.hedge_wins.value} finished first"
+    )
+    st.caption(
+        f"Cache: {run.cache_hits} hits, {run.cache_misses} misses · "
+        f"Searches: {run.plan.searches} ({run.plan.searches_saved} saved by grouping, duplicate names and "
+        f"{run.plan.shared} products shared with other sessions) · Job ID: {run.job_id}"
+    )
+    stage_latency_panel(get_tracer())
+    st.success("✅ Analysis complete! Go to the Analysis Dashboard tab to view results.")
+
+# Progress of a job queued for worker processes; settled rows are read back into this session's results
+@st.fragment(run_every=1)
+def queue_progress():
+    job = st.session_state.queued_job
+    if job is None:
+        return
+    rows = job.poll()
+    st.session_state.results.add_many((result_key(row), row["result"], row) for row in rows if row["status"] == "done")
+    status = job.status
+    st.progress(1.0 if job.done else job.completed / max(job.total, 1))
+    if not job.done:
+        st.text(f"{'Cancelling' if job.cancelled else 'Processing'} {job.completed}/{job.total} products on worker processes...")
+        st.caption(
+            f"{status['leased']} rows leased by {status['workers']} workers, "
+            f"{status['pending'] - status['leased']} waiting · Job ID: {job.job_id}"
+        )
+        if not status["workers"] and not status["leased"]:
+            st.warning("No worker holds a lease yet. Start one with `python -m retail_intelligence worker`.")
+        if st.button("⏹ Cancel Analysis", disabled=job.cancelled, key="cancel_queued"):
+            job.cancel()
+        if rows:
+            st.rerun()
+        return
+
+    if not st.session_state.analyzed:
+        st.session_state.analyzed = True
+        st.rerun()
+    elapsed = job.finished_at - job.started_at
+    st.text(
+        f"{'Cancelled after analyzing' if job.cancelled else 'Completed analyzing'} {job.completed}/{job.total} products "
+        f"in {elapsed:.1f} s ({status['failed']} failed)"
+    )
+    st.success("✅ Analysis complete! Go to the Analysis Dashboard tab to view results.")
 
 # Create tabs
-tab1, tab2 = st.tabs(["📤 Upload & Process", "📊 Analysis Dashboard"])
+tab1, tab2, tab3 = st.tabs(["📤 Upload & Process", "📊 Analysis Dashboard", "📈 Portfolio"])
 
 with tab1:
     st.markdown("<h2>Upload Product Data</h2>", unsafe_allow_html=True)
@@ -287,77 +467,51 @@ with tab1:
         
         if uploaded_file is not None:
             try:
-                df = pd.read_excel(uploaded_file)
-                required_columns = ["Brand", "Category", "Product Name", "Model Number"]
-                if all(col in df.columns for col in required_columns):
-                    st.session_state.df = df
+                catalog = load_catalog(uploaded_file.getvalue())
+                if catalog is not None:
+                    st.session_state.catalog = catalog
                     st.success("✅ File uploaded successfully!")
+                    st.caption(
+                        f"Read {len(catalog):,} products in {catalog.seconds * 1000:.0f} ms · "
+                        f"{catalog.duplicates:,} duplicate products removed · {catalog.skipped:,} rows without a product name skipped"
+                    )
                     
                     st.markdown("<h3>Preview of uploaded data</h3>", unsafe_allow_html=True)
-                    st.dataframe(df.head(10), use_container_width=True)
+                    st.dataframe(catalog.preview(10), use_container_width=True)
                     
                     st.markdown("<h3>Products found in the Excel file</h3>", unsafe_allow_html=True)
-                    products = df["Product Name"].tolist()
+                    products = catalog.product_names
                     st.session_state.total_products = len(products)
                     
-                    # Display products as tags in a container
+                    # Display products as tags in a container, one page at a time
+                    pages = max(1, -(-len(products) // TAGS_PER_PAGE))
+                    page = 1
+                    if pages > 1:
+                        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="product_tags_page")
+                    page_products = products[(page - 1) * TAGS_PER_PAGE:page * TAGS_PER_PAGE]
                     cols = st.columns(3)
-                    for i, product in enumerate(products):
-                        cols[i % 3].markdown(f"<div style='background-color: #e1f5e1; padding: 8px; margin: 4px; border-radius: 5px;'>{product}</div>", unsafe_allow_html=True)
+                    for i in range(3):
+                        cols[i].markdown("".join(
+                            f"<div style='background-color: #e1f5e1; padding: 8px; margin: 4px; border-radius: 5px;'>{product}</div>"
+                            for product in page_products[i::3]
+                        ), unsafe_allow_html=True)
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        if st.button("Analyze All Products"):
-                            st.session_state.results = {}
+                        running = any(
+                            run is not None and not run.done for run in (st.session_state.batch_run, st.session_state.queued_job)
+                        )
+                        if st.button("Analyze All Products", disabled=running):
+                            reset_results()
                             st.session_state.progress = 0
-                            
-                            # Create a progress bar
-                            progress_bar = st.progress(0)
-                            status_text = st.empty()
-                            
-                            # Set up multithreading queue
-                            q = queue.Queue()
-                            for idx, product in enumerate(products):
-                                q.put((idx, product))
-                            
-                            # Initialize results list and progress counter
-                            results = [None] * len(products)
-                            progress_counter = [0]  # Use list to make it mutable for threads
-                            
-                            # Create and start threads (use 3 threads max to avoid overloading)
-                            num_threads = min(3, len(products))
-                            threads = []
-                            for _ in range(num_threads):
-                                thread = Thread(target=process_queue, args=(q, results, progress_counter))
-                                thread.daemon = True
-                                thread.start()
-                                threads.append(thread)
-                            
-                            # Update progress bar
-                            while progress_counter[0] < len(products):
-                                progress_percentage = progress_counter[0] / len(products)
-                                progress_bar.progress(progress_percentage)
-                                status_text.text(f"Processing {progress_counter[0]}/{len(products)} products...")
-                                time.sleep(0.1)
-                            
-                            # Wait for all threads to complete
-                            for thread in threads:
-                                thread.join()
-                            
-                            # Finalize progress
-                            progress_bar.progress(1.0)
-                            status_text.text(f"Completed analyzing {len(products)} products!")
-                            
-                            # Store results in session state
-                            for idx, result in enumerate(results):
-                                if result:
-                                    st.session_state.results[products[idx]] = result
-                            
-                            st.session_state.analyzed = True
-                            st.session_state.progress = 100
-                            
-                            # Add a success message
-                            st.success("✅ Analysis complete! Go to the Analysis Dashboard tab to view results.")
+                            st.session_state.analyzed = False
+                            if use_workers:
+                                st.session_state.batch_run = None
+                                job_id = get_job_store().create_job(catalog.rows, uploaded_file.name, queued=True)
+                                st.session_state.queued_job = QueuedJob(get_job_store(), job_id, len(catalog.rows))
+                            else:
+                                st.session_state.queued_job = None
+                                st.session_state.batch_run = start_batch_run(catalog.rows, source=uploaded_file.name)
                     
                     with col2:
                         if st.button("Select Individual Product"):
@@ -365,39 +519,74 @@ with tab1:
                             product_selection = st.selectbox("Choose a product to analyze:", products)
                             if st.button("Analyze Selected Product"):
                                 with st.spinner(f"Analyzing {product_selection}..."):
-                                    result = search_amazon(product_selection)
-                                    if result:
-                                        st.session_state.results[product_selection] = result
-                                        st.session_state.selected_product = product_selection
+                                    selected_row = catalog.lookup(product_selection)
+                                    model_number = selected_row["model_number"]
+                                    archive = get_snapshot_archive() if keep_snapshots else None
+                                    result = search_amazon(
+                                        product_selection, backend=backend, timeouts=timeouts, blocking=blocking,
+                                        model_number=model_number, brand=selected_row["brand"],
+                                        url_index=get_url_index() if use_url_index else None, archive=archive
+                                    )
+                                    if archive is not None:
+                                        archive.flush()
+                                    failed = result is not None and "Error" in result
+                                    # A failed or blocked search says nothing about the product's listing
+                                    if not failed:
+                                        get_price_history().record(selected_row, result)
+                                    if result and not failed:
+                                        get_scrape_cache().put(result_key(selected_row), result)
+                                        st.session_state.results.add(result_key(selected_row), result, selected_row)
+                                        st.session_state.selected_product = result_key(selected_row)
                                         st.success(f"✅ Analysis complete for {product_selection}!")
                                         st.markdown("Go to the Analysis Dashboard tab to view results.")
+                                    elif failed:
+                                        st.error(f"❌ Failed to retrieve data for this product: {result['Error']}")
                                     else:
-                                        st.error("❌ Failed to retrieve data for this product.")
+                                        st.error("❌ No matching listing found for this product.")
                 else:
                     st.error("❌ The Excel file must contain columns for Brand, Category, Product Name, and Model Number.")
             except Exception as e:
                 st.error(f"❌ Error processing file: {str(e)}")
     
+    batch_progress()
+    queue_progress()
+    
+    # Checkpointed runs: per-row status and resume
+    job_history = get_job_store().list_jobs()
+    if job_history:
+        st.markdown("<h3>Batch runs</h3>", unsafe_allow_html=True)
+        run_labels = {
+            f"{job['job_id']} · {job['source'] or 'unknown file'} · "
+            f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(job['created_at']))} · "
+            f"{job['done']}/{job['total']} done, {job['failed']} failed": job
+            for job in job_history
+        }
+        selected_run = run_labels[st.selectbox("Select a run", list(run_labels))]
+        status_filter = st.multiselect("Row status", ["pending", "done", "failed"], default=["pending", "failed"])
+        run_rows = get_job_store().rows(selected_run["job_id"], statuses=status_filter)
+        if run_rows:
+            st.dataframe(
+                pd.DataFrame(run_rows)[["idx", "product_name", "model_number", "status", "reason"]],
+                use_container_width=True,
+                hide_index=True
+            )
+        running = any(
+            run is not None and not run.done for run in (st.session_state.batch_run, st.session_state.queued_job)
+        )
+        if selected_run["pending"] or selected_run["failed"]:
+            if st.button("▶️ Resume Run", disabled=running):
+                reset_results()
+                st.session_state.analyzed = False
+                st.session_state.queued_job = None
+                st.session_state.batch_run = resume_batch_run(selected_run["job_id"])
+                st.rerun()
+    
     # Download template
     st.markdown("<h3>Don't have a file? Download a template:</h3>", unsafe_allow_html=True)
     
-    # Create a template Excel file
-    def create_template():
-        df = pd.DataFrame({
-            "Brand": ["Dyanora", "Dyanora"],
-            "Category": ["Television", "Television"],
-            "Product Name": ["Dyanora 24 INCH HD Ready LED TV (DY-LD24H0N)", "Dyanora 24 INCH HD Ready LED Smart Linux TV (DY-LD24H4S)"],
-            "Model Number": ["DY-LD24H0N", "DY-LD24H4S"]
-        })
-        buffer = BytesIO()
-        df.to_excel(buffer, index=False)
-        buffer.seek(0)
-        return buffer
-
-    template = create_template()
     st.download_button(
         label="📥 Download Template Excel",
-        data=template,
+        data=create_template(),
         file_name="retail_intelligence_template.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
@@ -411,21 +600,18 @@ with tab2:
         # Create a dropdown to select products for viewing
         available_products = list(st.session_state.results.keys())
         if available_products:
-            selected = st.selectbox("Select a product to view details:", available_products)
+            labels = product_labels(st.session_state.results)
+            selected = st.selectbox("Select a product to view details:", available_products, format_func=labels.get)
             
             if selected and selected in st.session_state.results:
                 product_data = st.session_state.results[selected]
+                selected_name = st.session_state.results.name(selected)
                 
                 # Main product details
-                st.markdown(f"<h3>Product Analysis: {selected}</h3>", unsafe_allow_html=True)
+                st.markdown(f"<h3>Product Analysis: {labels[selected]}</h3>", unsafe_allow_html=True)
                 
-                # Extract dataframe metadata for this product if available
-                product_metadata = {}
-                if st.session_state.df is not None:
-                    df = st.session_state.df
-                    product_row = df[df["Product Name"] == selected]
-                    if not product_row.empty:
-                        product_metadata = product_row.iloc[0].to_dict()
+                # Catalog metadata for this product if available
+                product_metadata = st.session_state.results.metadata(selected)
                 
                 # Product details in a card
                 st.markdown('<div class="product-card">', unsafe_allow_html=True)
@@ -436,9 +622,9 @@ with tab2:
                 with col1:
                     st.markdown("<h4>Product Information</h4>", unsafe_allow_html=True)
                     if product_metadata:
-                        st.markdown(f"**Brand:** {product_metadata.get('Brand', 'N/A')}")
-                        st.markdown(f"**Category:** {product_metadata.get('Category', 'N/A')}")
-                        st.markdown(f"**Model Number:** {product_metadata.get('Model Number', 'N/A')}")
+                        st.markdown(f"**Brand:** {product_metadata.get('brand') or 'N/A'}")
+                        st.markdown(f"**Category:** {product_metadata.get('category') or 'N/A'}")
+                        st.markdown(f"**Model Number:** {product_metadata.get('model_number') or 'N/A'}")
                 
                 with col2:
                     st.markdown("<h4>Amazon Data</h4>", unsafe_allow_html=True)
@@ -446,6 +632,7 @@ with tab2:
                     st.markdown(f"**Price:** ₹{product_data.get('Price', 'N/A')}")
                     st.markdown(f"**Reviews:** {product_data.get('Reviews Count', 'N/A')}")
                     st.markdown(f"**Rating:** {product_data.get('Ranking', 'N/A')}")
+                    st.markdown(f"**Match Confidence:** {product_data.get('Match Confidence', 'N/A')}")
                     
                     # Product link as a button
                     if product_data.get('Product Link'):
@@ -453,6 +640,32 @@ with tab2:
                 
                 st.markdown('</div>', unsafe_allow_html=True)
                 
+                # Price history across every scrape of this product (dashboard and CLI runs)
+                st.markdown("<h3>Price History</h3>", unsafe_allow_html=True)
+                deltas = get_price_history().deltas(selected)
+                if deltas is None or deltas["previous_price"] is None:
+                    st.info("Price changes appear here once this product has been scraped more than once.")
+                else:
+                    col1, col2, col3, col4 = st.columns(4)
+                    col1.metric(
+                        "Price vs last scrape", f"₹{deltas['price']:,.0f}",
+                        delta=f"{deltas['price_change']:+,.0f} ({deltas['price_change_pct']:+.1f}%)" if deltas["price_change"] else None,
+                        delta_color="inverse"
+                    )
+                    col2.metric(
+                        "Since first seen", f"{deltas['change_since_first_pct']:+.1f}%" if deltas["change_since_first_pct"] is not None else "N/A",
+                        help=f"First seen {deltas['first_seen']:%Y-%m-%d} at ₹{deltas['first_price']:,.0f}"
+                    )
+                    col3.metric(
+                        "Rating change", f"{deltas['rating_change']:+.1f}" if deltas["rating_change"] is not None else "N/A"
+                    )
+                    col4.metric(
+                        "New reviews", f"{deltas['review_change']:+,}" if deltas["review_change"] is not None else "N/A"
+                    )
+                    st.line_chart(get_price_history().series(selected).set_index("observed_at")["price"])
+                    last_change = f", last on {deltas['last_change_at']:%Y-%m-%d %H:%M}" if deltas["last_change_at"] is not None else ""
+                    st.caption(f"{deltas['observations']} scrapes, {deltas['price_changes']} price changes{last_change}")
+                
                 # Competitive Analysis Section
                 st.markdown("<h3>Competitive Analysis</h3>", unsafe_allow_html=True)
                 
@@ -461,39 +674,24 @@ with tab2:
                     # Create metrics at the top
                     st.markdown('<div class="metric-container">', unsafe_allow_html=True)
                     
-                    # Calculate average competitor price
-                    competitor_prices = []
-                    for prod in related_products:
-                        try:
-                            price = prod.get('Price', '0')
-                            price = price.replace(',', '')  # Remove commas
-                            competitor_prices.append(int(price))
-                        except (ValueError, TypeError):
-                            pass
-                    
-                    if competitor_prices:
-                        avg_price = sum(competitor_prices) / len(competitor_prices)
-                        
-                        # Try to get the main product's price for comparison
-                        try:
-                            main_price = product_data.get('Price', '0').replace(',', '')
-                            main_price = int(main_price)
-                            price_diff = main_price - avg_price
-                            price_diff_pct = (price_diff / avg_price) * 100 if avg_price > 0 else 0
-                        except (ValueError, TypeError):
-                            main_price = 0
-                            price_diff = 0
-                            price_diff_pct = 0
+                    # Competitor averages for the whole catalog come from the typed results store
+                    metrics = st.session_state.results.metrics
+                    product_metrics = metrics.loc[selected] if selected in metrics.index else None
+                    if product_metrics is not None and not pd.isna(product_metrics["avg_competitor_price"]):
+                        avg_price = product_metrics["avg_competitor_price"]
+                        main_price = product_metrics["price"]
+                        price_diff = 0 if pd.isna(product_metrics["price_diff"]) else product_metrics["price_diff"]
+                        price_diff_pct = 0 if pd.isna(product_metrics["price_diff_pct"]) else product_metrics["price_diff_pct"]
                         
                         # Display metrics
                         st.markdown(f'''
                         <div class="metric-box">
                             <div class="metric-label">Your Price</div>
-                            <div class="metric-value">₹{main_price}</div>
+                            <div class="metric-value">{"N/A" if pd.isna(main_price) else f"₹{main_price:,.0f}"}</div>
                         </div>
                         <div class="metric-box">
                             <div class="metric-label">Avg. Competitor Price</div>
-                            <div class="metric-value">₹{avg_price:.0f}</div>
+                            <div class="metric-value">₹{avg_price:,.0f}</div>
                         </div>
                         <div class="metric-box">
                             <div class="metric-label">Price Difference</div>
@@ -531,125 +729,130 @@ with tab2:
                 st.markdown("<h3>Export Analysis</h3>", unsafe_allow_html=True)
                 
                 col1, col2 = st.columns(2)
+                # Built only when a button is clicked, on Streamlit's download thread
                 with col1:
                     # Export as JSON
-                    json_data = json.dumps(product_data, indent=4)
                     st.download_button(
                         label="📥 Export as JSON",
-                        data=json_data,
-                        file_name=f"{selected.replace(' ', '_')}_analysis.json",
-                        mime="application/json"
+                        data=lambda: create_json_report(product_data),
+                        file_name=f"{selected_name.replace(' ', '_')}_analysis.json",
+                        mime="application/json",
+                        on_click="ignore"
                     )
                 
                 with col2:
                     # Export as Excel
-                    def create_excel_report(product_data, product_name):
-                        # Create a DataFrame for the main product
-                        main_df = pd.DataFrame({
-                            "Product Name": [product_name],
-                            "Title": [product_data.get('Title', 'N/A')],
-                            "Price": [product_data.get('Price', 'N/A')],
-                            "Reviews": [product_data.get('Reviews Count', 'N/A')],
-                            "Rating": [product_data.get('Ranking', 'N/A')],
-                            "Product Link": [product_data.get('Product Link', 'N/A')]
-                        })
-                        
-                        # Create a DataFrame for competitors
-                        competitors = product_data.get('Related Products', [])
-                        comp_data = []
-                        for i, comp in enumerate(competitors):
-                            comp_data.append({
-                                "Competitor #": i+1,
-                                "Title": comp.get('Title', 'N/A'),
-                                "Price": comp.get('Price', 'N/A'),
-                                "Rating": comp.get('Rating', 'N/A'),
-                                "Reviews": comp.get('Reviews', 'N/A')
-                            })
-                        
-                        comp_df = pd.DataFrame(comp_data) if comp_data else pd.DataFrame()
-                        
-                        # Create Excel file with multiple sheets
-                        buffer = BytesIO()
-                        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                            main_df.to_excel(writer, sheet_name='Product Details', index=False)
-                            if not comp_df.empty:
-                                comp_df.to_excel(writer, sheet_name='Competitors', index=False)
-                        
-                        buffer.seek(0)
-                        return buffer
-                    
-                    excel_data = create_excel_report(product_data, selected)
                     st.download_button(
                         label="📥 Export as Excel Report",
-                        data=excel_data,
-                        file_name=f"{selected.replace(' ', '_')}_report.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        data=lambda: create_excel_report(product_data, selected_name),
+                        file_name=f"{selected_name.replace(' ', '_')}_report.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        on_click="ignore"
                     )
         
         # Batch export option for all products
         if len(available_products) > 1:
             st.markdown("<h3>Batch Export</h3>", unsafe_allow_html=True)
             
-            if st.button("📥 Export All Products Data"):
-                # Create Excel file with all product data
-                buffer = BytesIO()
-                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                    # Summary sheet
-                    summary_data = []
-                    for product_name, product_data in st.session_state.results.items():
-                        summary_data.append({
-                            "Product Name": product_name,
-                            "Title on Amazon": product_data.get('Title', 'N/A'),
-                            "Price": product_data.get('Price', 'N/A'),
-                            "Reviews Count": product_data.get('Reviews Count', 'N/A'),
-                            "Rating": product_data.get('Ranking', 'N/A'),
-                            "Competitors Found": len(product_data.get('Related Products', []))
-                        })
-                    
-                    pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary', index=False)
-                    
-                    # Individual product sheets
-                    for product_name, product_data in st.session_state.results.items():
-                        # Main product data
-                        sheet_name = product_name[:31]  # Excel limits sheet names to 31 chars
-                        product_df = pd.DataFrame({
-                            "Parameter": ["Title", "Price", "Reviews", "Rating", "URL"],
-                            "Value": [
-                                product_data.get('Title', 'N/A'),
-                                product_data.get('Price', 'N/A'),
-                                product_data.get('Reviews Count', 'N/A'),
-                                product_data.get('Ranking', 'N/A'),
-                                product_data.get('Product Link', 'N/A')
-                            ]
-                        })
-                        
-                        # Competitor data
-                        competitors = product_data.get('Related Products', [])
-                        comp_data = []
-                        for i, comp in enumerate(competitors):
-                            comp_data.append({
-                                "Competitor #": i+1,
-                                "Title": comp.get('Title', 'N/A'),
-                                "Price": comp.get('Price', 'N/A'),
-                                "Rating": comp.get('Rating', 'N/A'),
-                                "Reviews": comp.get('Reviews', 'N/A')
-                            })
-                        
-                        comp_df = pd.DataFrame(comp_data) if comp_data else pd.DataFrame()
-                        
-                        # Write to Excel
-                        product_df.to_excel(writer, sheet_name=sheet_name, startrow=0, index=False)
-                        if not comp_df.empty:
-                            comp_df.to_excel(writer, sheet_name=sheet_name, startrow=8, index=False)
-                
-                buffer.seek(0)
+            # Snapshot, since a running batch may still be adding results
+            session_results = st.session_state.results
+            all_results = {labels[key]: result for key, result in session_results.items() if key in labels}
+            col1, col2 = st.columns(2)
+            with col1:
                 st.download_button(
-                    label="💾 Download Complete Analysis Report",
-                    data=buffer,
+                    label="📥 Export All Products Data",
+                    data=lambda: create_full_report(all_results),
                     file_name="retail_intelligence_full_report.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    on_click="ignore"
+                )
+            with col2:
+                long_format = st.selectbox("Table format", LONG_FORMATS, format_func=str.upper)
+                st.download_button(
+                    label="📥 Export Product and Competitor Tables",
+                    data=lambda: long_format_archive(session_results.products, session_results.competitors, long_format),
+                    file_name=f"retail_intelligence_tables_{long_format}.zip",
+                    mime="application/zip",
+                    on_click="ignore"
                 )
 
+with tab3:
+    st.markdown("<h2>Portfolio View</h2>", unsafe_allow_html=True)
+    
+    session_results = st.session_state.results
+    if not session_results:
+        st.info("📋 Please upload an Excel file and analyze products to see results here.")
+    else:
+        render_start = time.perf_counter()
+        # Precomputed when results land; only filtering and sorting happen here
+        portfolio = session_results.portfolio
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            brands = st.multiselect("Brand", list(portfolio["brand"].cat.categories))
+        with col2:
+            categories = st.multiselect("Category", list(portfolio["category"].cat.categories))
+        
+        sort_options = {
+            "Price gap vs competitors (%)": "price_diff_pct",
+            "Rating gap vs competitors": "rating_diff",
+            "Review volume": "review_count",
+        }
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sort_label = st.selectbox("Rank by", list(sort_options))
+        with col2:
+            descending = st.toggle("Highest first", value=True)
+        with col3:
+            max_rows = st.number_input("Rows to show", min_value=10, max_value=10000, value=200, step=50)
+        
+        view = portfolio
+        if brands:
+            view = view[view["brand"].isin(brands)]
+        if categories:
+            view = view[view["category"].isin(categories)]
+        view = view.sort_values(sort_options[sort_label], ascending=not descending, na_position="last")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Products", f"{len(view):,}")
+        col2.metric("Median price gap", f"{view['price_diff_pct'].median():.1f}%" if view["price_diff_pct"].notna().any() else "N/A")
+        col3.metric("Mean rating gap", f"{view['rating_diff'].mean():+.2f}" if view["rating_diff"].notna().any() else "N/A")
+        col4.metric("Priced above competitors", f"{int((view['price_diff_pct'] > 0).sum()):,}")
+        
+        st.dataframe(
+            view.head(int(max_rows)).reset_index(),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "product_key": None,
+                "product_name": "Product Name",
+                "brand": "Brand",
+                "category": "Category",
+                "title": "Title on Amazon",
+                "price": st.column_config.NumberColumn("Price", format="₹%.0f"),
+                "avg_competitor_price": st.column_config.NumberColumn("Avg. Competitor Price", format="₹%.0f"),
+                "price_diff_pct": st.column_config.NumberColumn("Price Gap", format="%.1f%%"),
+                "rating": st.column_config.NumberColumn("Rating", format="%.1f"),
+                "avg_competitor_rating": st.column_config.NumberColumn("Avg. Competitor Rating", format="%.1f"),
+                "rating_diff": st.column_config.NumberColumn("Rating Gap", format="%+.2f"),
+                "review_count": st.column_config.NumberColumn("Reviews"),
+                "competitor_count": st.column_config.NumberColumn("Competitors"),
+                "match_confidence": st.column_config.NumberColumn("Match Confidence", format="%.0f"),
+            }
+        )
+        
+        with st.expander("Brand / Category summary"):
+            segments = session_results.segments
+            if brands:
+                segments = segments[segments["brand"].isin(brands)]
+            if categories:
+                segments = segments[segments["category"].isin(categories)]
+            st.dataframe(segments, use_container_width=True, hide_index=True)
+        
+        st.caption(f"Rendered {len(view):,} of {len(portfolio):,} products in {(time.perf_counter() - render_start) * 1000:.0f} ms")
+
+st.sidebar.caption(f"Script run: {(time.perf_counter() - RERUN_START) * 1000:.0f} ms")
+
 # Footer
 st.markdown("""
 <div style="text-align: center; margin-top: 40px; padding: 20px; background-color: #f8f9fa; border-radius: 10px;">
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Keep caches, checkpoints and traces out of the working tree; config reads these at import
+os.environ.setdefault("RETAIL_INTELLIGENCE_DATA_DIR", tempfile.mkdtemp(prefix="retail_intelligence_tests_"))
+os.environ.setdefault("RETAIL_INTELLIGENCE_TRACE_DIR", "")
+# benchmarks/fixture_server.py is the local stand-in for amazon.in
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
@@ -0,0 +1,49 @@
+import threading
+
+from fixture_server import fixture_handler, start_server
+
+from retail_intelligence import http_backend, parsing
+from retail_intelligence.batch import BatchRun
+from retail_intelligence.cache import ScrapeCache, product_cache_key
+from retail_intelligence.history import PriceHistory
+from retail_intelligence.jobs import JobStore
+
+ROWS = [
+    {"idx": 0, "product_name": "Dyanora 24 inches HD Ready LED TV DY-LD24H0N", "model_number": "DY-LD24H0N",
+     "brand": "Dyanora", "category": "TV"},
+    {"idx": 1, "product_name": "Dyanora 24 inches HD Ready LED TV DY-LD24H0N", "model_number": "DY-LD24H0N",
+     "brand": "Dyanora", "category": "TV"},
+]
+
+def test_finished_rows_are_written_off_the_scheduler_thread(tmp_path, monkeypatch):
+    server, base_url = start_server(handler=fixture_handler())
+    monkeypatch.setattr(http_backend, "AMAZON_BASE_URL", base_url)
+    monkeypatch.setattr(parsing, "AMAZON_BASE_URL", base_url)
+    monkeypatch.setattr(http_backend, "pace_request", lambda: None)
+    writers = []
+
+    def on_thread(method):
+        def wrapper(*args, **kwargs):
+            writers.append(threading.current_thread().name)
+            return method(*args, **kwargs)
+        return wrapper
+
+    cache = ScrapeCache(str(tmp_path / "cache.sqlite"))
+    history = PriceHistory(str(tmp_path / "history.sqlite"))
+    job_store = JobStore(str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(cache, "put_many", on_thread(cache.put_many))
+    monkeypatch.setattr(history, "record", on_thread(history.record))
+    monkeypatch.setattr(job_store, "record_results", on_thread(job_store.record_results))
+    run = BatchRun(ROWS, concurrency=2, cache=cache, history=history, job_store=job_store, hedge=False)
+    try:
+        assert run.wait(timeout=30)
+    finally:
+        run.close()
+        server.shutdown()
+        server.server_close()
+
+    assert writers and set(writers) == {"result-writer"}
+    assert [row["status"] for row in job_store.rows(run.job_id)] == ["done", "done"]
+    key = product_cache_key(ROWS[0]["product_name"], ROWS[0]["model_number"])
+    assert cache.get(key)["Price"] == "6,299"
+    assert history.summaries([key])
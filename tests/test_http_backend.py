@@ -0,0 +1,58 @@
+import pytest
+from fixture_server import fixture_handler, load_fixture, start_server, synthetic_catalog
+
+from retail_intelligence import http_backend, parsing
+from retail_intelligence.parsing import JavaScriptRequired
+
+# Starts a fixture server on a free port and points the HTTP backend at it
+@pytest.fixture
+def serve(monkeypatch):
+    servers = []
+
+    def start(handler):
+        server, base_url = start_server(handler=handler)
+        servers.append(server)
+        monkeypatch.setattr(http_backend, "AMAZON_BASE_URL", base_url)
+        monkeypatch.setattr(parsing, "AMAZON_BASE_URL", base_url)
+        return base_url
+
+    monkeypatch.setattr(http_backend, "pace_request", lambda: None)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_search_amazon_http_against_recorded_pages(serve):
+    handler = fixture_handler()
+    serve(handler)
+    result = http_backend.search_amazon_http("Dyanora 24 inches HD Ready LED TV DY-LD24H0N", model_number="DY-LD24H0N", brand="Dyanora")
+    assert result["Title"] == "Dyanora 60 cm (24 inches) HD Ready LED TV DY-LD24H0N (Black)"
+    assert result["Price"] == "6,299"
+    assert result["Reviews Count"] == "2,431 ratings"
+    assert result["Ranking"] == "4.0 out of 5 stars"
+    assert "/dp/B0DYANORA1/" in result["Product Link"]
+    assert len(result["Related Products"]) == 5
+    assert all(competitor["Title"] and competitor["Price"] for competitor in result["Related Products"])
+    assert handler.counts == {"search": 1, "detail": 1}
+
+def test_parse_product_page_keeps_at_most_five_competitors():
+    result = http_backend.parse_product_page(load_fixture("product_page.html").decode(), "https://www.amazon.in/dp/B0DYANORA1")
+    assert result["Title"].startswith("Dyanora 60 cm (24 inches)")
+    assert len(result["Related Products"]) == 5
+    assert result["Related Products"][0] == {
+        "Title": "Acme 60 cm (24 inches) HD Ready Smart LED TV", "Price": "7,499", "Rating": "4.1 out of 5 stars", "Reviews": "812"
+    }
+
+def test_client_side_carousel_falls_back_to_selenium(serve):
+    products = synthetic_catalog(6)
+    base_url = serve(fixture_handler(products=products, missing_rate=1.0, missing=("js_carousel",)))
+    product = products[0]
+    page = http_backend.fetch_page(f"{base_url}/x/dp/{product['asin']}", timeout=5)
+    with pytest.raises(JavaScriptRequired):
+        http_backend.parse_product_page(page, product["asin"])
+
+    row = {"idx": 0, "product_name": product["Product Name"], "model_number": product["Model Number"], "brand": product["Brand"]}
+    results, needs_browser = http_backend.search_group_http(product["Product Name"], [row])
+    assert results == {} and needs_browser == [row]
+    with pytest.raises(JavaScriptRequired):
+        http_backend.search_amazon_http(product["Product Name"], model_number=product["Model Number"], brand=product["Brand"])
@@ -0,0 +1,36 @@
+from unittest import mock
+
+import requests
+
+from retail_intelligence import http_backend
+from retail_intelligence.jobs import MAX_ATTEMPTS, JobStore
+
+ROWS = [{"idx": 0, "product_name": "Nexa 32 inch HD Ready LED TV", "model_number": "NE-00001A"}]
+
+def scrape_with_page_error(rows):
+    with mock.patch.object(http_backend, "pace_request", lambda: None), \
+            mock.patch.object(http_backend, "fetch_page", side_effect=requests.ConnectionError("connection reset")):
+        results, needs_browser = http_backend.search_group_http(rows[0]["product_name"], rows)
+    assert not needs_browser
+    return results
+
+def test_row_whose_page_errors_is_leased_again(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    job_id = store.create_job(ROWS, queued=True)
+    for _ in range(MAX_ATTEMPTS):
+        leased_job, rows = store.lease("worker", limit=10, lease_seconds=60)
+        assert leased_job == job_id and [row["idx"] for row in rows] == [0]
+        result = scrape_with_page_error(rows)[0]
+        assert "Error" in result
+        store.settle(job_id, 0, result)
+    assert store.lease("worker", limit=10, lease_seconds=60) == (None, [])
+    [row] = store.rows(job_id)
+    assert row["status"] == "failed" and "connection reset" in row["reason"]
+
+def test_row_without_a_match_fails_at_once(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    job_id = store.create_job(ROWS, queued=True)
+    store.lease("worker", limit=10, lease_seconds=60)
+    store.settle(job_id, 0, None)
+    assert store.lease("worker", limit=10, lease_seconds=60) == (None, [])
+    assert store.rows(job_id)[0]["status"] == "failed"
@@ -0,0 +1,61 @@
+from retail_intelligence.planner import MAX_GROUP_SIZE, coalesce_rows, group_searches, plan_searches
+
+COLOURS = ["Black", "Silver", "Grey", "White", "Blue", "Red", "Green", "Gold", "Pink", "Brown"]
+
+def catalog(*products):
+    return [
+        {"idx": idx, "brand": brand, "category": category, "product_name": name, "model_number": model}
+        for idx, (brand, category, name, model) in enumerate(products)
+    ]
+
+def variants(count):
+    return catalog(*[
+        ("Nexa", "Televisions", f"Nexa Series 1 190 L HD Ready LED TV NE-00001{chr(65 + i)} ({COLOURS[i]})", f"NE-00001{chr(65 + i)}")
+        for i in range(count)
+    ])
+
+def queries(groups):
+    return [(group.query, [row["idx"] for row in group.rows]) for group in groups]
+
+def test_colour_variants_share_one_search_that_keeps_sizes_and_series():
+    groups = group_searches(variants(3))
+    assert queries(groups) == [("Nexa Series 1 190 L HD Ready LED TV", [0, 1, 2])]
+
+def test_different_screen_sizes_are_not_grouped():
+    rows = catalog(
+        ("Samsung", "Televisions", "Samsung 108 cm (43 inch) Crystal 4K Ultra HD Smart LED TV", "UA43CUE60AKLXL"),
+        ("Samsung", "Televisions", "Samsung 138 cm (55 inch) Crystal 4K Ultra HD Smart LED TV", "UA55CUE60AKLXL"),
+        ("Samsung", "Televisions", "Samsung 80 cm (32 inch) HD Ready Smart LED TV", "UA32T4380AKXXL"),
+    )
+    assert queries(group_searches(rows)) == [(row["product_name"], [row["idx"]]) for row in rows]
+
+def test_different_series_are_not_grouped():
+    rows = catalog(
+        ("Orion", "Air Conditioners", "Orion Series 13 24 inch Window AC OR-00013A (Black)", "OR-00013A"),
+        ("Orion", "Air Conditioners", "Orion Series 17 55 inch Window AC OR-00017A (Black)", "OR-00017A"),
+    )
+    assert len(group_searches(rows)) == 2
+
+def test_different_brand_or_category_is_not_grouped():
+    rows = variants(2)
+    rows[1]["brand"] = "Vista"
+    assert len(group_searches(rows)) == 2
+
+def test_groups_are_split_at_max_group_size():
+    groups = group_searches(variants(10), max_group_size=4)
+    assert [len(group.rows) for group in groups] == [4, 4, 2]
+    assert all(len(group.rows) <= MAX_GROUP_SIZE for group in group_searches(variants(10)))
+
+def test_repeated_rows_are_coalesced():
+    rows = variants(2) + [{**variants(1)[0], "idx": 2}]
+    distinct, duplicates = coalesce_rows(rows)
+    assert [row["idx"] for row in distinct] == [0, 1]
+    assert {idx: [row["idx"] for row in repeats] for idx, repeats in duplicates.items()} == {0: [2]}
+    plan = plan_searches(rows)
+    assert (plan.searches, plan.searches_saved, plan.duplicate_rows, plan.total_rows) == (1, 2, 1, 3)
+
+def test_without_grouping_every_distinct_row_searches_its_full_name():
+    rows = variants(3)
+    plan = plan_searches(rows, group_rows=False)
+    assert queries(plan.groups) == [(row["product_name"], [row["idx"]]) for row in rows]
+    assert plan.searches_saved == 0
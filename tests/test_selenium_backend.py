@@ -0,0 +1,70 @@
+from unittest import mock
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from retail_intelligence import selenium_backend
+
+SLOW = "https://www.amazon.in/slow/dp/B000000001"
+FAST = "https://www.amazon.in/fast/dp/B000000002"
+
+# Just enough WebDriver for scrape_group: driver.get on SLOW hits the page-load timeout
+class FakeDriver:
+    def __init__(self):
+        self.current_url = "about:blank"
+        self.page_source = ""
+        self.search_box = mock.Mock()
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def execute_cdp_cmd(self, command, params):
+        pass
+
+    def get_log(self, kind):
+        return []
+
+    def get(self, url):
+        if url == SLOW:
+            raise TimeoutException("page load timed out")
+        self.current_url = url
+
+    def execute_script(self, script, *args):
+        if script == selenium_backend.HOME_READY_JS:
+            return self.search_box
+        if script == selenium_backend.SEARCH_READY_JS:
+            return "results"
+        if script == selenium_backend.SEARCH_RESULTS_JS:
+            return [{"title": "Slow TV", "link": SLOW, "sponsored": False}, {"title": "Fast TV", "link": FAST, "sponsored": False}]
+        if script == selenium_backend.DETAIL_READY_JS:
+            return "price"
+        if script == selenium_backend.CAROUSEL_READY_JS:
+            return "absent"
+        if script == selenium_backend.PRODUCT_DETAIL_JS:
+            return {"title": "Fast TV", "price": "9,999", "reviews": "10 ratings", "ranking": "4.0 out of 5 stars", "competitors": None}
+        raise AssertionError("unexpected script")
+
+@pytest.fixture(autouse=True)
+def no_pacing():
+    with mock.patch.object(selenium_backend, "pace_request", lambda: None):
+        yield
+
+def match_by_name(row, cards):
+    card = next(card for card in cards if card["title"] == row["product_name"])
+    return card["title"], card["link"], 0.9
+
+def test_detail_page_load_timeout_only_fails_its_row():
+    rows = [{"idx": 0, "product_name": "Slow TV"}, {"idx": 1, "product_name": "Fast TV"}]
+    with mock.patch.object(selenium_backend, "match_row", match_by_name):
+        results = selenium_backend.scrape_group(FakeDriver(), "TV", rows)
+    assert "Error" in results[0]
+    assert results[1]["Title"] == "Fast TV"
+
+def test_indexed_page_load_timeout_falls_back_to_search():
+    url_index = mock.Mock()
+    url_index.lookup.side_effect = lambda model: {"url": SLOW, "asin": "B000000001", "confidence": 0.9} if model == "S1" else None
+    rows = [{"idx": 0, "product_name": "Fast TV", "model_number": "S1"}]
+    with mock.patch.object(selenium_backend, "match_row", match_by_name):
+        results = selenium_backend.scrape_group(FakeDriver(), "TV", rows, url_index=url_index)
+    assert results[0]["Title"] == "Fast TV"
+    url_index.forget.assert_not_called()
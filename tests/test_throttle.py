@@ -0,0 +1,92 @@
+import pytest
+from fixture_server import BLOCK_PAGES, load_fixture, start_server, throttling_handler
+
+from retail_intelligence import http_backend, parsing, scraper
+from retail_intelligence.parsing import BlockedError, detect_block
+from retail_intelligence.throttle import RATE_INCREASE, AdaptiveController
+
+@pytest.fixture
+def blocking_server(monkeypatch):
+    servers = []
+
+    def start(block_page):
+        server, base_url = start_server(handler=throttling_handler(block_rate=1.0, block_page=block_page))
+        servers.append(server)
+        monkeypatch.setattr(http_backend, "AMAZON_BASE_URL", base_url)
+        monkeypatch.setattr(parsing, "AMAZON_BASE_URL", base_url)
+        return base_url
+
+    monkeypatch.setattr(http_backend, "pace_request", lambda: None)
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.mark.parametrize("block_page", sorted(BLOCK_PAGES))
+def test_block_pages_raise_blocked_error(blocking_server, block_page):
+    base_url = blocking_server(block_page)
+    name, status = BLOCK_PAGES[block_page]
+    assert detect_block(status, load_fixture(name).decode()) is not None
+    with pytest.raises(BlockedError):
+        http_backend.fetch_response(f"{base_url}/s?k=tv")
+    with pytest.raises(BlockedError):
+        http_backend.search_group_http("Dyanora 24 inches HD Ready LED TV", [{"idx": 0, "product_name": "Dyanora 24 inches HD Ready LED TV"}])
+
+def test_search_amazon_reports_a_block_as_an_error(blocking_server, monkeypatch):
+    blocking_server("robot")
+    controller = AdaptiveController()
+    monkeypatch.setattr(scraper, "get_rate_controller", lambda: controller)
+    result = scraper.search_amazon("Dyanora 24 inches HD Ready LED TV", model_number="DY-LD24H0N")
+    assert result["Error"].startswith("Blocked: ")
+    assert controller.throttle_events == 1
+
+def test_detect_block_passes_normal_pages():
+    assert detect_block(200, load_fixture("search_results.html").decode()) is None
+
+def test_record_block_halves_concurrency_and_rate(blocking_server):
+    base_url = blocking_server("captcha")
+    controller = AdaptiveController(max_concurrency=8, requests_per_second=4.0, backoff_base=2.0)
+    assert controller.limit == 3
+    with pytest.raises(BlockedError) as blocked:
+        http_backend.fetch_response(f"{base_url}/s?k=tv")
+    delay = controller.record_block(str(blocked.value))
+    assert 1.0 <= delay <= 2.0
+    snapshot = controller.snapshot()
+    assert snapshot["concurrency"] == 1
+    assert snapshot["requests_per_second"] == 2.0
+    assert snapshot["throttle_events"] == 1
+    assert "captcha" in snapshot["last_block"]
+    assert snapshot["backoff_seconds"] > 0
+
+    # A second block in the same backoff window does not shrink the limits again
+    controller.limit = 2
+    assert 0 < controller.record_block("captcha") <= delay
+    assert controller.limit == 2
+    assert controller.requests_per_second == 2.0
+
+    # Once the window has passed, the next block backs off for twice as long
+    controller.backoff_until = 0.0
+    assert 2.0 <= controller.record_block("captcha") <= 4.0
+    assert controller.limit == 1
+    assert controller.requests_per_second == 1.0
+
+def test_record_success_recovers_additively():
+    controller = AdaptiveController(max_concurrency=4, requests_per_second=2.0)
+    controller.record_block("captcha")
+    assert (controller.limit, controller.requests_per_second) == (1, 1.0)
+
+    limits = []
+    rates = []
+    for _ in range(6):
+        controller.record_success()
+        limits.append(controller.limit)
+        rates.append(controller.requests_per_second)
+    # One more worker after `limit` healthy groups in a row, never above the ceiling
+    assert limits == [2, 2, 3, 3, 3, 4]
+    assert rates == pytest.approx([1.0 + RATE_INCREASE * n for n in range(1, 7)])
+
+    for _ in range(20):
+        controller.record_success()
+    assert controller.limit == 4
+    assert controller.requests_per_second == 2.0
+    assert controller.error_rate == pytest.approx(1 / 27)